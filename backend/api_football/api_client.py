@@ -9,6 +9,7 @@ from .config import (
     MAX_RETRIES,
     RETRY_DELAY
 )
+from .response_cache import ResponseCache
 from .utils import setup_logger
 
 logger = setup_logger(__name__)
@@ -17,20 +18,27 @@ logger = setup_logger(__name__)
 class APIFootballClient:
     """Cliente para interactuar con la API de API-Futbol."""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        cache: Optional[ResponseCache] = None
+    ):
         """Inicializa el cliente de la API.
         
         Args:
             api_key: API key de API-Futbol. Si no se proporciona, usa la del config.
+            cache: Cache en disco de respuestas (opcional). En modo replay
+                no se hacen peticiones y la API key no es necesaria.
         """
         self.api_key = api_key or API_FOOTBALL_KEY
         self.base_url = API_FOOTBALL_BASE_URL
+        self.cache = cache
         self.headers = {
             'x-rapidapi-key': self.api_key,
             'x-rapidapi-host': 'api-football-v1.p.rapidapi.com'
         }
         
-        if not self.api_key:
+        if not self.api_key and not (cache and cache.replay):
             raise ValueError("API key no configurada. Verifica el archivo .env")
         
         logger.info("Cliente API-Futbol inicializado correctamente")
@@ -49,6 +57,14 @@ class APIFootballClient:
         Returns:
             Respuesta JSON de la API o None si falla
         """
+        if self.cache:
+            cached = self.cache.get(endpoint, params)
+            if cached is not None:
+                return cached
+            if self.cache.replay:
+                logger.error(f"Modo replay: {endpoint} {params or ''} no está en la cache")
+                return None
+        
         url = f"{self.base_url}/{endpoint}"
         
         for attempt in range(MAX_RETRIES):
@@ -72,6 +88,8 @@ class APIFootballClient:
                         return None
                     
                     logger.debug(f"Petición exitosa a {endpoint}")
+                    if self.cache:
+                        self.cache.put(endpoint, params, data)
                     return data
                     
                 elif response.status_code == 429:
@@ -103,15 +121,18 @@ class APIFootballClient:
         logger.error(f"Todos los intentos fallaron para {endpoint}")
         return None
     
-    def get_all_leagues(self) -> List[Dict]:
+    def get_all_leagues(self, league_id: Optional[int] = None) -> List[Dict]:
         """Obtiene todas las ligas disponibles.
         
+        Args:
+            league_id: Si se indica, solo esa liga (parámetro 'id' de la API)
+            
         Returns:
             Lista de ligas
         """
-        logger.info("Obteniendo todas las ligas...")
+        logger.info("Obteniendo todas las ligas..." if not league_id else f"Obteniendo liga {league_id}...")
         
-        response = self._make_request('leagues')
+        response = self._make_request('leagues', {'id': league_id} if league_id else None)
         
         if not response or 'response' not in response:
             logger.error("No se pudieron obtener las ligas")
@@ -125,13 +146,19 @@ class APIFootballClient:
     def get_fixtures_by_league(
         self,
         league_id: int,
-        season: int = 2023
+        season: int = 2023,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        status: Optional[str] = None
     ) -> List[Dict]:
         """Obtiene los partidos (fixtures) de una liga específica.
         
         Args:
             league_id: ID de la liga
             season: Temporada (año). Free plan: 2021-2023
+            date_from: Solo partidos desde esta fecha (YYYY-MM-DD)
+            date_to: Solo partidos hasta esta fecha (YYYY-MM-DD)
+            status: Filtro de estados de la API (ej: "NS-PST-TBD")
             
         Returns:
             Lista de partidos
@@ -142,6 +169,12 @@ class APIFootballClient:
             'league': league_id,
             'season': season
         }
+        if date_from:
+            params['from'] = date_from
+        if date_to:
+            params['to'] = date_to
+        if status:
+            params['status'] = status
         
         response = self._make_request('fixtures', params)
         
@@ -181,6 +214,18 @@ class APIFootballClient:
             logger.warning(f"No se pudo obtener clasificación de la liga {league_id}")
             return {}
         
+        return self.parse_standings(response)
+    
+    @staticmethod
+    def parse_standings(response: Dict) -> Dict[int, int]:
+        """Convierte la respuesta del endpoint 'standings' en {team_id: posición}.
+        
+        Args:
+            response: Respuesta JSON de la API
+            
+        Returns:
+            Diccionario {team_id: posición}
+        """
         standings_map = {}
         
         try:
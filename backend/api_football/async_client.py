@@ -0,0 +1,315 @@
+"""Cliente asíncrono para API-Futbol con limitador de peticiones compartido."""
+import asyncio
+import time
+from typing import Dict, List, Optional, Any
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .api_client import APIFootballClient
+from .response_cache import ResponseCache
+from .config import (
+    API_FOOTBALL_KEY,
+    API_FOOTBALL_BASE_URL,
+    API_TIMEOUT,
+    MAX_RETRIES,
+    RETRY_DELAY,
+    API_RATE_LIMIT_PER_MINUTE,
+    API_RATE_LIMIT_BURST,
+    API_MAX_CONCURRENCY
+)
+from .utils import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class TokenBucket:
+    """Limitador token bucket compartido por todas las peticiones de un cliente.
+    
+    Ritmo sostenido de `per_minute` peticiones por minuto con ráfagas de
+    hasta `burst`. Un 429 pausa a todas las peticiones (ver `pause`).
+    """
+    
+    def __init__(
+        self,
+        per_minute: int = API_RATE_LIMIT_PER_MINUTE,
+        burst: int = API_RATE_LIMIT_BURST
+    ):
+        """Inicializa el limitador.
+        
+        Args:
+            per_minute: Peticiones por minuto permitidas por el plan
+            burst: Máximo de peticiones seguidas sin esperar
+        """
+        self.rate = max(per_minute, 1) / 60.0
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+    
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    async def acquire(self) -> None:
+        """Espera hasta que haya un token disponible y lo consume."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+    
+    def pause(self, seconds: float) -> None:
+        """Detiene todas las peticiones durante `seconds` y vacía el bucket.
+        
+        Args:
+            seconds: Tiempo de espera (p. ej. cabecera Retry-After de un 429)
+        """
+        now = time.monotonic()
+        self.paused_until = max(self.paused_until, now + seconds)
+        self.tokens = 0.0
+        self.updated = self.paused_until
+
+
+class AsyncAPIFootballClient:
+    """Cliente asíncrono de API-Futbol.
+    
+    Usa una sesión HTTP con pool de conexiones keep-alive; cada petición se
+    ejecuta en un hilo (asyncio.to_thread) para que muchas ligas puedan
+    descargarse a la vez. Todas las peticiones pasan por un TokenBucket.
+    
+    Ejemplo:
+        async with AsyncAPIFootballClient() as client:
+            standings, fixtures = await asyncio.gather(
+                client.get_team_standings(140, 2023),
+                client.get_fixtures_by_league(140, 2023)
+            )
+    """
+    
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        limiter: Optional[TokenBucket] = None,
+        max_concurrency: int = API_MAX_CONCURRENCY,
+        cache: Optional[ResponseCache] = None
+    ):
+        """Inicializa el cliente.
+        
+        Args:
+            api_key: API key de API-Futbol. Si no se proporciona, usa la del config.
+            base_url: URL base de la API (p. ej. un servidor local de pruebas)
+            limiter: Limitador compartido. Por defecto, uno con el límite del config.
+            max_concurrency: Máximo de peticiones HTTP simultáneas
+            cache: Cache en disco de respuestas (opcional). En modo replay
+                no se hacen peticiones y la API key no es necesaria.
+        """
+        self.api_key = api_key or API_FOOTBALL_KEY
+        self.base_url = (base_url or API_FOOTBALL_BASE_URL).rstrip('/')
+        self.limiter = limiter or TokenBucket()
+        self.cache = cache
+        self.requests_made = 0
+        
+        if not self.api_key and not (cache and cache.replay):
+            raise ValueError("API key no configurada. Verifica el archivo .env")
+        
+        self.session = requests.Session()
+        self.session.headers.update({
+            'x-rapidapi-key': self.api_key,
+            'x-rapidapi-host': 'api-football-v1.p.rapidapi.com'
+        })
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        
+        logger.info("Cliente asíncrono API-Futbol inicializado correctamente")
+    
+    async def __aenter__(self) -> 'AsyncAPIFootballClient':
+        return self
+    
+    async def __aexit__(self, *exc) -> None:
+        self.close()
+    
+    def close(self) -> None:
+        """Cierra la sesión HTTP y sus conexiones."""
+        self.session.close()
+    
+    async def _make_request(
+        self,
+        endpoint: str,
+        params: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict]:
+        """Realiza una petición HTTP a la API con reintentos.
+        
+        Args:
+            endpoint: Endpoint de la API
+            params: Parámetros de la petición
+        
+        Returns:
+            Respuesta JSON de la API o None si falla
+        """
+        if self.cache:
+            cached = await asyncio.to_thread(self.cache.get, endpoint, params)
+            if cached is not None:
+                return cached
+            if self.cache.replay:
+                logger.error(f"Modo replay: {endpoint} {params or ''} no está en la cache")
+                return None
+        
+        url = f"{self.base_url}/{endpoint}"
+        
+        for attempt in range(MAX_RETRIES):
+            try:
+                logger.debug(f"Petición a {endpoint} (intento {attempt + 1}/{MAX_RETRIES})")
+                
+                await self.limiter.acquire()
+                async with self._semaphore:
+                    self.requests_made += 1
+                    response = await asyncio.to_thread(
+                        self.session.get,
+                        url,
+                        params=params,
+                        timeout=API_TIMEOUT
+                    )
+                
+                # Verificar códigos de respuesta
+                if response.status_code == 200:
+                    data = response.json()
+                    
+                    # Verificar si hay errores en la respuesta
+                    if data.get('errors'):
+                        logger.error(f"Error en la API: {data['errors']}")
+                        return None
+                    
+                    logger.debug(f"Petición exitosa a {endpoint}")
+                    if self.cache:
+                        await asyncio.to_thread(self.cache.put, endpoint, params, data)
+                    return data
+                
+                elif response.status_code == 429:
+                    retry_after = response.headers.get('Retry-After')
+                    wait = float(retry_after) if retry_after and retry_after.isdigit() else RETRY_DELAY * 2
+                    logger.warning(f"Rate limit alcanzado. Pausando peticiones {wait}s...")
+                    self.limiter.pause(wait)
+                    continue
+                
+                elif response.status_code >= 500:
+                    logger.error(f"Error del servidor: {response.status_code}")
+                    await asyncio.sleep(RETRY_DELAY)
+                    continue
+                
+                else:
+                    logger.error(f"Error HTTP {response.status_code}: {response.text}")
+                    return None
+            
+            except requests.exceptions.Timeout:
+                logger.warning(f"Timeout en {endpoint}. Reintentando...")
+                await asyncio.sleep(RETRY_DELAY)
+            
+            except requests.exceptions.ConnectionError:
+                logger.error(f"Error de conexión en {endpoint}")
+                await asyncio.sleep(RETRY_DELAY)
+            
+            except Exception as e:
+                logger.error(f"Error inesperado: {str(e)}")
+                return None
+        
+        logger.error(f"Todos los intentos fallaron para {endpoint}")
+        return None
+    
+    async def get_all_leagues(self, league_id: Optional[int] = None) -> List[Dict]:
+        """Obtiene todas las ligas disponibles.
+        
+        Args:
+            league_id: Si se indica, solo esa liga (parámetro 'id' de la API)
+        
+        Returns:
+            Lista de ligas
+        """
+        logger.info("Obteniendo todas las ligas..." if not league_id else f"Obteniendo liga {league_id}...")
+        
+        response = await self._make_request('leagues', {'id': league_id} if league_id else None)
+        
+        if not response or 'response' not in response:
+            logger.error("No se pudieron obtener las ligas")
+            return []
+        
+        leagues = response['response']
+        logger.info(f"Se encontraron {len(leagues)} ligas")
+        
+        return leagues
+    
+    async def get_fixtures_by_league(
+        self,
+        league_id: int,
+        season: int = 2023,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        status: Optional[str] = None
+    ) -> List[Dict]:
+        """Obtiene los partidos (fixtures) de una liga específica.
+        
+        Args:
+            league_id: ID de la liga
+            season: Temporada (año). Free plan: 2021-2023
+            date_from: Solo partidos desde esta fecha (YYYY-MM-DD)
+            date_to: Solo partidos hasta esta fecha (YYYY-MM-DD)
+            status: Filtro de estados de la API (ej: "NS-PST-TBD")
+        
+        Returns:
+            Lista de partidos
+        """
+        logger.info(f"Obteniendo partidos de la liga {league_id}, temporada {season}...")
+        
+        params = {'league': league_id, 'season': season}
+        if date_from:
+            params['from'] = date_from
+        if date_to:
+            params['to'] = date_to
+        if status:
+            params['status'] = status
+        
+        response = await self._make_request('fixtures', params)
+        
+        if not response or 'response' not in response:
+            logger.warning(f"No se pudieron obtener partidos de la liga {league_id}")
+            return []
+        
+        fixtures = response['response']
+        logger.info(f"Se encontraron {len(fixtures)} partidos para la liga {league_id}")
+        
+        return fixtures
+    
+    async def get_team_standings(
+        self,
+        league_id: int,
+        season: int = 2023
+    ) -> Dict[int, int]:
+        """Obtiene la posición de clasificación de los equipos en una liga.
+        
+        Args:
+            league_id: ID de la liga
+            season: Temporada (año). Free plan: 2021-2023
+        
+        Returns:
+            Diccionario {team_id: posición}
+        """
+        logger.info(f"Obteniendo clasificación de la liga {league_id}...")
+        
+        response = await self._make_request('standings', {'league': league_id, 'season': season})
+        
+        if not response or 'response' not in response:
+            logger.warning(f"No se pudo obtener clasificación de la liga {league_id}")
+            return {}
+        
+        return APIFootballClient.parse_standings(response)
@@ -24,6 +24,34 @@ API_TIMEOUT = 30  # segundos
 MAX_RETRIES = 3
 RETRY_DELAY = 2  # segundos
 
+# Límite de peticiones del plan (cliente asíncrono)
+API_RATE_LIMIT_PER_MINUTE = int(os.getenv('API_FOOTBALL_RATE_LIMIT', '10'))
+API_RATE_LIMIT_BURST = int(os.getenv('API_FOOTBALL_RATE_BURST', '5'))
+API_MAX_CONCURRENCY = 5  # peticiones HTTP simultáneas (tamaño del pool)
+
+# Cache en disco de respuestas (response_cache.py)
+CACHE_DIR = os.getenv('API_FOOTBALL_CACHE_DIR', str(ROOT_DIR / '.api_cache'))
+CACHE_DEFAULT_TTL = 60 * 60  # segundos
+CACHE_TTLS = {
+    'leagues': 7 * 24 * 60 * 60,   # casi nunca cambian
+    'standings': 6 * 60 * 60,
+    'fixtures': 15 * 60            # resultados en curso
+}
+
+# Escritura masiva de partidos
+BULK_CHUNK_SIZE = 500  # operaciones por bulk_write
+
+# Estados (status.long de la API) que ya no cambian: el delta los omite
+FINAL_STATUSES = (
+    'Match Finished',
+    'Match Finished After Extra Time',
+    'Match Finished After Penalty',
+    'Match Cancelled',
+    'Match Abandoned',
+    'Technical Loss',
+    'WalkOver'
+)
+
 # Configuración de logs
 LOG_LEVEL = 'INFO'
 LOG_FILE = 'api_football.log'
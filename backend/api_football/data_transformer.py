@@ -1,6 +1,8 @@
 """Transformador de datos de la API a formato requerido."""
 from typing import Dict, List, Optional, Any
 from datetime import datetime
+import hashlib
+import json
 from .utils import setup_logger, normalize_string
 
 logger = setup_logger(__name__)
@@ -84,6 +86,19 @@ class DataTransformer:
         
         return f"{season_id}_{jornada}_{local_code}-{visit_code}_{fecha_short}"
     
+    @staticmethod
+    def payload_hash(fixture: Dict) -> str:
+        """Hash estable del payload de un fixture (para detectar cambios).
+        
+        Args:
+            fixture: Datos del partido desde la API
+            
+        Returns:
+            Hash SHA-1 hexadecimal del JSON canónico
+        """
+        canonical = json.dumps(fixture, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+    
     @staticmethod
     def infer_season_from_date(fecha: str, season_hint: int = None) -> int:
         """Infiere el año de inicio de temporada basándose en la fecha.
@@ -210,6 +225,7 @@ class DataTransformer:
                 'match_id': match_id,                    # ID interno único
                 'season_id': season_id,                  # ID de temporada estructurado
                 'external_match_id': fixture_data.get('id'),  # ID de la API externa
+                'payload_hash': DataTransformer.payload_hash(fixture),  # Detecta cambios en re-scrapes
                 
                 # === CAMPOS LEGACY (mantener para compatibilidad) ===
                 'id_partido': fixture_data.get('id'),    # DEPRECADO - usar external_match_id
@@ -1,10 +1,19 @@
 """Gestor de base de datos MongoDB."""
-from pymongo import MongoClient, ASCENDING, DESCENDING
-from pymongo.errors import DuplicateKeyError, PyMongoError
+from pymongo import MongoClient, ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
 from typing import List, Dict, Any, Optional
 from datetime import datetime
-from .config import MONGO_URL, DB_NAME, COLLECTION_NAME, SEASONS_COLLECTION
+from .config import (
+    MONGO_URL,
+    DB_NAME,
+    COLLECTION_NAME,
+    SEASONS_COLLECTION,
+    BULK_CHUNK_SIZE,
+    FINAL_STATUSES
+)
 from .utils import setup_logger
+from prediction_engine.indices import asegurar_indices_sync, crear_indices_coleccion_sync
+from prediction_engine.h2h_pares import actualizar_h2h_sync, clave_par
 
 logger = setup_logger(__name__)
 
@@ -66,75 +75,45 @@ class DatabaseManager:
     def _create_indexes(self):
         """Crea índices necesarios en las colecciones."""
         try:
-            # ============================================
-            # ÍNDICES PARA football_matches
-            # ============================================
-            
-            # Índice único para match_id (nuevo identificador principal)
-            self.collection.create_index(
-                [('match_id', ASCENDING)],
-                unique=True,
-                sparse=True,  # Permitir documentos sin match_id (legacy)
-                name='idx_match_id'
-            )
-            
-            # Índice único para id_partido (legacy, mantener para compatibilidad)
-            self.collection.create_index(
-                [('id_partido', ASCENDING)],
-                unique=True,
-                name='idx_id_partido'
-            )
-            
-            # Índice para season_id (nuevo)
-            self.collection.create_index(
-                [('season_id', ASCENDING)],
-                sparse=True,
-                name='idx_season_id'
-            )
-            
-            # Índice compuesto para consultas por liga, temporada y fecha
-            self.collection.create_index(
-                [('season_id', ASCENDING), ('liga_id', ASCENDING), ('fecha', ASCENDING)],
-                name='idx_season_liga_fecha'
-            )
-            
-            # Índice compuesto legacy para consultas por liga y fecha
-            self.collection.create_index(
-                [('liga_id', ASCENDING), ('fecha', ASCENDING)],
-                name='idx_liga_fecha'
-            )
-            
-            # Índice para búsquedas por equipos
-            self.collection.create_index(
-                [('id_equipo_local', ASCENDING)],
-                name='idx_equipo_local'
-            )
-            
-            self.collection.create_index(
-                [('id_equipo_visitante', ASCENDING)],
-                name='idx_equipo_visitante'
-            )
-            
-            # ============================================
-            # ÍNDICES PARA seasons
-            # ============================================
-            
-            self.seasons_collection.create_index(
-                [('season_id', ASCENDING)],
-                unique=True,
-                name='idx_seasons_season_id'
-            )
+            self.create_match_indexes(self.collection)
+            self.create_season_indexes(self.seasons_collection)
             
-            self.seasons_collection.create_index(
-                [('liga_id', ASCENDING), ('year', DESCENDING)],
-                name='idx_seasons_liga_year'
-            )
+            # Resto de colecciones (estadísticas, pronósticos...): los mismos
+            # índices que crea el servidor al iniciar
+            asegurar_indices_sync(self.db)
             
             logger.info("Índices creados correctamente")
             
         except PyMongoError as e:
             logger.warning(f"Error creando índices: {str(e)}")
     
+    @staticmethod
+    def create_match_indexes(collection) -> None:
+        """Crea los índices de football_matches en una colección.
+        
+        Se usa también sobre colecciones de staging (importación) antes de
+        renombrarlas, para que entren en servicio ya indexadas.
+        
+        Args:
+            collection: Colección de pymongo
+        
+        Raises:
+            PyMongoError: Si falla la creación (p. ej. match_id duplicados)
+        """
+        crear_indices_coleccion_sync(collection, COLLECTION_NAME)
+    
+    @staticmethod
+    def create_season_indexes(collection) -> None:
+        """Crea los índices de seasons en una colección.
+        
+        Args:
+            collection: Colección de pymongo
+        
+        Raises:
+            PyMongoError: Si falla la creación
+        """
+        crear_indices_coleccion_sync(collection, SEASONS_COLLECTION)
+    
     def insert_match(self, match_data: Dict[str, Any]) -> bool:
         """Inserta un partido en la base de datos.
         
@@ -191,9 +170,146 @@ class DatabaseManager:
             logger.error(f"Error actualizando partido: {str(e)}")
             return False
     
-    def insert_many_matches(self, matches_data: List[Dict[str, Any]]) -> Dict[str, int]:
+    def insert_many_matches(
+        self,
+        matches_data: List[Dict[str, Any]],
+        bulk: bool = True,
+        chunk_size: int = BULK_CHUNK_SIZE
+    ) -> Dict[str, int]:
         """Inserta múltiples partidos en la base de datos.
         
+        Args:
+            matches_data: Lista de datos de partidos
+            bulk: Usar upserts masivos (un bulk_write por bloque) en lugar de
+                insert_one + update_one partido a partido
+            chunk_size: Operaciones por bulk_write
+            
+        Returns:
+            Diccionario con estadísticas de inserción. En modo bulk,
+            'duplicados' son los partidos existentes sin cambios.
+        """
+        if bulk:
+            stats = self._bulk_upsert_matches(matches_data, chunk_size)
+        else:
+            stats = self._insert_matches_one_by_one(matches_data)
+        
+        self.update_h2h_pairs(matches_data)
+        
+        logger.info(
+            f"Inserción completada - "
+            f"Insertados: {stats['insertados']}, "
+            f"Actualizados: {stats['actualizados']}, "
+            f"Duplicados: {stats['duplicados']}, "
+            f"Errores: {stats['errores']}"
+        )
+        
+        return stats
+    
+    def _bulk_upsert_matches(
+        self,
+        matches_data: List[Dict[str, Any]],
+        chunk_size: int
+    ) -> Dict[str, int]:
+        """Upsert de partidos (ver _build_upsert) con un bulk_write no ordenado por bloque.
+        
+        Cada operación es un update con pipeline que solo toca updated_at
+        si algún campo cambió, de modo que un partido idéntico cuenta como
+        sin cambios (matched pero no modified).
+        
+        Args:
+            matches_data: Lista de datos de partidos
+            chunk_size: Operaciones por bulk_write
+            
+        Returns:
+            Diccionario con estadísticas de inserción
+        """
+        stats = {
+            'insertados': 0,
+            'actualizados': 0,
+            'duplicados': 0,
+            'errores': 0
+        }
+        
+        operations = []
+        for match_data in matches_data:
+            operation = self._build_upsert(match_data)
+            if operation is None:
+                logger.error("Partido sin match_id ni id_partido, omitido")
+                stats['errores'] += 1
+            else:
+                operations.append(operation)
+        
+        for start in range(0, len(operations), max(chunk_size, 1)):
+            chunk = operations[start:start + chunk_size]
+            try:
+                result = self.collection.bulk_write(chunk, ordered=False)
+                upserted = result.upserted_count
+                matched = result.matched_count
+                modified = result.modified_count
+                errors = 0
+            except BulkWriteError as e:
+                details = e.details
+                upserted = details.get('nUpserted', 0)
+                matched = details.get('nMatched', 0)
+                modified = details.get('nModified', 0)
+                errors = len(details.get('writeErrors', []))
+                logger.error(f"Errores en bulk_write de partidos: {errors}")
+            except PyMongoError as e:
+                logger.error(f"Error en bulk_write de partidos: {str(e)}")
+                stats['errores'] += len(chunk)
+                continue
+            
+            stats['insertados'] += upserted
+            stats['actualizados'] += modified
+            stats['duplicados'] += matched - modified
+            stats['errores'] += errors
+        
+        return stats
+    
+    @staticmethod
+    def _build_upsert(match_data: Dict[str, Any]) -> Optional[UpdateOne]:
+        """Construye el upsert de un partido.
+        
+        La clave es el ID de la API (external_match_id), que no cambia si el
+        partido se reprograma (match_id incluye la fecha); sin él, match_id
+        o id_partido en legacy.
+        
+        Args:
+            match_data: Datos del partido
+            
+        Returns:
+            Operación UpdateOne o None si el partido no tiene identificador
+        """
+        if match_data.get('external_match_id') is not None:
+            query = {'external_match_id': match_data['external_match_id']}
+        elif match_data.get('match_id'):
+            query = {'match_id': match_data['match_id']}
+        elif match_data.get('id_partido'):
+            query = {'id_partido': match_data['id_partido']}
+        else:
+            return None
+        
+        fields = {
+            k: v for k, v in match_data.items()
+            if k not in ('_id', 'created_at', 'updated_at')
+        }
+        now = match_data.get('updated_at') or datetime.utcnow().isoformat()
+        changed = {'$or': [
+            {'$ne': [f'${k}', {'$literal': v}]} for k, v in fields.items()
+        ]}
+        
+        pipeline = [
+            {'$set': {
+                'updated_at': {'$cond': [changed, now, {'$ifNull': ['$updated_at', now]}]},
+                'created_at': {'$ifNull': ['$created_at', match_data.get('created_at', now)]}
+            }},
+            {'$set': {k: {'$literal': v} for k, v in fields.items()}}
+        ]
+        return UpdateOne(query, pipeline, upsert=True)
+    
+    def _insert_matches_one_by_one(self, matches_data: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Inserta partidos uno a uno; los existentes se actualizan con update_one.
+        
         Args:
             matches_data: Lista de datos de partidos
             
@@ -223,16 +339,78 @@ class DatabaseManager:
                 logger.error(f"Error insertando partido: {str(e)}")
                 stats['errores'] += 1
         
-        logger.info(
-            f"Inserción completada - "
-            f"Insertados: {stats['insertados']}, "
-            f"Actualizados: {stats['actualizados']}, "
-            f"Duplicados: {stats['duplicados']}, "
-            f"Errores: {stats['errores']}"
-        )
-        
         return stats
     
+    def update_h2h_pairs(self, matches_data: List[Dict[str, Any]]) -> int:
+        """Recalcula el índice H2H (h2h_pares) de las parejas de unos partidos.
+        
+        Solo se tocan las parejas de los partidos guardados; cada una se
+        recalcula desde football_matches, así que repetir la ingesta no
+        duplica enfrentamientos.
+        
+        Args:
+            matches_data: Partidos recién guardados
+            
+        Returns:
+            Número de parejas actualizadas
+        """
+        pairs_by_league: Dict[str, set] = {}
+        for match in matches_data:
+            if match.get('liga_id') and match.get('equipo_local') and match.get('equipo_visitante'):
+                pairs_by_league.setdefault(match['liga_id'], set()).add(
+                    clave_par(match['equipo_local'], match['equipo_visitante'])
+                )
+        
+        updated = 0
+        for liga_id, pairs in pairs_by_league.items():
+            try:
+                updated += actualizar_h2h_sync(self.db, liga_id, pairs)
+            except PyMongoError as e:
+                logger.warning(f"Error actualizando índice H2H de {liga_id}: {str(e)}")
+        return updated
+    
+    def get_fixture_sync_state(self, api_league_id: int, season: int) -> Dict[str, Any]:
+        """Obtiene lo ya guardado de una liga/temporada para el scrape incremental.
+        
+        Args:
+            api_league_id: ID de la liga en la API
+            season: Temporada (año de la API)
+            
+        Returns:
+            Diccionario con:
+            - total: partidos guardados
+            - hashes: {external_match_id: payload_hash}
+            - pending_from / pending_to: rango de fechas de los partidos
+              que aún pueden cambiar (None si no hay ninguno)
+            - latest: fecha del último partido guardado (None si no hay)
+        """
+        state = {'total': 0, 'hashes': {}, 'pending_from': None, 'pending_to': None, 'latest': None}
+        
+        try:
+            cursor = self.collection.find(
+                {'api_league_id': api_league_id, 'season': season},
+                {'_id': 0, 'external_match_id': 1, 'payload_hash': 1, 'estado_del_partido': 1, 'fecha': 1}
+            )
+            
+            pending_dates = []
+            for doc in cursor:
+                state['total'] += 1
+                if doc.get('fecha') and (state['latest'] is None or doc['fecha'] > state['latest']):
+                    state['latest'] = doc['fecha']
+                if doc.get('external_match_id') is not None and doc.get('payload_hash'):
+                    state['hashes'][doc['external_match_id']] = doc['payload_hash']
+                if doc.get('estado_del_partido') not in FINAL_STATUSES and doc.get('fecha'):
+                    pending_dates.append(doc['fecha'])
+            
+            if pending_dates:
+                state['pending_from'] = min(pending_dates)
+                state['pending_to'] = max(pending_dates)
+            
+        except PyMongoError as e:
+            logger.error(f"Error obteniendo estado de sincronización: {str(e)}")
+        
+        return state
+    
     def upsert_season(self, season_data: Dict[str, Any]) -> bool:
         """Inserta o actualiza una temporada.
         
@@ -3,12 +3,21 @@
 
 import csv
 import json
+import re
+from datetime import date, datetime, timezone
 from pymongo import MongoClient
 import os
 from dotenv import load_dotenv
 from pathlib import Path
 import argparse
 
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Opcional: solo para --format parquet
+    pa = None
+    pq = None
+
 # Cargar variables de entorno
 ROOT_DIR = Path(__file__).parent.parent
 load_dotenv(ROOT_DIR / '.env')
@@ -16,6 +25,18 @@ load_dotenv(ROOT_DIR / '.env')
 MONGO_URL = os.getenv('MONGO_URL', 'mongodb://localhost:27017')
 DB_NAME = os.getenv('DB_NAME', 'test_database')
 
+# Colecciones que forman un snapshot (mismos nombres de archivo que
+# espera data_export/import_data.py)
+SNAPSHOT_COLLECTIONS = ['football_matches', 'team_statistics', 'seasons']
+
+# Metadato de columna Parquet: fechas que en MongoDB se guardan como texto
+# YYYY-MM-DD (ej: 'fecha'); el importador las vuelve a convertir a texto
+PARQUET_TYPE_KEY = b'mongo_tipo'
+PARQUET_DATE_STRING = b'fecha_texto'
+
+DATE_STRING_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+DATETIME_STRING_RE = re.compile(r'^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}')
+
 
 def export_to_csv(output_file: str, liga_id: str = None, limit: int = 0):
     """Exporta datos a CSV.
@@ -166,6 +187,130 @@ def export_table_format(output_file: str, liga_id: str = None, limit: int = 10):
     client.close()
 
 
+def _parse_datetime(value: str) -> datetime:
+    """Texto ISO -> datetime naive en UTC (como los devuelve pymongo)."""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _parquet_column(name: str, values: list):
+    """Construye una columna Arrow tipada a partir de los valores de un campo.
+    
+    Fechas 'YYYY-MM-DD' -> date32 (con metadato para restaurarlas como
+    texto), datetime o texto ISO -> timestamp, enteros -> int64 y números
+    mixtos -> float64. El resto (texto, sub-documentos) lo infiere Arrow.
+    
+    Args:
+        name: Nombre del campo
+        values: Valores del campo en cada documento (None si falta)
+    
+    Returns:
+        Tupla (pa.Field, pa.Array)
+    """
+    present = [v for v in values if v is not None]
+    metadata = None
+    
+    if present and all(isinstance(v, datetime) for v in present):
+        array = pa.array(values, type=pa.timestamp('us'))
+    elif present and all(isinstance(v, str) and DATE_STRING_RE.match(v) for v in present):
+        array = pa.array(
+            [date.fromisoformat(v) if v is not None else None for v in values],
+            type=pa.date32()
+        )
+        metadata = {PARQUET_TYPE_KEY: PARQUET_DATE_STRING}
+    elif present and all(isinstance(v, str) and DATETIME_STRING_RE.match(v) for v in present):
+        array = pa.array(
+            [_parse_datetime(v) if v is not None else None for v in values],
+            type=pa.timestamp('us')
+        )
+    elif present and all(isinstance(v, bool) for v in present):
+        array = pa.array(values, type=pa.bool_())
+    elif present and all(isinstance(v, int) and not isinstance(v, bool) for v in present):
+        array = pa.array(values, type=pa.int64())
+    elif present and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+        array = pa.array([float(v) if v is not None else None for v in values], type=pa.float64())
+    else:
+        try:
+            array = pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Tipos mezclados: guardar como texto
+            array = pa.array([str(v) if v is not None else None for v in values], type=pa.string())
+    
+    return pa.field(name, array.type, metadata=metadata), array
+
+
+def documents_to_table(documents: list):
+    """Convierte documentos de MongoDB en una tabla Arrow con columnas tipadas.
+    
+    Args:
+        documents: Lista de documentos (sin _id)
+    
+    Returns:
+        pa.Table con una columna por campo (en orden de aparición)
+    """
+    names = list(dict.fromkeys(key for doc in documents for key in doc))
+    fields, arrays = [], []
+    for name in names:
+        field, array = _parquet_column(name, [doc.get(name) for doc in documents])
+        fields.append(field)
+        arrays.append(array)
+    
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+
+def export_to_parquet(
+    output_file: str,
+    liga_id: str = None,
+    limit: int = 0,
+    collection_name: str = 'football_matches'
+):
+    """Exporta una colección a Parquet (columnar, comprimido con zstd).
+    
+    Las fechas y los enteros quedan como columnas tipadas, así que el
+    archivo se puede cargar directamente con pandas.read_parquet o
+    importar con data_export/import_data.py.
+    
+    Args:
+        output_file: Archivo de salida (.parquet)
+        liga_id: Filtrar por liga específica (opcional)
+        limit: Límite de registros (0 = todos)
+        collection_name: Colección a exportar
+    """
+    if pa is None:
+        print("pyarrow no está instalado: pip install pyarrow")
+        return
+    
+    client = MongoClient(MONGO_URL)
+    db = client[DB_NAME]
+    collection = db[collection_name]
+    
+    # Construir query
+    query = {}
+    if liga_id:
+        query['liga_id'] = liga_id
+    
+    # Obtener datos
+    cursor = collection.find(query, {'_id': 0})
+    if limit > 0:
+        cursor = cursor.limit(limit)
+    
+    documents = list(cursor)
+    
+    if not documents:
+        print(f"No hay datos para exportar en {collection_name}")
+        client.close()
+        return
+    
+    # Escribir Parquet
+    table = documents_to_table(documents)
+    pq.write_table(table, output_file, compression='zstd')
+    
+    print(f"✓ Exportados {len(documents)} documentos de {collection_name} a {output_file} ({os.path.getsize(output_file) / 1024:.1f} KB)")
+    client.close()
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(
         description='Exporta datos de partidos a diferentes formatos'
@@ -174,7 +319,7 @@ if __name__ == '__main__':
     parser.add_argument(
         '--format',
         type=str,
-        choices=['csv', 'json', 'table'],
+        choices=['csv', 'json', 'table', 'parquet'],
         required=True,
         help='Formato de exportación'
     )
@@ -183,7 +328,15 @@ if __name__ == '__main__':
         '--output',
         type=str,
         required=True,
-        help='Archivo de salida'
+        help='Archivo de salida (directorio con --collection all)'
+    )
+    
+    parser.add_argument(
+        '--collection',
+        type=str,
+        choices=SNAPSHOT_COLLECTIONS + ['all'],
+        default='football_matches',
+        help='Colección a exportar (solo parquet; all = snapshot completo)'
     )
     
     parser.add_argument(
@@ -207,3 +360,10 @@ if __name__ == '__main__':
         export_to_json(args.output, args.liga, args.limit)
     elif args.format == 'table':
         export_table_format(args.output, args.liga, args.limit)
+    elif args.format == 'parquet':
+        if args.collection == 'all':
+            os.makedirs(args.output, exist_ok=True)
+            for name in SNAPSHOT_COLLECTIONS:
+                export_to_parquet(os.path.join(args.output, f"{name}.parquet"), args.liga, args.limit, name)
+        else:
+            export_to_parquet(args.output, args.liga, args.limit, args.collection)
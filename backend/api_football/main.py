@@ -1,11 +1,14 @@
 #!/usr/bin/env python3
 """Script principal para extraer datos de API-Futbol y almacenarlos en MongoDB."""
 import argparse
+import asyncio
 import sys
-from typing import Optional
+from typing import Callable, Dict, List, Optional, Tuple
 from .api_client import APIFootballClient
+from .async_client import AsyncAPIFootballClient
 from .data_transformer import DataTransformer
 from .db_manager import DatabaseManager
+from .response_cache import ResponseCache
 from .utils import setup_logger
 
 logger = setup_logger(__name__)
@@ -15,7 +18,8 @@ def process_league(
     api_client: APIFootballClient,
     db_manager: DatabaseManager,
     league_info: dict,
-    season: int = 2023
+    season: int = 2023,
+    delta: bool = True
 ) -> dict:
     """Procesa una liga específica: obtiene fixtures, transforma y guarda.
     
@@ -24,6 +28,7 @@ def process_league(
         db_manager: Gestor de base de datos
         league_info: Información de la liga
         season: Temporada a procesar (Free plan: 2021-2023)
+        delta: Descargar solo los partidos que aún pueden cambiar (ver plan_fixture_fetch)
         
     Returns:
         Diccionario con estadísticas del procesamiento
@@ -36,50 +41,76 @@ def process_league(
     logger.info(f"Procesando: {country_name} - {league_name} (ID: {league_id})")
     logger.info(f"{'='*60}")
     
-    stats = {
-        'liga': league_name,
-        'pais': country_name,
-        'fixtures_obtenidos': 0,
-        'fixtures_transformados': 0,
-        'insertados': 0,
-        'duplicados': 0,
-        'errores': 0
-    }
+    stats = _new_league_stats(league_info)
     
     try:
+        fetch_params, known_hashes = plan_fixture_fetch(
+            db_manager, league_id, season, delta, season_end(league_info, season)
+        )
+        if fetch_params is None:
+            return stats
+        
         # 1. Obtener clasificación de equipos
         logger.info("Obteniendo clasificación de equipos...")
         standings = api_client.get_team_standings(league_id, season)
         
         # 2. Obtener fixtures
         logger.info("Obteniendo partidos...")
-        fixtures = api_client.get_fixtures_by_league(league_id, season)
-        stats['fixtures_obtenidos'] = len(fixtures)
+        fixtures = api_client.get_fixtures_by_league(league_id, season, **fetch_params)
         
-        if not fixtures:
-            logger.warning(f"No se encontraron partidos para {league_name}")
-            return stats
+        # 3-4. Transformar y guardar
+        store_league(db_manager, league_info, fixtures, standings, stats, known_hashes)
         
-        # 3. Transformar datos
-        logger.info("Transformando datos...")
-        transformed_matches = DataTransformer.batch_transform(
-            fixtures,
-            league_info,
-            standings
-        )
-        stats['fixtures_transformados'] = len(transformed_matches)
+    except Exception as e:
+        logger.error(f"Error procesando liga {league_name}: {str(e)}")
+        stats['errores'] += 1
+    
+    return stats
+
+
+async def process_league_async(
+    api_client: AsyncAPIFootballClient,
+    db_manager: DatabaseManager,
+    league_info: dict,
+    season: int = 2023,
+    delta: bool = True
+) -> dict:
+    """Versión asíncrona de process_league.
+    
+    Descarga clasificación y partidos a la vez; la transformación y el
+    guardado (pymongo síncrono) se ejecutan en un hilo.
+    
+    Args:
+        api_client: Cliente asíncrono de la API
+        db_manager: Gestor de base de datos
+        league_info: Información de la liga
+        season: Temporada a procesar (Free plan: 2021-2023)
+        delta: Descargar solo los partidos que aún pueden cambiar
         
-        # 4. Guardar en base de datos
-        logger.info("Guardando en base de datos...")
-        insert_stats = db_manager.insert_many_matches(transformed_matches)
+    Returns:
+        Diccionario con estadísticas del procesamiento
+    """
+    league_id = league_info['league']['id']
+    league_name = league_info['league']['name']
+    
+    stats = _new_league_stats(league_info)
+    
+    try:
+        fetch_params, known_hashes = await asyncio.to_thread(
+            plan_fixture_fetch, db_manager, league_id, season, delta,
+            season_end(league_info, season)
+        )
+        if fetch_params is None:
+            return stats
         
-        stats['insertados'] = insert_stats['insertados']
-        stats['duplicados'] = insert_stats['duplicados']
-        stats['errores'] = insert_stats['errores']
+        logger.info(f"Descargando {league_info['country']['name']} - {league_name} (ID: {league_id})")
+        standings, fixtures = await asyncio.gather(
+            api_client.get_team_standings(league_id, season),
+            api_client.get_fixtures_by_league(league_id, season, **fetch_params)
+        )
         
-        logger.info(
-            f"✓ Liga procesada: {stats['insertados']} nuevos, "
-            f"{stats['duplicados']} duplicados"
+        await asyncio.to_thread(
+            store_league, db_manager, league_info, fixtures, standings, stats, known_hashes
         )
         
     except Exception as e:
@@ -89,11 +120,319 @@ def process_league(
     return stats
 
 
+async def process_leagues_async(
+    api_client: AsyncAPIFootballClient,
+    db_manager: DatabaseManager,
+    leagues: List[dict],
+    season: int = 2023,
+    delta: bool = True
+) -> List[dict]:
+    """Procesa varias ligas concurrentemente.
+    
+    La concurrencia real la limitan el TokenBucket y el pool HTTP del
+    cliente, de modo que se respeta la cuota del plan.
+    
+    Args:
+        api_client: Cliente asíncrono de la API
+        db_manager: Gestor de base de datos
+        leagues: Ligas a procesar
+        season: Temporada a procesar
+        delta: Descargar solo los partidos que aún pueden cambiar
+        
+    Returns:
+        Estadísticas de cada liga, en el mismo orden que `leagues`
+    """
+    return await asyncio.gather(*(
+        process_league_async(api_client, db_manager, league_info, season, delta)
+        for league_info in leagues
+    ))
+
+
+def _new_league_stats(league_info: dict) -> dict:
+    """Estadísticas vacías del procesamiento de una liga."""
+    return {
+        'liga': league_info['league']['name'],
+        'pais': league_info['country']['name'],
+        'api_league_id': league_info['league']['id'],
+        'fixtures_obtenidos': 0,
+        'fixtures_transformados': 0,
+        'insertados': 0,
+        'actualizados': 0,
+        'duplicados': 0,
+        'errores': 0,
+        'liga_id': None,
+        'season_ids': []
+    }
+
+
+def season_end(league_info: dict, season: int) -> str:
+    """Último día de la temporada según la API (respuesta de /leagues).
+    
+    Si la liga no trae sus temporadas, se usa el 31/12 del año siguiente
+    (ninguna temporada termina más tarde).
+    """
+    for item in league_info.get('seasons') or []:
+        if item.get('year') == season and item.get('end'):
+            return item['end']
+    return f"{season + 1}-12-31"
+
+
+def plan_fixture_fetch(
+    db_manager: DatabaseManager,
+    league_id: int,
+    season: int,
+    delta: bool = True,
+    date_to: Optional[str] = None
+) -> Tuple[Optional[dict], Dict[int, str]]:
+    """Decide qué partidos descargar de una liga según lo ya guardado.
+    
+    - Sin partidos guardados (o delta=False): temporada completa.
+    - Con partidos pendientes (no terminados): desde el primer pendiente
+      hasta el final de la temporada, para recoger también los aplazados
+      que se reprogramen después del último pendiente.
+    - Todos terminados: desde el último partido guardado hasta el final
+      de la temporada, por si la API añade partidos (ej: promociones).
+    
+    Los partidos sin cambios se descartan después por su payload_hash.
+    
+    Args:
+        db_manager: Gestor de base de datos
+        league_id: ID de la liga en la API
+        season: Temporada (año de la API)
+        delta: Si False, siempre descarga la temporada completa
+        date_to: Final de la temporada (ver season_end); por defecto el
+            31/12 del año siguiente
+        
+    Returns:
+        (parámetros para get_fixtures_by_league, {external_match_id:
+        payload_hash} guardados)
+    """
+    if not delta:
+        return {}, {}
+    
+    state = db_manager.get_fixture_sync_state(league_id, season)
+    
+    if state['total'] == 0:
+        return {}, {}
+    
+    date_from = state['pending_from'] or state['latest']
+    if date_from is None:
+        # Partidos sin fecha: no hay desde dónde descargar de forma incremental
+        return {}, state['hashes']
+    
+    date_to = date_to or f"{season + 1}-12-31"
+    logger.info(
+        f"Liga {league_id} temporada {season}: descarga incremental "
+        f"{date_from} → {date_to}"
+        + ("" if state['pending_from'] else " (todos los partidos terminados)")
+    )
+    return {'date_from': date_from, 'date_to': date_to}, state['hashes']
+
+
+def store_league(
+    db_manager: DatabaseManager,
+    league_info: dict,
+    fixtures: List[dict],
+    standings: Dict[int, int],
+    stats: dict,
+    known_hashes: Optional[Dict[int, str]] = None
+) -> dict:
+    """Transforma los fixtures de una liga y los guarda en la base de datos.
+    
+    Args:
+        db_manager: Gestor de base de datos
+        league_info: Información de la liga
+        fixtures: Partidos obtenidos de la API
+        standings: Clasificación {team_id: posición}
+        stats: Estadísticas del procesamiento (se actualizan)
+        known_hashes: {external_match_id: payload_hash} ya guardados; los
+            fixtures con el mismo hash no se transforman ni se escriben
+        
+    Returns:
+        El mismo diccionario `stats`
+    """
+    league_name = league_info['league']['name']
+    stats['fixtures_obtenidos'] = len(fixtures)
+    
+    if known_hashes:
+        changed = [
+            f for f in fixtures
+            if known_hashes.get(f.get('fixture', {}).get('id')) != DataTransformer.payload_hash(f)
+        ]
+        stats['duplicados'] += len(fixtures) - len(changed)
+        fixtures = changed
+    
+    if not fixtures:
+        logger.info(f"Sin partidos nuevos o modificados para {league_name}")
+        return stats
+    
+    # Transformar datos
+    logger.info("Transformando datos...")
+    transformed_matches = DataTransformer.batch_transform(
+        fixtures,
+        league_info,
+        standings
+    )
+    stats['fixtures_transformados'] = len(transformed_matches)
+    if transformed_matches:
+        stats['liga_id'] = transformed_matches[0]['liga_id']
+        stats['season_ids'] = sorted({m['season_id'] for m in transformed_matches})
+    
+    # Guardar en base de datos
+    logger.info("Guardando en base de datos...")
+    insert_stats = db_manager.insert_many_matches(transformed_matches)
+    
+    stats['insertados'] = insert_stats['insertados']
+    stats['actualizados'] = insert_stats['actualizados']
+    stats['duplicados'] += insert_stats['duplicados']
+    stats['errores'] = insert_stats['errores']
+    
+    logger.info(
+        f"✓ Liga procesada ({league_name}): {stats['insertados']} nuevos, "
+        f"{stats['actualizados']} actualizados, {stats['duplicados']} sin cambios"
+    )
+    
+    return stats
+
+
+def select_leagues(
+    all_leagues: List[dict],
+    limit_leagues: Optional[int] = None,
+    specific_league_id: Optional[int] = None
+) -> List[dict]:
+    """Filtra las ligas a procesar según los argumentos de línea de comandos.
+    
+    Args:
+        all_leagues: Ligas devueltas por la API
+        limit_leagues: Límite de ligas a procesar (para pruebas)
+        specific_league_id: ID específico de liga a procesar (opcional)
+        
+    Returns:
+        Ligas a procesar (vacío si no hay ninguna)
+    """
+    if specific_league_id:
+        leagues = [l for l in all_leagues if l['league']['id'] == specific_league_id]
+        
+        if not leagues:
+            logger.error(f"No se encontró liga con ID {specific_league_id}")
+            return []
+    else:
+        leagues = all_leagues
+    
+    if not leagues:
+        logger.error("No se pudieron obtener ligas")
+        return []
+    
+    # Aplicar límite si se especificó
+    if limit_leagues and limit_leagues > 0:
+        logger.info(f"Limitando a {limit_leagues} ligas para pruebas")
+        leagues = leagues[:limit_leagues]
+    
+    return leagues
+
+
+async def run_async(
+    api_key: Optional[str],
+    db_manager: DatabaseManager,
+    limit_leagues: Optional[int] = None,
+    season: int = 2023,
+    specific_league_id: Optional[int] = None,
+    delta: bool = True,
+    cache: Optional[ResponseCache] = None
+) -> Optional[List[dict]]:
+    """Obtiene las ligas y las procesa con el cliente asíncrono.
+    
+    Returns:
+        Estadísticas por liga, o None si no hay ligas que procesar
+    """
+    async with AsyncAPIFootballClient(api_key, cache=cache) as api_client:
+        leagues = select_leagues(
+            await api_client.get_all_leagues(specific_league_id), limit_leagues, specific_league_id
+        )
+        if not leagues:
+            return None
+        
+        logger.info(f"\nTotal de ligas a procesar: {len(leagues)} (modo concurrente)\n")
+        all_stats = await process_leagues_async(api_client, db_manager, leagues, season, delta)
+        logger.info(f"Peticiones HTTP realizadas: {api_client.requests_made}")
+        return all_stats
+
+
+async def scrape(
+    league_ids: Optional[List[int]] = None,
+    season: int = 2023,
+    limit_leagues: Optional[int] = None,
+    api_key: Optional[str] = None,
+    db_manager: Optional[DatabaseManager] = None,
+    progress: Optional[Callable[[int, int, dict], None]] = None,
+    delta: bool = True,
+    use_cache: bool = True
+) -> List[dict]:
+    """Pipeline de ingesta en proceso (lo usa el servidor como tarea asíncrona).
+    
+    Las peticiones HTTP y la escritura en MongoDB se ejecutan en hilos, de
+    modo que el event loop que la llama sigue atendiendo otras peticiones.
+    Cancelar la tarea detiene la descarga de las ligas pendientes.
+    
+    Args:
+        league_ids: IDs de ligas de la API (None = todas)
+        season: Temporada a procesar
+        limit_leagues: Límite de ligas cuando no se indican league_ids
+        api_key: API key de API-Futbol
+        db_manager: Gestor de base de datos ya conectado (opcional)
+        progress: Callback progress(ligas_terminadas, total_ligas, stats_liga)
+        delta: Descargar solo los partidos que aún pueden cambiar
+        use_cache: Usar la cache en disco de respuestas
+        
+    Returns:
+        Estadísticas por liga (ver process_league), con 'liga_id' y
+        'season_ids' de los partidos escritos
+    """
+    own_db = db_manager is None
+    if own_db:
+        db_manager = DatabaseManager()
+        if not await asyncio.to_thread(db_manager.connect):
+            raise RuntimeError("No se pudo conectar a MongoDB")
+    
+    try:
+        cache = ResponseCache() if use_cache else None
+        async with AsyncAPIFootballClient(api_key, cache=cache) as api_client:
+            if league_ids:
+                found = await asyncio.gather(*(api_client.get_all_leagues(i) for i in league_ids))
+                leagues = [l for result in found for l in result if l['league']['id'] in league_ids]
+            else:
+                leagues = select_leagues(await api_client.get_all_leagues(), limit_leagues)
+            
+            if not leagues:
+                logger.error("No se encontraron ligas para procesar")
+                return []
+            
+            total = len(leagues)
+            done = 0
+            
+            async def run_league(league_info: dict) -> dict:
+                nonlocal done
+                stats = await process_league_async(api_client, db_manager, league_info, season, delta)
+                done += 1
+                if progress:
+                    progress(done, total, stats)
+                return stats
+            
+            return await asyncio.gather(*(run_league(l) for l in leagues))
+    finally:
+        if own_db:
+            db_manager.close()
+
+
 def main(
     api_key: Optional[str] = None,
     limit_leagues: Optional[int] = None,
     season: int = 2023,
-    specific_league_id: Optional[int] = None
+    specific_league_id: Optional[int] = None,
+    sequential: bool = False,
+    full_refresh: bool = False,
+    use_cache: bool = True,
+    replay: bool = False
 ) -> int:
     """Función principal del script.
     
@@ -102,6 +441,10 @@ def main(
         limit_leagues: Límite de ligas a procesar (para pruebas)
         season: Temporada a procesar (Free plan: 2021-2023)
         specific_league_id: ID específico de liga a procesar (opcional)
+        sequential: Usar el cliente síncrono y procesar las ligas una a una
+        full_refresh: Descargar la temporada completa aunque ya esté guardada
+        use_cache: Usar la cache en disco de respuestas (response_cache.py)
+        replay: Servir todas las respuestas desde la cache, sin red
         
     Returns:
         Código de salida (0 = éxito, 1 = error)
@@ -111,11 +454,7 @@ def main(
     logger.info("="*80 + "\n")
     
     try:
-        # 1. Inicializar cliente API
-        logger.info("Inicializando cliente API...")
-        api_client = APIFootballClient(api_key)
-        
-        # 2. Inicializar gestor de base de datos
+        # 1. Inicializar gestor de base de datos
         logger.info("Conectando a MongoDB...")
         db_manager = DatabaseManager()
         
@@ -123,39 +462,47 @@ def main(
             logger.error("No se pudo conectar a MongoDB")
             return 1
         
-        # 3. Obtener ligas
         if specific_league_id:
             logger.info(f"Modo específico: procesando solo liga ID {specific_league_id}")
-            all_leagues = api_client.get_all_leagues()
-            leagues = [l for l in all_leagues if l['league']['id'] == specific_league_id]
+        
+        cache = ResponseCache(replay=replay) if (use_cache or replay) else None
+        if replay:
+            logger.info(f"Modo replay: respuestas servidas desde {cache.directory}")
+        
+        if sequential:
+            # 2. Inicializar cliente API
+            logger.info("Inicializando cliente API...")
+            api_client = APIFootballClient(api_key, cache=cache)
             
+            # 3. Obtener ligas
+            logger.info("Obteniendo ligas disponibles...")
+            leagues = select_leagues(
+                api_client.get_all_leagues(specific_league_id), limit_leagues, specific_league_id
+            )
             if not leagues:
-                logger.error(f"No se encontró liga con ID {specific_league_id}")
                 return 1
-        else:
-            logger.info("Obteniendo todas las ligas disponibles...")
-            leagues = api_client.get_all_leagues()
-        
-        if not leagues:
-            logger.error("No se pudieron obtener ligas")
-            return 1
-        
-        # Aplicar límite si se especificó
-        if limit_leagues and limit_leagues > 0:
-            logger.info(f"Limitando a {limit_leagues} ligas para pruebas")
-            leagues = leagues[:limit_leagues]
-        
-        total_leagues = len(leagues)
-        logger.info(f"\nTotal de ligas a procesar: {total_leagues}\n")
-        
-        # 4. Procesar cada liga
-        all_stats = []
-        
-        for idx, league_info in enumerate(leagues, 1):
-            logger.info(f"\nProcesando liga {idx}/{total_leagues}")
             
-            stats = process_league(api_client, db_manager, league_info, season)
-            all_stats.append(stats)
+            total_leagues = len(leagues)
+            logger.info(f"\nTotal de ligas a procesar: {total_leagues}\n")
+            
+            # 4. Procesar cada liga
+            all_stats = []
+            
+            for idx, league_info in enumerate(leagues, 1):
+                logger.info(f"\nProcesando liga {idx}/{total_leagues}")
+                
+                stats = process_league(
+                    api_client, db_manager, league_info, season, delta=not full_refresh
+                )
+                all_stats.append(stats)
+        else:
+            # 2-4. Cliente asíncrono: ligas concurrentes bajo el limitador
+            all_stats = asyncio.run(run_async(
+                api_key, db_manager, limit_leagues, season, specific_league_id,
+                delta=not full_refresh, cache=cache
+            ))
+            if all_stats is None:
+                return 1
         
         # 5. Resumen final
         logger.info("\n" + "="*80)
@@ -164,14 +511,18 @@ def main(
         
         total_fixtures = sum(s['fixtures_obtenidos'] for s in all_stats)
         total_insertados = sum(s['insertados'] for s in all_stats)
+        total_actualizados = sum(s['actualizados'] for s in all_stats)
         total_duplicados = sum(s['duplicados'] for s in all_stats)
         total_errores = sum(s['errores'] for s in all_stats)
         
         logger.info(f"Ligas procesadas: {len(all_stats)}")
         logger.info(f"Total fixtures obtenidos: {total_fixtures}")
         logger.info(f"Total insertados en BD: {total_insertados}")
+        logger.info(f"Total actualizados: {total_actualizados}")
         logger.info(f"Total duplicados: {total_duplicados}")
         logger.info(f"Total errores: {total_errores}")
+        if cache:
+            logger.info(f"Cache de respuestas: {cache.hits} aciertos, {cache.misses} fallos")
         
         # Obtener estadísticas de la BD
         logger.info("\nEstadísticas de la base de datos:")
@@ -235,13 +586,41 @@ if __name__ == '__main__':
         help='ID específico de liga a procesar (procesa solo esa liga)'
     )
     
+    parser.add_argument(
+        '--sequential',
+        action='store_true',
+        help='Procesar las ligas una a una con el cliente síncrono'
+    )
+    
+    parser.add_argument(
+        '--full',
+        action='store_true',
+        help='Descargar la temporada completa (sin delta de partidos pendientes)'
+    )
+    
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='No usar la cache en disco de respuestas de la API'
+    )
+    
+    parser.add_argument(
+        '--replay',
+        action='store_true',
+        help='Modo sin red: servir todas las respuestas desde la cache en disco'
+    )
+    
     args = parser.parse_args()
     
     exit_code = main(
         api_key=args.api_key,
         limit_leagues=args.limit,
         season=args.season,
-        specific_league_id=args.league_id
+        specific_league_id=args.league_id,
+        sequential=args.sequential,
+        full_refresh=args.full,
+        use_cache=not args.no_cache,
+        replay=args.replay
     )
     
     sys.exit(exit_code)
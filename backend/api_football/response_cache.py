@@ -0,0 +1,124 @@
+"""Cache en disco de respuestas de API-Futbol."""
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .config import CACHE_DIR, CACHE_TTLS, CACHE_DEFAULT_TTL
+from .utils import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class ResponseCache:
+    """Cache de respuestas JSON en disco, direccionada por contenido.
+    
+    Cada respuesta se guarda comprimida (gzip) en
+    `<directorio>/<endpoint>/<sha256(endpoint + params)>.json.gz` junto con
+    su fecha de descarga. Cada endpoint tiene su propio TTL.
+    
+    En modo replay las entradas nunca caducan y los clientes no salen a la
+    red: sirve para trabajar sin conexión y para medir el pipeline de
+    ingesta de forma determinista.
+    """
+    
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        ttls: Optional[Dict[str, int]] = None,
+        replay: bool = False
+    ):
+        """Inicializa la cache.
+        
+        Args:
+            directory: Directorio de la cache (por defecto CACHE_DIR)
+            ttls: TTL en segundos por endpoint (por defecto CACHE_TTLS)
+            replay: Servir solo desde la cache, sin caducidad
+        """
+        self.directory = Path(directory or CACHE_DIR)
+        self.ttls = ttls if ttls is not None else CACHE_TTLS
+        self.replay = replay
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def key(endpoint: str, params: Optional[Dict[str, Any]] = None) -> str:
+        """Clave de una petición: SHA-256 del endpoint y sus parámetros ordenados.
+        
+        Args:
+            endpoint: Endpoint de la API
+            params: Parámetros de la petición
+        
+        Returns:
+            Hash hexadecimal
+        """
+        canonical = json.dumps(
+            {'endpoint': endpoint, 'params': {k: str(v) for k, v in (params or {}).items()}},
+            sort_keys=True,
+            separators=(',', ':')
+        )
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+    
+    def _path(self, endpoint: str, params: Optional[Dict[str, Any]]) -> Path:
+        return self.directory / endpoint / f"{self.key(endpoint, params)}.json.gz"
+    
+    def get(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Optional[Dict]:
+        """Obtiene una respuesta de la cache.
+        
+        Args:
+            endpoint: Endpoint de la API
+            params: Parámetros de la petición
+        
+        Returns:
+            Respuesta JSON o None si no está o caducó
+        """
+        path = self._path(endpoint, params)
+        
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Entrada de cache ilegible {path.name}: {str(e)}")
+            self.misses += 1
+            return None
+        
+        ttl = self.ttls.get(endpoint, CACHE_DEFAULT_TTL)
+        if not self.replay and time.time() - entry.get('stored_at', 0) > ttl:
+            self.misses += 1
+            return None
+        
+        self.hits += 1
+        logger.debug(f"Cache hit: {endpoint} {params}")
+        return entry['data']
+    
+    def put(self, endpoint: str, params: Optional[Dict[str, Any]], data: Dict) -> None:
+        """Guarda una respuesta en la cache (escritura atómica).
+        
+        Args:
+            endpoint: Endpoint de la API
+            params: Parámetros de la petición
+            data: Respuesta JSON
+        """
+        path = self._path(endpoint, params)
+        entry = {
+            'endpoint': endpoint,
+            'params': params or {},
+            'stored_at': time.time(),
+            'data': data
+        }
+        
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb') as f:
+                f.write(json.dumps(entry, separators=(',', ':')).encode('utf-8'))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"No se pudo guardar en cache {endpoint}: {str(e)}")
@@ -37,6 +37,8 @@ Módulos:
 - classification: Motor de clasificación
 - prediction_engine: Motor de pronósticos
 - validation: Validador de pronósticos
+- cola_trabajos: Cola de trabajos persistente (scraping, estadísticas, backtesting)
+- indices: Índices de MongoDB y autochequeo con explain()
 
 Autor: PLLA 3.0 Migration Project
 Versión: 1.0.0
@@ -75,6 +77,8 @@ from .prediction_engine import PredictionEngine
 from .validation import ValidationEngine
 from .backtesting import BacktestingEngine
 from .historico_consolidado import HistoricoConsolidado
+from .cola_trabajos import ColaTrabajos, ContextoTrabajo, WorkerTrabajos
+from .indices import asegurar_indices, verificar_indices
 
 __all__ = [
     # Modelos
@@ -106,4 +110,13 @@ __all__ = [
     'ValidationEngine',
     'BacktestingEngine',
     'HistoricoConsolidado',
+    
+    # Cola de trabajos
+    'ColaTrabajos',
+    'ContextoTrabajo',
+    'WorkerTrabajos',
+    
+    # Índices
+    'asegurar_indices',
+    'verificar_indices',
 ]
@@ -1,13 +1,53 @@
 """
 Motor de Backtesting - Validación histórica del sistema de pronósticos
+
+Cada partido se pronostica con las estadísticas acumuladas hasta el día
+anterior (snapshots de StatsBuilder), nunca con el cierre de temporada.
+Los factores históricos tampoco: solo cuentan las temporadas anteriores
+y la actual a la fecha (HistoricoConsolidado._ponderar_hasta_fecha).
+
+Modo walk-forward (ejecutar_walk_forward): cada temporada se reproduce en
+memoria en orden cronológico. Los partidos de cada fecha se pronostican
+con lo acumulado hasta la fecha anterior y después se aplican a las
+estadísticas, la forma y el H2H. Las temporadas son independientes y se
+reparten en un pool de procesos; no se escribe nada en la base de datos.
 """
 
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from itertools import groupby
+import asyncio
 import logging
+import multiprocessing
+import os
+import time
+
+from .config import Config, TipoTiempo
+from .h2h_pares import clave_par
+from .historico_consolidado import HistoricoConsolidado
+from .tablas_clasificacion import numero_jornada
 
 logger = logging.getLogger(__name__)
 
+# Campos de football_matches que necesita el walk-forward
+CAMPOS_WALK_FORWARD = (
+    "liga_id",
+    "season_id",
+    "season",
+    "ronda",
+    "fecha",
+    "equipo_local",
+    "equipo_visitante",
+    "goles_local_TR",
+    "goles_visitante_TR",
+    "goles_local_1MT",
+    "goles_visitante_1MT",
+)
+
+METRICAS = ["pronostico_principal", "doble_oportunidad", "ambos_marcan",
+            "over_15", "over_25", "over_35"]
+
 
 class BacktestingEngine:
     """Ejecuta backtesting contra partidos históricos."""
@@ -44,18 +84,7 @@ class BacktestingEngine:
             return {"error": "No hay partidos para analizar"}
         
         # Inicializar contadores
-        resultados = {
-            "total_partidos": len(partidos),
-            "pronostico_principal": {"aciertos": 0, "total": 0},
-            "doble_oportunidad": {"aciertos": 0, "total": 0},
-            "ambos_marcan": {"aciertos": 0, "total": 0},
-            "over_15": {"aciertos": 0, "total": 0},
-            "over_25": {"aciertos": 0, "total": 0},
-            "over_35": {"aciertos": 0, "total": 0},
-            "roi_simulado": {"apuestas": 0, "ganancia": 0},
-            "errores": 0,
-            "detalle_errores": []
-        }
+        resultados = self._resultados_vacios(len(partidos))
         
         prediction_engine = PredictionEngine(self.db)
         
@@ -82,10 +111,35 @@ class BacktestingEngine:
     ) -> Dict[str, Any]:
         """Evalúa un partido individual."""
         
-        equipo_local = partido["equipo_local"]
-        equipo_visitante = partido["equipo_visitante"]
-        liga_id = partido.get("liga_id")
-        season_id = partido.get("season_id")
+        # Generar pronóstico solo con datos anteriores al partido
+        pronostico = await prediction_engine.generar_pronostico(
+            equipo_local=partido["equipo_local"],
+            equipo_visitante=partido["equipo_visitante"],
+            liga_id=partido.get("liga_id"),
+            season_id=partido.get("season_id"),
+            hasta_fecha=partido.get("fecha")
+        )
+        
+        tc = pronostico.tiempo_completo
+        return self._evaluar_pronostico(
+            partido,
+            tc.pronostico,
+            tc.doble_oportunidad,
+            tc.ambos_marcan,
+            tc.over_under or {},
+            tc.confianza
+        )
+    
+    def _evaluar_pronostico(
+        self,
+        partido: Dict,
+        pronostico_principal: str,
+        doble_op: str,
+        ambos_marcan: str,
+        over_under: Dict,
+        confianza: float
+    ) -> Dict[str, Any]:
+        """Compara un pronóstico de tiempo completo con el resultado real."""
         
         # Resultado real
         goles_local = partido.get("goles_local_TR", 0)
@@ -100,30 +154,17 @@ class BacktestingEngine:
         else:
             resultado_real = "E"
         
-        # Generar pronóstico
-        pronostico = await prediction_engine.generar_pronostico(
-            equipo_local=equipo_local,
-            equipo_visitante=equipo_visitante,
-            liga_id=liga_id,
-            season_id=season_id
-        )
-        
-        tc = pronostico.tiempo_completo
-        
         # Evaluar pronóstico principal
-        pronostico_principal = tc.pronostico
         acierto_principal = (pronostico_principal == resultado_real)
         
         # Evaluar doble oportunidad
-        doble_op = tc.doble_oportunidad
         acierto_doble = self._evaluar_doble_oportunidad(doble_op, resultado_real)
         
         # Evaluar ambos marcan
         ambos_real = "SI" if (goles_local > 0 and goles_visita > 0) else "NO"
-        acierto_ambos = (tc.ambos_marcan == ambos_real)
+        acierto_ambos = (ambos_marcan == ambos_real)
         
         # Evaluar Over/Under
-        over_under = tc.over_under or {}
         acierto_over15 = self._evaluar_over(over_under.get("over_15", {}), total_goles, 1.5)
         acierto_over25 = self._evaluar_over(over_under.get("over_25", {}), total_goles, 2.5)
         acierto_over35 = self._evaluar_over(over_under.get("over_35", {}), total_goles, 3.5)
@@ -135,7 +176,22 @@ class BacktestingEngine:
             "acierto_over15": acierto_over15,
             "acierto_over25": acierto_over25,
             "acierto_over35": acierto_over35,
-            "confianza": tc.confianza
+            "confianza": confianza
+        }
+    
+    def _resultados_vacios(self, total_partidos: int) -> Dict[str, Any]:
+        """Contadores iniciales del backtesting."""
+        return {
+            "total_partidos": total_partidos,
+            "pronostico_principal": {"aciertos": 0, "total": 0},
+            "doble_oportunidad": {"aciertos": 0, "total": 0},
+            "ambos_marcan": {"aciertos": 0, "total": 0},
+            "over_15": {"aciertos": 0, "total": 0},
+            "over_25": {"aciertos": 0, "total": 0},
+            "over_35": {"aciertos": 0, "total": 0},
+            "roi_simulado": {"apuestas": 0, "ganancia": 0},
+            "errores": 0,
+            "detalle_errores": []
         }
     
     def _evaluar_doble_oportunidad(self, prediccion: str, resultado: str) -> bool:
@@ -185,8 +241,7 @@ class BacktestingEngine:
     
     def _calcular_porcentajes(self, resultados: Dict):
         """Calcula porcentajes finales."""
-        for key in ["pronostico_principal", "doble_oportunidad", "ambos_marcan", 
-                    "over_15", "over_25", "over_35"]:
+        for key in METRICAS:
             total = resultados[key]["total"]
             if total > 0:
                 pct = (resultados[key]["aciertos"] / total) * 100
@@ -200,3 +255,313 @@ class BacktestingEngine:
             ganancia = resultados["roi_simulado"]["ganancia"]
             roi = ((ganancia - apuestas) / apuestas) * 100
             resultados["roi_simulado"]["roi_porcentaje"] = round(roi, 2)
+    
+    # ============================================
+    # WALK-FORWARD
+    # ============================================
+    
+    async def ejecutar_walk_forward(
+        self,
+        season_ids: Optional[List[str]] = None,
+        liga_ids: Optional[List[str]] = None,
+        procesos: Optional[int] = None,
+        usar_historico: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Backtesting walk-forward de varias temporadas.
+        
+        Lee de la base de datos las entradas de cada temporada (partidos
+        terminados y, con histórico, enfrentamientos y estadísticas de
+        temporadas anteriores) y reproduce cada una en memoria en un pool
+        de procesos. No guarda pronósticos.
+        
+        Parámetros:
+        -----------
+        season_ids : List[str], optional
+            Temporadas a reproducir
+        liga_ids : List[str], optional
+            Ligas (todas sus temporadas) si no se indican season_ids.
+            Sin ninguno de los dos se reproducen todas las temporadas.
+        procesos : int, optional
+            Procesos del pool (default: Config.BACKTEST_MAX_PROCESOS,
+            limitado por CPUs y temporadas)
+        usar_historico : bool
+            Aplicar factores históricos (H2H + temporadas anteriores)
+        
+        Retorna:
+        --------
+        dict
+            Métricas globales (mismo formato que ejecutar_backtesting) y
+            por temporada en 'temporadas', con el detalle por jornada.
+        """
+        inicio = time.perf_counter()
+        
+        temporadas = await self._temporadas_walk_forward(season_ids, liga_ids)
+        entradas = []
+        for liga_id, season_id in temporadas:
+            entrada = await self._entrada_walk_forward(liga_id, season_id, usar_historico)
+            if entrada["partidos"]:
+                entradas.append(entrada)
+        
+        if not entradas:
+            return {"error": "No hay partidos para analizar"}
+        
+        procesos = min(
+            procesos or Config.BACKTEST_MAX_PROCESOS,
+            os.cpu_count() or 1,
+            len(entradas)
+        )
+        logger.info(f"Walk-forward: {len(entradas)} temporadas en {procesos} procesos")
+        
+        if procesos > 1:
+            # spawn: los procesos hijos no heredan el cliente de MongoDB
+            loop = asyncio.get_running_loop()
+            with ProcessPoolExecutor(
+                max_workers=procesos,
+                mp_context=multiprocessing.get_context("spawn")
+            ) as pool:
+                por_temporada = await asyncio.gather(*(
+                    loop.run_in_executor(pool, _walk_forward_temporada, entrada)
+                    for entrada in entradas
+                ))
+        else:
+            por_temporada = [
+                await asyncio.to_thread(_walk_forward_temporada, entrada)
+                for entrada in entradas
+            ]
+        
+        resultados = self._combinar_resultados(por_temporada)
+        resultados["modo"] = "walk_forward"
+        resultados["procesos"] = procesos
+        resultados["temporadas"] = por_temporada
+        resultados["duracion_segundos"] = round(time.perf_counter() - inicio, 2)
+        return resultados
+    
+    async def _temporadas_walk_forward(
+        self,
+        season_ids: Optional[List[str]],
+        liga_ids: Optional[List[str]]
+    ) -> List[Tuple[str, str]]:
+        """(liga_id, season_id) de las temporadas a reproducir."""
+        match: Dict[str, Any] = {
+            "estado_del_partido": "Match Finished",
+            "season_id": {"$exists": True}
+        }
+        if season_ids:
+            match["season_id"] = {"$in": season_ids}
+        elif liga_ids:
+            match["liga_id"] = {"$in": liga_ids}
+        
+        pipeline = [
+            {"$match": match},
+            {"$group": {"_id": {"liga_id": "$liga_id", "season_id": "$season_id"}}}
+        ]
+        temporadas = [
+            (r["_id"]["liga_id"], r["_id"]["season_id"])
+            async for r in self.db.football_matches.aggregate(pipeline)
+        ]
+        return sorted(temporadas)
+    
+    async def _entrada_walk_forward(
+        self,
+        liga_id: str,
+        season_id: str,
+        usar_historico: bool
+    ) -> Dict[str, Any]:
+        """
+        Datos de una temporada para _walk_forward_temporada (solo tipos
+        serializables, para enviarlos a otro proceso).
+        """
+        partidos = await self.db.football_matches.find(
+            {"season_id": season_id, "estado_del_partido": "Match Finished"},
+            {"_id": 0, **{campo: 1 for campo in CAMPOS_WALK_FORWARD}}
+        ).sort("fecha", 1).to_list(None)
+        
+        entrada = {
+            "liga_id": liga_id,
+            "season_id": season_id,
+            "usar_historico": usar_historico,
+            "partidos": partidos,
+            "previos": [],
+            "historicos": {}
+        }
+        if not partidos or not usar_historico:
+            return entrada
+        
+        equipos = sorted({p["equipo_local"] for p in partidos} | {p["equipo_visitante"] for p in partidos})
+        
+        # Enfrentamientos anteriores a la temporada (H2H), más reciente primero
+        entrada["previos"] = await self.db.football_matches.find(
+            {
+                "liga_id": liga_id,
+                "estado_del_partido": "Match Finished",
+                "equipo_local": {"$in": equipos},
+                "equipo_visitante": {"$in": equipos},
+                "fecha": {"$lt": partidos[0]["fecha"]}
+            },
+            {
+                "_id": 0,
+                "fecha": 1,
+                "equipo_local": 1,
+                "equipo_visitante": 1,
+                "goles_local_TR": 1,
+                "goles_visitante_TR": 1
+            }
+        ).sort("fecha", -1).to_list(None)
+        
+        # Histórico de cada equipo, solo con las temporadas anteriores
+        docs = await HistoricoConsolidado(self.db)._documentos_historico(equipos, liga_id)
+        for nombre, doc in docs.items():
+            entrada["historicos"][nombre] = {
+                "seasons": [s for s in doc["seasons"] if s < season_id],
+                "stats_por_temporada": [
+                    item for item in doc["stats_por_temporada"] if item["season_id"] < season_id
+                ]
+            }
+        
+        return entrada
+    
+    def _combinar_resultados(self, por_temporada: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Suma los contadores de varias temporadas y calcula porcentajes."""
+        resultados = self._resultados_vacios(0)
+        for r in por_temporada:
+            resultados["total_partidos"] += r["total_partidos"]
+            for key in METRICAS:
+                resultados[key]["aciertos"] += r[key]["aciertos"]
+                resultados[key]["total"] += r[key]["total"]
+            resultados["roi_simulado"]["apuestas"] += r["roi_simulado"]["apuestas"]
+            resultados["roi_simulado"]["ganancia"] += r["roi_simulado"]["ganancia"]
+            resultados["errores"] += r["errores"]
+            resultados["detalle_errores"].extend(r["detalle_errores"][:5 - len(resultados["detalle_errores"])])
+        self._calcular_porcentajes(resultados)
+        return resultados
+
+
+def _walk_forward_temporada(entrada: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reproduce una temporada en memoria (se ejecuta en un proceso del pool).
+    
+    Recorre los partidos por fecha: los de cada fecha se pronostican con
+    las estadísticas, la forma y el H2H acumulados hasta la fecha anterior
+    y después se aplican. Aplicar por fecha (y no por jornada completa)
+    evita que un partido aplazado de una jornada filtre su resultado a las
+    jornadas siguientes. Como en ejecutar_backtesting, un equipo que aún
+    no ha jugado en la temporada se pronostica con estadísticas vacías.
+    """
+    from .stats_builder import StatsBuilder
+    from .calculo_vectorizado import (
+        calcular_tiempos_lote,
+        over_under_desde_probabilidades,
+        CODIGOS_RESULTADO
+    )
+    
+    inicio = time.perf_counter()
+    motor = BacktestingEngine(None)
+    builder = StatsBuilder(None)
+    historico = HistoricoConsolidado(None)
+    
+    liga_id = entrada["liga_id"]
+    season_id = entrada["season_id"]
+    partidos = entrada["partidos"]
+    temporada = partidos[0].get("season") or 2023
+    historicos = entrada["historicos"]
+    
+    # Todos los equipos existen desde la primera fecha (con estadísticas vacías)
+    equipos = {}
+    for nombre in sorted({p["equipo_local"] for p in partidos} | {p["equipo_visitante"] for p in partidos}):
+        builder._obtener_o_crear_equipo(nombre, liga_id, temporada, season_id, equipos)
+    forma: Dict[str, List[Dict[str, Any]]] = {}
+    h2h: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    for p in entrada["previos"]:
+        h2h.setdefault(clave_par(p["equipo_local"], p["equipo_visitante"]), []).append(p)
+    
+    resultados = motor._resultados_vacios(len(partidos))
+    por_jornada: Dict[Any, Dict[str, Any]] = {}
+    
+    for fecha, grupo in groupby(partidos, key=lambda p: p.get("fecha")):
+        grupo = list(grupo)
+        
+        try:
+            if grupo:
+                locales = [equipos[f"{liga_id}_{p['equipo_local']}"] for p in grupo]
+                visitantes = [equipos[f"{liga_id}_{p['equipo_visitante']}"] for p in grupo]
+                
+                factores = [None] * len(grupo)
+                if entrada["usar_historico"]:
+                    factores = [
+                        historico._combinar_factores(
+                            historico._ponderar_hasta_fecha(
+                                historicos.get(local.nombre), season_id,
+                                local.stats_completo.model_dump(), Config.HISTORICO_TEMPORADAS
+                            ),
+                            historico._ponderar_hasta_fecha(
+                                historicos.get(visitante.nombre), season_id,
+                                visitante.stats_completo.model_dump(), Config.HISTORICO_TEMPORADAS
+                            ),
+                            historico._resumir_h2h(
+                                h2h.get(clave_par(local.nombre, visitante.nombre), [])[:10],
+                                local.nombre,
+                                visitante.nombre
+                            )
+                        )
+                        for local, visitante in zip(locales, visitantes)
+                    ]
+                
+                fila = calcular_tiempos_lote(
+                    locales,
+                    visitantes,
+                    [builder._resumir_forma(forma.get(e.nombre, [])[:5], e.nombre) for e in locales],
+                    [builder._resumir_forma(forma.get(e.nombre, [])[:5], e.nombre) for e in visitantes],
+                    factores
+                )[TipoTiempo.COMPLETO]
+                
+                for i, partido in enumerate(grupo):
+                    resultado = motor._evaluar_pronostico(
+                        partido,
+                        CODIGOS_RESULTADO[int(fila["pronostico"][i])],
+                        str(fila["doble_oportunidad"][i]),
+                        str(fila["ambos_marcan"][i]),
+                        over_under_desde_probabilidades(fila, i),
+                        float(fila["confianza"][i])
+                    )
+                    motor._acumular_resultado(resultados, resultado)
+                    
+                    ronda = partido.get("ronda") or ""
+                    jornada = por_jornada.setdefault(ronda, {
+                        "ronda": ronda,
+                        "jornada": numero_jornada(ronda),
+                        "evaluados": 0,
+                        "aciertos_principal": 0,
+                        "aciertos_doble": 0
+                    })
+                    jornada["evaluados"] += 1
+                    jornada["aciertos_principal"] += resultado["acierto_principal"]
+                    jornada["aciertos_doble"] += resultado["acierto_doble"]
+        except Exception as e:
+            resultados["errores"] += len(grupo)
+            if len(resultados["detalle_errores"]) < 5:
+                resultados["detalle_errores"].append(f"{fecha}: {str(e)[:100]}")
+        
+        # Aplicar los resultados de la fecha
+        afectados = {}
+        for partido in grupo:
+            builder._procesar_partido(partido, liga_id, temporada, season_id, equipos)
+            for nombre in (partido["equipo_local"], partido["equipo_visitante"]):
+                forma.setdefault(nombre, []).insert(0, partido)
+                afectados[nombre] = equipos[f"{liga_id}_{nombre}"]
+            h2h.setdefault(clave_par(partido["equipo_local"], partido["equipo_visitante"]), []).insert(0, partido)
+        
+        for equipo in afectados.values():
+            equipo.stats_completo.calcular_derivados()
+            equipo.stats_primer_tiempo.calcular_derivados()
+            equipo.stats_segundo_tiempo.calcular_derivados()
+    
+    motor._calcular_porcentajes(resultados)
+    resultados["liga_id"] = liga_id
+    resultados["season_id"] = season_id
+    resultados["por_jornada"] = sorted(
+        por_jornada.values(),
+        key=lambda j: (j["jornada"] is None, j["jornada"] or 0, j["ronda"])
+    )
+    resultados["duracion_segundos"] = round(time.perf_counter() - inicio, 2)
+    return resultados
@@ -0,0 +1,186 @@
+"""
+========================================
+MÓDULO: cache_estadisticas.py
+========================================
+
+Cache en memoria de estadísticas de equipos (objetos Equipo).
+
+Compartida por todos los motores que usan la misma base de datos
+(StatsBuilder, ClassificationEngine, PredictionEngine y el motor que crea
+BacktestingEngine), de modo que una lectura de team_statistics sirve a
+todos y una reconstrucción invalida la temporada en un solo lugar.
+
+Características:
+---------------
+- Clave con temporada: (liga_id, season_id, nombre)
+- Tamaño acotado con expulsión LRU
+- Caducidad por TTL (cubre escrituras de otros procesos)
+- Invalidación explícita por temporada
+- Versión opcional por entrada (la de la marca de agua de la temporada),
+  para no servir datos de antes de una reconstrucción hecha en otro proceso
+- Contadores de aciertos/fallos
+
+Clases:
+-------
+- CacheEstadisticas: Cache LRU + TTL
+
+Funciones:
+----------
+- obtener_cache_equipos(db): Cache compartida para una base de datos
+"""
+
+from typing import Dict, Optional, Any, Tuple
+from collections import OrderedDict
+import time
+import logging
+
+from .models import Equipo
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class CacheEstadisticas:
+    """
+    Cache LRU + TTL de objetos Equipo por temporada.
+
+    Atributos:
+    ----------
+    max_entradas : int
+        Número máximo de equipos en memoria
+    ttl_segundos : float
+        Tiempo de vida de cada entrada
+
+    Ejemplo de Uso:
+    ---------------
+    ```python
+    cache = CacheEstadisticas(max_entradas=1000, ttl_segundos=300)
+    cache.guardar(equipo)
+    equipo = cache.obtener('SPAIN_LA_LIGA', 'SPAIN_LA_LIGA_2023-24', 'Barcelona')
+    cache.invalidar_temporada('SPAIN_LA_LIGA', 'SPAIN_LA_LIGA_2023-24')
+    ```
+    """
+
+    def __init__(
+        self,
+        max_entradas: int = Config.CACHE_EQUIPOS_MAX_ENTRADAS,
+        ttl_segundos: float = Config.CACHE_EQUIPOS_TTL_SEGUNDOS
+    ):
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self._entradas: "OrderedDict[Tuple[str, Optional[str], str], Tuple[float, Optional[int], Equipo]]" = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsiones = 0
+        self.invalidaciones = 0
+
+    def obtener(
+        self,
+        liga_id: str,
+        season_id: Optional[str],
+        nombre: str,
+        version: Optional[int] = None
+    ) -> Optional[Equipo]:
+        """
+        Obtiene un equipo de la cache.
+
+        Con `version`, una entrada guardada con otra versión de la
+        temporada (o sin versión) cuenta como fallo.
+
+        Retorna:
+        --------
+        Equipo or None
+            None si no está, si caducó o si es de otra versión
+        """
+        clave = (liga_id, season_id, nombre)
+        entrada = self._entradas.get(clave)
+
+        if (
+            entrada is None
+            or time.monotonic() - entrada[0] > self.ttl_segundos
+            or (version is not None and entrada[1] != version)
+        ):
+            if entrada is not None:
+                del self._entradas[clave]
+            self.fallos += 1
+            return None
+
+        self._entradas.move_to_end(clave)
+        self.aciertos += 1
+        return entrada[2]
+
+    def guardar(
+        self,
+        equipo: Equipo,
+        season_id: Optional[str] = None,
+        version: Optional[int] = None
+    ) -> None:
+        """
+        Guarda un equipo. Usa equipo.season_id salvo que se indique otro.
+
+        `version` es la versión de la marca de agua de la temporada con la
+        que se leyó o escribió el equipo (None si no se conoce).
+        """
+        clave = (equipo.liga_id, season_id or equipo.season_id, equipo.nombre)
+        self._entradas[clave] = (time.monotonic(), version, equipo)
+        self._entradas.move_to_end(clave)
+
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+            self.expulsiones += 1
+
+    def invalidar_temporada(self, liga_id: str, season_id: Optional[str]) -> int:
+        """
+        Elimina todos los equipos de una temporada.
+
+        Retorna:
+        --------
+        int
+            Número de entradas eliminadas
+        """
+        claves = [c for c in self._entradas if c[0] == liga_id and c[1] == season_id]
+        for clave in claves:
+            del self._entradas[clave]
+
+        self.invalidaciones += 1
+        logger.debug(f"Cache de equipos invalidada para {liga_id}/{season_id}: {len(claves)} entradas")
+        return len(claves)
+
+    def limpiar(self) -> None:
+        """Vacía la cache (los contadores se conservan)."""
+        self._entradas.clear()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """
+        Retorna contadores de uso de la cache.
+        """
+        consultas = self.aciertos + self.fallos
+        return {
+            "entradas": len(self._entradas),
+            "max_entradas": self.max_entradas,
+            "ttl_segundos": self.ttl_segundos,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": round(self.aciertos / consultas * 100, 2) if consultas else 0.0,
+            "expulsiones": self.expulsiones,
+            "invalidaciones": self.invalidaciones
+        }
+
+
+# Una cache por base de datos (todas las instancias de motores la comparten)
+_CACHES: Dict[int, CacheEstadisticas] = {}
+
+
+def obtener_cache_equipos(db) -> CacheEstadisticas:
+    """
+    Retorna la cache de equipos compartida para una base de datos.
+
+    Parámetros:
+    -----------
+    db : AsyncIOMotorDatabase
+        Conexión a MongoDB
+    """
+    clave = id(db)
+    if clave not in _CACHES:
+        _CACHES[clave] = CacheEstadisticas()
+    return _CACHES[clave]
@@ -0,0 +1,399 @@
+"""
+========================================
+MÓDULO: calculo_vectorizado.py
+========================================
+
+Núcleo vectorizado (NumPy) del algoritmo PLLA 3.0.
+
+Calcula, para N partidos y los 3 tiempos a la vez (3N filas):
+- Probabilidades L/E/V (base + ajuste por forma + ajuste por histórico)
+- Factores de ajuste (1-5) y algoritmo de decisión
+- Doble oportunidad y ambos marcan
+- Goles esperados y Over/Under 1.5/2.5/3.5 (Poisson)
+- Confianza
+
+Es la versión por lotes de los métodos escalares de PredictionEngine
+(_calcular_probabilidades, _ajustar_por_forma_reciente,
+_ajustar_por_historico, _aplicar_algoritmo_decision,
+_generar_doble_oportunidad, _calcular_ambos_marcan, _calcular_over_under,
+_calcular_prob_over y _calcular_confianza) y reproduce sus resultados
+exactamente tras el redondeo a 2 decimales:
+
+- Las operaciones aritméticas siguen el mismo orden que el código escalar
+  (IEEE 754 da el mismo resultado en NumPy y en Python).
+- El redondeo usa np.rint y, para los valores a menos de 1e-6 de un
+  empate de redondeo, recurre a round() de Python.
+- exp/pow de NumPy pueden diferir en 1 ULP de math; los Over/Under que
+  quedan cerca de un límite (50% o empate de redondeo) se recalculan
+  con math.
+
+Clases:
+-------
+Ninguna. Función principal: calcular_tiempos_lote()
+
+Historial de Cambios:
+--------------------
+- v1.0.0: Versión inicial
+"""
+
+from typing import Optional, Dict, Any, List, Sequence
+import math
+
+import numpy as np
+
+from .models import Equipo
+from .config import (
+    Config,
+    Umbrales,
+    TipoTiempo,
+    ResultadoEnum,
+    DobleOportunidadEnum,
+    AmbosMarcamEnum
+)
+
+
+# Atributo de Equipo y factor de goles para cada tiempo (mismo orden de filas)
+TIEMPOS = (
+    (TipoTiempo.COMPLETO, 'stats_completo', 1.0),
+    (TipoTiempo.PRIMER_TIEMPO, 'stats_primer_tiempo', 0.45),
+    (TipoTiempo.SEGUNDO_TIEMPO, 'stats_segundo_tiempo', 0.55),
+)
+
+UMBRALES_OVER = ((1.5, "over_15"), (2.5, "over_25"), (3.5, "over_35"))
+
+# Códigos de resultado en los arrays
+LOCAL, EMPATE, VISITA = 0, 1, 2
+CODIGOS_RESULTADO = (ResultadoEnum.LOCAL.value, ResultadoEnum.EMPATE.value, ResultadoEnum.VISITA.value)
+
+_TOLERANCIA_EMPATE = 1e-6
+
+
+def _redondear(x: np.ndarray, decimales: int = 2) -> np.ndarray:
+    """
+    Redondea igual que round() de Python.
+
+    np.rint(x * 10^d) coincide con round(x, d) salvo cuando x * 10^d
+    está (casi) en .5; esos pocos valores se redondean con Python.
+    """
+    escala = 10 ** decimales
+    y = x * escala
+    resultado = np.rint(y) / escala
+    dudosos = np.flatnonzero(np.abs(y - np.floor(y) - 0.5) < _TOLERANCIA_EMPATE)
+    for i in dudosos:
+        resultado[i] = round(float(x[i]), decimales)
+    return resultado
+
+
+def _prob_over_escalar(media: float, umbral: float) -> float:
+    """Mismo cálculo que PredictionEngine._calcular_prob_over (con math)."""
+    prob_under = 0
+    k = 0
+    while k <= int(umbral):
+        prob_under += (media ** k) * math.exp(-media) / math.factorial(k)
+        k += 1
+    return max(5, min(95, (1 - prob_under) * 100))
+
+
+def _prob_over(media: np.ndarray, umbral: float) -> np.ndarray:
+    """
+    P(X > umbral) en % con X ~ Poisson(media), limitada a [5, 95].
+    """
+    exp_media = np.exp(-media)
+    prob_under = np.zeros_like(media)
+    for k in range(int(umbral) + 1):
+        prob_under = prob_under + (media ** k) * exp_media / math.factorial(k)
+
+    prob_over = np.clip((1 - prob_under) * 100, 5, 95)
+
+    # Recalcular con math los valores cerca de un límite de decisión
+    # o de un empate de redondeo (exp/pow pueden diferir en 1 ULP)
+    salida = np.where(prob_over > 50, prob_over, 100 - prob_over) * 100
+    dudosos = np.flatnonzero(
+        (np.abs(prob_over - 50) < _TOLERANCIA_EMPATE)
+        | (np.abs(salida - np.floor(salida) - 0.5) < _TOLERANCIA_EMPATE)
+    )
+    for i in dudosos:
+        prob_over[i] = _prob_over_escalar(float(media[i]), umbral)
+
+    return prob_over
+
+
+def _factor_ajuste(rendimiento: np.ndarray) -> np.ndarray:
+    """Versión vectorizada de PredictionEngine._calcular_factor_ajuste."""
+    return np.select(
+        [
+            rendimiento > Umbrales.FACTOR_5_MIN,
+            rendimiento > Umbrales.FACTOR_4_MIN,
+            rendimiento > Umbrales.FACTOR_3_MIN,
+            rendimiento > Umbrales.FACTOR_2_MIN,
+        ],
+        [5.0, 4.0, 3.0, 2.0],
+        default=1.0
+    )
+
+
+def _columna(equipos: Sequence[Equipo], atributo: str, campo: str) -> np.ndarray:
+    """Extrae un campo de EstadisticasEquipo de todos los equipos."""
+    return np.array(
+        [getattr(getattr(e, atributo), campo) for e in equipos],
+        dtype=np.float64
+    )
+
+
+def calcular_tiempos_lote(
+    equipos_local: Sequence[Equipo],
+    equipos_visitante: Sequence[Equipo],
+    formas_local: Sequence[Optional[Dict[str, Any]]],
+    formas_visitante: Sequence[Optional[Dict[str, Any]]],
+    factores_historicos: Sequence[Optional[Dict[str, Any]]]
+) -> Dict[TipoTiempo, Dict[str, Any]]:
+    """
+    Ejecuta el algoritmo PLLA para N partidos y los 3 tiempos a la vez.
+
+    Parámetros:
+    -----------
+    equipos_local : Sequence[Equipo]
+        Equipo local de cada partido
+    equipos_visitante : Sequence[Equipo]
+        Equipo visitante de cada partido
+    formas_local : Sequence[dict | None]
+        Forma reciente del local (ver StatsBuilder.obtener_forma_reciente)
+    formas_visitante : Sequence[dict | None]
+        Forma reciente del visitante
+    factores_historicos : Sequence[dict | None]
+        Factores de HistoricoConsolidado.calcular_factor_historico
+
+    Retorna:
+    --------
+    Dict[TipoTiempo, dict]
+        Por cada tiempo, arrays de longitud N:
+        - porcentaje_local, porcentaje_empate, porcentaje_visita
+        - factor_local, factor_visita
+        - pronostico (códigos LOCAL/EMPATE/VISITA)
+        - doble_oportunidad, ambos_marcan (listas de str)
+        - goles_local, goles_visitante, goles_total
+        - over_15, over_25, over_35 (prob. de Over sin redondear)
+        - confianza
+    """
+    n = len(equipos_local)
+
+    # ===== ENTRADAS (3N filas: TC, 1MT, 2MT) =====
+    def apilar(equipos, campo):
+        return np.concatenate([_columna(equipos, atributo, campo) for _, atributo, _ in TIEMPOS])
+
+    pj_local = apilar(equipos_local, 'pj_local')
+    gf_local = apilar(equipos_local, 'gf_local')
+    gc_local = apilar(equipos_local, 'gc_local')
+    rendimiento_local = apilar(equipos_local, 'rendimiento_local')
+
+    pj_visita = apilar(equipos_visitante, 'pj_visita')
+    gf_visita = apilar(equipos_visitante, 'gf_visita')
+    gc_visita = apilar(equipos_visitante, 'gc_visita')
+    rendimiento_visita = apilar(equipos_visitante, 'rendimiento_visita')
+
+    factor_tiempo = np.repeat([f for _, _, f in TIEMPOS], n)
+
+    con_forma = np.tile([bool(fl and fv) for fl, fv in zip(formas_local, formas_visitante)], 3)
+    rend_forma_local = np.tile([(fl or {}).get('rendimiento', 50.0) for fl in formas_local], 3).astype(np.float64)
+    rend_forma_visita = np.tile([(fv or {}).get('rendimiento', 50.0) for fv in formas_visitante], 3).astype(np.float64)
+    goles_forma_local = np.tile([(fl or {}).get('goles_favor_avg', np.nan) for fl in formas_local], 3).astype(np.float64)
+    goles_forma_visita = np.tile([(fv or {}).get('goles_favor_avg', np.nan) for fv in formas_visitante], 3).astype(np.float64)
+
+    con_historico = np.tile([bool(f) for f in factores_historicos], 3)
+    h2hs = [(f or {}).get("h2h", {}) for f in factores_historicos]
+    con_h2h = con_historico & np.tile(
+        [bool(h.get("tiene_historial")) and h.get("total_partidos", 0) >= 3 for h in h2hs], 3
+    )
+    pct_h2h_local = np.tile([h.get("porcentaje_eq1", 33) for h in h2hs], 3).astype(np.float64)
+    pct_h2h_visita = np.tile([h.get("porcentaje_eq2", 33) for h in h2hs], 3).astype(np.float64)
+    pct_h2h_empate = np.tile([h.get("porcentaje_empate", 33) for h in h2hs], 3).astype(np.float64)
+    factor_hist_local = np.tile([(f or {}).get("factor_local", 1.0) for f in factores_historicos], 3).astype(np.float64)
+    factor_hist_visita = np.tile([(f or {}).get("factor_visita", 1.0) for f in factores_historicos], 3).astype(np.float64)
+
+    con_pj_local = pj_local > 0
+    con_pj_visita = pj_visita > 0
+    pj_local_seguro = np.where(con_pj_local, pj_local, 1)
+    pj_visita_seguro = np.where(con_pj_visita, pj_visita, 1)
+
+    # ===== PASO 1: Probabilidades base =====
+    rend_l = np.where(
+        pj_local < Config.MIN_PARTIDOS_CONFIABLE,
+        Config.PROMEDIOS_POR_DEFECTO['prob_local'],
+        rendimiento_local
+    )
+    rend_v = np.where(
+        pj_visita < Config.MIN_PARTIDOS_CONFIABLE,
+        Config.PROMEDIOS_POR_DEFECTO['prob_visita'],
+        rendimiento_visita
+    )
+    total = rend_l + rend_v
+    sin_datos = total == 0
+    total_seguro = np.where(sin_datos, 1, total)
+
+    prob_local_base = (rend_l / total_seguro) * 100
+    prob_visita_base = (rend_v / total_seguro) * 100
+    diferencia = np.abs(prob_local_base - prob_visita_base)
+    factor_empate = np.maximum(0, 30 - diferencia)
+    resto = 100 - factor_empate
+    pl = prob_local_base * resto / 100
+    pv = prob_visita_base * resto / 100
+    suma = pl + factor_empate + pv
+
+    p_local = np.where(sin_datos, Config.PROMEDIOS_POR_DEFECTO['prob_local'], _redondear(pl / suma * 100))
+    p_empate = np.where(sin_datos, Config.PROMEDIOS_POR_DEFECTO['prob_empate'], _redondear(factor_empate / suma * 100))
+    p_visita = np.where(sin_datos, Config.PROMEDIOS_POR_DEFECTO['prob_visita'], _redondear(pv / suma * 100))
+
+    # ===== PASO 2: Factores de ajuste =====
+    factor_local = _factor_ajuste(rendimiento_local)
+    factor_visita = _factor_ajuste(rendimiento_visita)
+
+    # ===== PASO 3: Ajuste por forma reciente =====
+    peso = Umbrales.PESO_FORMA_RECIENTE
+    ajuste_l = ((rend_forma_local - 50) / 50) * peso * 10
+    ajuste_v = ((rend_forma_visita - 50) / 50) * peso * 10
+    fl_aj = np.clip(p_local + ajuste_l, 5, 90)
+    fv_aj = np.clip(p_visita + ajuste_v, 5, 90)
+    fe_aj = np.clip(100 - fl_aj - fv_aj, 5, 50)
+    total_forma = fl_aj + fe_aj + fv_aj
+    p_local = np.where(con_forma, _redondear(fl_aj / total_forma * 100), p_local)
+    p_empate = np.where(con_forma, _redondear(fe_aj / total_forma * 100), p_empate)
+    p_visita = np.where(con_forma, _redondear(fv_aj / total_forma * 100), p_visita)
+
+    # ===== PASO 4: Ajuste por histórico (H2H + temporadas) =====
+    peso_h2h = 0.20
+    hl = np.where(con_h2h, p_local * (1 - peso_h2h) + pct_h2h_local * peso_h2h, p_local)
+    hv = np.where(con_h2h, p_visita * (1 - peso_h2h) + pct_h2h_visita * peso_h2h, p_visita)
+    he = np.where(con_h2h, p_empate * (1 - peso_h2h) + pct_h2h_empate * peso_h2h, p_empate)
+    hl = hl * factor_hist_local
+    hv = hv * factor_hist_visita
+    total_hist = hl + he + hv
+    p_local = np.where(con_historico, _redondear(hl / total_hist * 100), p_local)
+    p_empate = np.where(con_historico, _redondear(he / total_hist * 100), p_empate)
+    p_visita = np.where(con_historico, _redondear(hv / total_hist * 100), p_visita)
+    factor_local = np.where(con_historico, factor_local * factor_hist_local, factor_local)
+    factor_visita = np.where(con_historico, factor_visita * factor_hist_visita, factor_visita)
+
+    # ===== PASO 5: Algoritmo de decisión =====
+    pla = p_local + (factor_local - 3) * 2
+    pva = p_visita + (factor_visita - 3) * 2
+    pronostico = np.select(
+        [
+            (Umbrales.PROB_LOCAL_MIN < pla) & (pla < Umbrales.PROB_LOCAL_MAX)
+            & (p_empate < Umbrales.PROB_EMPATE_MAX),
+            pla >= Umbrales.PROB_LOCAL_MAX,
+            (pla < Umbrales.PROB_LOCAL_MIN) & (pva > pla),
+            (p_empate >= Umbrales.PROB_EMPATE_MAX) & (np.abs(pla - pva) < Umbrales.DIFERENCIA_EMPATE),
+            (pla >= pva) & (pla >= p_empate),
+            (pva >= pla) & (pva >= p_empate),
+        ],
+        [LOCAL, LOCAL, VISITA, EMPATE, LOCAL, VISITA],
+        default=EMPATE
+    )
+
+    # ===== PASO 6: Doble oportunidad =====
+    doble = np.select(
+        [
+            p_local + p_visita > Umbrales.SUMA_PROB_MIN,
+            pronostico == LOCAL,
+            pronostico == VISITA,
+            p_local > p_visita,
+        ],
+        [
+            DobleOportunidadEnum.LOCAL_VISITA.value,
+            DobleOportunidadEnum.LOCAL_EMPATE.value,
+            DobleOportunidadEnum.EMPATE_VISITA.value,
+            DobleOportunidadEnum.LOCAL_EMPATE.value,
+        ],
+        default=DobleOportunidadEnum.EMPATE_VISITA.value
+    )
+
+    # ===== PASO 7: Ambos marcan =====
+    am_gf_local = np.where(con_pj_local, gf_local / pj_local_seguro, Config.PROMEDIOS_POR_DEFECTO['goles_local'])
+    am_gc_local = np.where(con_pj_local, gc_local / pj_local_seguro, Config.PROMEDIOS_POR_DEFECTO['goles_visita'])
+    am_gf_visita = np.where(con_pj_visita, gf_visita / pj_visita_seguro, Config.PROMEDIOS_POR_DEFECTO['goles_visita'])
+    am_gc_visita = np.where(con_pj_visita, gc_visita / pj_visita_seguro, Config.PROMEDIOS_POR_DEFECTO['goles_local'])
+    prob_ambos = ((am_gf_local + am_gc_visita) / 2 * ((am_gf_visita + am_gc_local) / 2)) / 2 * 100
+    ambos = np.where(
+        prob_ambos > Umbrales.UMBRAL_AMBOS_MARCAN,
+        AmbosMarcamEnum.SI.value,
+        AmbosMarcamEnum.NO.value
+    )
+
+    # ===== PASO 8: Goles esperados y Over/Under =====
+    avg_gf_local = np.where(con_pj_local, gf_local / pj_local_seguro, 1.3)
+    avg_gc_local = np.where(con_pj_local, gc_local / pj_local_seguro, 1.0)
+    avg_gf_visita = np.where(con_pj_visita, gf_visita / pj_visita_seguro, 0.9)
+    avg_gc_visita = np.where(con_pj_visita, gc_visita / pj_visita_seguro, 1.5)
+    goles_local = (avg_gf_local + avg_gc_visita) / 2
+    goles_visitante = (avg_gf_visita + avg_gc_local) / 2
+
+    goles_forma_local = np.where(np.isnan(goles_forma_local), goles_local, goles_forma_local)
+    goles_forma_visita = np.where(np.isnan(goles_forma_visita), goles_visitante, goles_forma_visita)
+    goles_local = np.where(con_forma, goles_local * (1 - peso) + goles_forma_local * peso, goles_local)
+    goles_visitante = np.where(con_forma, goles_visitante * (1 - peso) + goles_forma_visita * peso, goles_visitante)
+
+    goles_local = goles_local * factor_tiempo
+    goles_visitante = goles_visitante * factor_tiempo
+    total_esperado = goles_local + goles_visitante
+
+    over = {nombre: _prob_over(total_esperado, umbral) for umbral, nombre in UMBRALES_OVER}
+
+    # ===== PASO 9: Confianza =====
+    probs = np.stack([p_local, p_empate, p_visita], axis=1)
+    confianza_base = np.choose(pronostico, [p_local, p_empate, p_visita])
+    ordenadas = -np.sort(-probs, axis=1)
+    ajuste_claridad = np.minimum((ordenadas[:, 0] - ordenadas[:, 1]) * 0.5, 15)
+    ajuste_factor = np.select(
+        [pronostico == LOCAL, pronostico == VISITA],
+        [(factor_local - factor_visita) * 2, (factor_visita - factor_local) * 2],
+        default=-np.abs(factor_local - factor_visita)
+    )
+    confianza = _redondear(np.clip(confianza_base + ajuste_claridad + ajuste_factor, 0, 100))
+
+    # ===== SALIDA POR TIEMPO =====
+    salida = {
+        "porcentaje_local": p_local,
+        "porcentaje_empate": p_empate,
+        "porcentaje_visita": p_visita,
+        "factor_local": factor_local,
+        "factor_visita": factor_visita,
+        "pronostico": pronostico,
+        "doble_oportunidad": doble,
+        "ambos_marcan": ambos,
+        "goles_local": _redondear(goles_local),
+        "goles_visitante": _redondear(goles_visitante),
+        "goles_total": _redondear(total_esperado),
+        "confianza": confianza,
+        **over
+    }
+
+    return {
+        tipo: {clave: valores[i * n:(i + 1) * n] for clave, valores in salida.items()}
+        for i, (tipo, _, _) in enumerate(TIEMPOS)
+    }
+
+
+def over_under_desde_probabilidades(fila: Dict[str, Any], indice: int) -> Dict[str, Dict[str, Any]]:
+    """
+    Construye el dict over_under de PronosticoTiempo para una fila.
+
+    Parámetros:
+    -----------
+    fila : dict
+        Resultado de calcular_tiempos_lote para un tiempo
+    indice : int
+        Posición del partido
+
+    Retorna:
+    --------
+    Dict con over_15, over_25, over_35 → {"prediccion", "probabilidad"}
+    """
+    resultado = {}
+    for _, nombre in UMBRALES_OVER:
+        prob_over = float(fila[nombre][indice])
+        prediccion = "OVER" if prob_over > 50 else "UNDER"
+        resultado[nombre] = {
+            "prediccion": prediccion,
+            "probabilidad": round(prob_over if prediccion == "OVER" else 100 - prob_over, 2)
+        }
+    return resultado
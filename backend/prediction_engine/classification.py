@@ -15,6 +15,10 @@ Criterios de Ordenamiento:
 3. Goles a favor (mayor a menor)
 4. Nombre del equipo (alfabético, desempate final)
 
+Las tablas tras cada jornada se materializan al construir estadísticas
+(colección clasificaciones, ver tablas_clasificacion.py); las consultas
+las leen directamente y solo se recalcula si no existen.
+
 Clases:
 -------
 - ClassificationEngine: Motor de clasificación
@@ -22,9 +26,11 @@ Clases:
 Historial de Cambios:
 --------------------
 - v1.0.0 (Dic 2024): Versión inicial
+- v1.1.0: Lectura de clasificaciones materializadas por jornada
+- v1.2.0: generar_clasificaciones (varios tipos de tiempo en una pasada)
 """
 
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterable
 from datetime import datetime, timezone
 import logging
 
@@ -35,7 +41,8 @@ from .models import (
     EstadisticasEquipo
 )
 from .config import Config, TipoTiempo
-from .stats_builder import StatsBuilder
+from .stats_builder import StatsBuilder, generate_season_id
+from .tablas_clasificacion import fila_a_dict, fila_clasificacion, ordenar_filas
 
 logger = logging.getLogger(__name__)
 
@@ -59,6 +66,12 @@ class ClassificationEngine:
     generar_clasificacion(liga_id, temporada, tipo_tiempo)
         Genera tabla de clasificación completa
     
+    generar_clasificaciones(liga_id, season_id, tipos)
+        Genera las tablas de varios tipos de tiempo con una sola lectura
+    
+    obtener_clasificacion(liga_id, season_id, tipo_tiempo, jornada)
+        Tabla materializada (actual o tras la jornada N)
+    
     obtener_posicion(equipo, liga_id, tipo_tiempo)
         Obtiene la posición de un equipo específico
     
@@ -157,63 +170,15 @@ class ClassificationEngine:
             logger.warning(f"No hay equipos para {liga_id}")
             raise ValueError(f"No hay equipos para generar clasificación en {liga_id}")
         
-        # Crear filas de clasificación
-        filas: List[FilaClasificacion] = []
-        
-        for equipo in equipos:
-            stats = equipo.obtener_stats(tipo_tiempo)
-            
-            fila = FilaClasificacion(
-                posicion=0,  # Se asignará después de ordenar
-                equipo=equipo.nombre,
-                
-                # Generales
-                pj=stats.partidos_jugados,
-                v=stats.victorias,
-                e=stats.empates,
-                d=stats.derrotas,
-                gf=stats.goles_favor,
-                gc=stats.goles_contra,
-                dif=stats.diferencia_goles,
-                pts=stats.puntos,
-                
-                # Local
-                pj_l=stats.pj_local,
-                v_l=stats.v_local,
-                e_l=stats.e_local,
-                d_l=stats.d_local,
-                gf_l=stats.gf_local,
-                gc_l=stats.gc_local,
-                pts_l=stats.pts_local,
-                
-                # Visitante
-                pj_v=stats.pj_visita,
-                v_v=stats.v_visita,
-                e_v=stats.e_visita,
-                d_v=stats.d_visita,
-                gf_v=stats.gf_visita,
-                gc_v=stats.gc_visita,
-                pts_v=stats.pts_visita,
-                
-                # Rendimientos
-                rendimiento=stats.rendimiento_general,
-                rendimiento_l=stats.rendimiento_local,
-                rendimiento_v=stats.rendimiento_visita
-            )
-            filas.append(fila)
-        
-        # Ordenar por criterios
-        # 1. Puntos (mayor a menor)
-        # 2. Diferencia de goles (mayor a menor)
-        # 3. Goles a favor (mayor a menor)
-        # 4. Nombre (A-Z para desempate)
-        filas.sort(
-            key=lambda x: (-x.pts, -x.dif, -x.gf, x.equipo)
-        )
-        
-        # Asignar posiciones
-        for idx, fila in enumerate(filas, 1):
-            fila.posicion = idx
+        # Crear filas de clasificación, ordenadas por puntos, diferencia
+        # de goles, goles a favor y nombre (A-Z para desempate)
+        filas = [
+            FilaClasificacion(**fila)
+            for fila in ordenar_filas([
+                fila_clasificacion(equipo.nombre, equipo.obtener_stats(tipo_tiempo))
+                for equipo in equipos
+            ])
+        ]
         
         # Crear tabla
         tabla = TablaClasificacion(
@@ -227,16 +192,99 @@ class ClassificationEngine:
         logger.info(f"Clasificación generada con {len(filas)} equipos")
         return tabla
     
+    async def generar_clasificaciones(
+        self,
+        liga_id: str,
+        season_id: Optional[str] = None,
+        tipos: Iterable[TipoTiempo] = tuple(TipoTiempo),
+        temporada: Optional[int] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Genera las tablas de varios tipos de tiempo en una sola pasada.
+        
+        Lee los equipos una vez y construye todas las tablas con filas
+        ligeras (diccionarios), sin crear un FilaClasificacion por equipo
+        y tipo de tiempo.
+        
+        Parámetros:
+        -----------
+        liga_id : str
+            ID de la liga
+        season_id : str, optional
+            ID de temporada estructurado (preferido)
+        tipos : Iterable[TipoTiempo]
+            Tipos de tiempo a generar (default: los tres)
+        temporada : int, optional
+            Año de la temporada (legacy)
+        
+        Retorna:
+        --------
+        Dict[str, dict]
+            Tabla por tipo de tiempo ('completo', 'primer_tiempo',
+            'segundo_tiempo'), en el formato de tabla_to_dict
+        
+        Raises:
+        -------
+        ValueError
+            Si no hay equipos en la liga
+        
+        Ejemplo:
+        --------
+        ```python
+        tablas = await engine.generar_clasificaciones(
+            'SPAIN_LA_LIGA',
+            season_id='SPAIN_LA_LIGA_2023-24'
+        )
+        lider_1mt = tablas['primer_tiempo']['clasificacion'][0]['equipo']
+        ```
+        """
+        tipos = list(tipos)
+        logger.info(f"Generando clasificaciones para {liga_id}, season_id={season_id}, tiempos: {[t.value for t in tipos]}")
+        
+        equipos = await self.stats_builder.obtener_todos_equipos(
+            liga_id,
+            temporada,
+            season_id=season_id
+        )
+        
+        if not equipos:
+            logger.warning(f"No hay equipos para {liga_id}")
+            raise ValueError(f"No hay equipos para generar clasificación en {liga_id}")
+        
+        # Una pasada por los equipos: una fila por tipo de tiempo
+        filas: Dict[TipoTiempo, List[Dict[str, Any]]] = {tipo: [] for tipo in tipos}
+        for equipo in equipos:
+            for tipo in tipos:
+                filas[tipo].append(fila_clasificacion(equipo.nombre, equipo.obtener_stats(tipo)))
+        
+        fecha_actualizacion = datetime.now(timezone.utc).isoformat()
+        return {
+            tipo.value: {
+                'liga_id': liga_id,
+                'temporada': temporada or 2023,
+                'tipo_tiempo': tipo.value,
+                'total_equipos': len(filas[tipo]),
+                'fecha_actualizacion': fecha_actualizacion,
+                'clasificacion': [fila_a_dict(fila) for fila in ordenar_filas(filas[tipo])]
+            }
+            for tipo in tipos
+        }
+    
     async def obtener_posicion(
         self,
         nombre_equipo: str,
         liga_id: str,
         temporada: Optional[int] = None,
-        tipo_tiempo: TipoTiempo = TipoTiempo.COMPLETO
+        tipo_tiempo: TipoTiempo = TipoTiempo.COMPLETO,
+        season_id: Optional[str] = None,
+        jornada: Optional[int] = None
     ) -> Optional[int]:
         """
         Obtiene la posición de un equipo específico.
         
+        Lee la clasificación materializada (un documento); si la temporada
+        no tiene clasificaciones materializadas, genera la tabla.
+        
         Parámetros:
         -----------
         nombre_equipo : str
@@ -247,6 +295,10 @@ class ClassificationEngine:
             Año de la temporada
         tipo_tiempo : TipoTiempo
             Tipo de tiempo para la clasificación
+        season_id : str, optional
+            ID de temporada estructurado
+        jornada : int, optional
+            Posición tras esa jornada (default: la última)
         
         Retorna:
         --------
@@ -260,20 +312,19 @@ class ClassificationEngine:
         print(f"Barcelona está en posición {pos}")
         ```
         """
-        tabla = await self.generar_clasificacion(liga_id, temporada, tipo_tiempo)
-        
-        for fila in tabla.filas:
-            if fila.equipo.lower() == nombre_equipo.lower():
-                return fila.posicion
-        
-        return None
+        fila = await self._buscar_fila(
+            nombre_equipo, liga_id, temporada, tipo_tiempo, season_id, jornada
+        )
+        return fila['posicion'] if fila else None
     
     async def obtener_stats_posicion(
         self,
         nombre_equipo: str,
         liga_id: str,
         temporada: Optional[int] = None,
-        tipo_tiempo: TipoTiempo = TipoTiempo.COMPLETO
+        tipo_tiempo: TipoTiempo = TipoTiempo.COMPLETO,
+        season_id: Optional[str] = None,
+        jornada: Optional[int] = None
     ) -> Optional[FilaClasificacion]:
         """
         Obtiene la fila de clasificación completa de un equipo.
@@ -288,19 +339,192 @@ class ClassificationEngine:
             Año
         tipo_tiempo : TipoTiempo
             Tipo de tiempo
+        season_id : str, optional
+            ID de temporada estructurado
+        jornada : int, optional
+            Fila tras esa jornada (default: la última)
         
         Retorna:
         --------
         FilaClasificacion or None
             Todos los datos de clasificación del equipo
         """
-        tabla = await self.generar_clasificacion(liga_id, temporada, tipo_tiempo)
+        fila = await self._buscar_fila(
+            nombre_equipo, liga_id, temporada, tipo_tiempo, season_id, jornada
+        )
+        return FilaClasificacion(**fila) if fila else None
+    
+    async def _cargar_materializada(
+        self,
+        liga_id: str,
+        season_id: Optional[str],
+        tipo_tiempo: TipoTiempo,
+        jornada: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Documento de clasificación materializada: el de la jornada N (o la
+        última jornada anterior disponible) o, sin jornada, el más reciente.
+        """
+        query: Dict[str, Any] = {
+            "liga_id": liga_id,
+            "season_id": season_id,
+            "tipo_tiempo": tipo_tiempo.value
+        }
+        if jornada is not None:
+            query["jornada"] = {"$lte": jornada}
+        
+        return await self.db[Config.COLECCION_CLASIFICACIONES].find_one(
+            query, {"_id": 0}, sort=[("jornada", -1)]
+        )
+    
+    async def _buscar_fila(
+        self,
+        nombre_equipo: str,
+        liga_id: str,
+        temporada: Optional[int],
+        tipo_tiempo: TipoTiempo,
+        season_id: Optional[str],
+        jornada: Optional[int]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Fila (dict) de un equipo, de la tabla materializada o generada.
+        """
+        if not season_id and temporada:
+            season_id = generate_season_id(liga_id, temporada)
+        
+        doc = await self._cargar_materializada(liga_id, season_id, tipo_tiempo, jornada)
+        if doc:
+            filas = doc["filas"]
+        elif jornada is None:
+            tabla = await self.generar_clasificacion(liga_id, temporada, tipo_tiempo, season_id)
+            filas = [fila.model_dump() for fila in tabla.filas]
+        else:
+            return None
+        
+        por_equipo = {fila['equipo'].lower(): fila for fila in filas}
+        return por_equipo.get(nombre_equipo.lower())
+    
+    async def obtener_clasificacion(
+        self,
+        liga_id: str,
+        season_id: Optional[str] = None,
+        tipo_tiempo: TipoTiempo = TipoTiempo.COMPLETO,
+        jornada: Optional[int] = None,
+        temporada: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Obtiene la clasificación materializada, actual o tras una jornada.
+        
+        Una sola lectura indexada: no recalcula la tabla.
+        
+        Parámetros:
+        -----------
+        liga_id : str
+            ID de la liga
+        season_id : str, optional
+            ID de temporada estructurado (preferido)
+        tipo_tiempo : TipoTiempo
+            COMPLETO, PRIMER_TIEMPO o SEGUNDO_TIEMPO
+        jornada : int, optional
+            Tabla tras esa jornada (default: la última jornada jugada)
+        temporada : int, optional
+            Año de la temporada (legacy, para derivar season_id)
+        
+        Retorna:
+        --------
+        dict or None
+            Tabla en el formato de tabla_to_dict, más season_id, jornada,
+            ronda y hasta_fecha. None si la temporada no tiene
+            clasificaciones materializadas (construir estadísticas).
+        
+        Ejemplo:
+        --------
+        ```python
+        tabla = await engine.obtener_clasificacion(
+            'SPAIN_LA_LIGA',
+            season_id='SPAIN_LA_LIGA_2023-24',
+            jornada=10
+        )
+        ```
+        """
+        if not season_id and temporada:
+            season_id = generate_season_id(liga_id, temporada)
+        
+        doc = await self._cargar_materializada(liga_id, season_id, tipo_tiempo, jornada)
+        return self._materializada_a_dict(doc) if doc else None
+    
+    async def obtener_clasificaciones(
+        self,
+        liga_id: str,
+        season_id: Optional[str] = None,
+        tipos: Iterable[TipoTiempo] = tuple(TipoTiempo),
+        jornada: Optional[int] = None,
+        temporada: Optional[int] = None
+    ) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        Obtiene las clasificaciones materializadas de varios tipos de tiempo.
+        
+        Una sola consulta: cada jornada tiene materializados todos los tipos
+        de tiempo, así que los primeros documentos por jornada descendente
+        son los de la misma jornada.
+        
+        Parámetros:
+        -----------
+        liga_id : str
+            ID de la liga
+        season_id : str, optional
+            ID de temporada estructurado (preferido)
+        tipos : Iterable[TipoTiempo]
+            Tipos de tiempo (default: los tres)
+        jornada : int, optional
+            Tablas tras esa jornada (default: la última jornada jugada)
+        temporada : int, optional
+            Año de la temporada (legacy, para derivar season_id)
+        
+        Retorna:
+        --------
+        Dict[str, dict] or None
+            Tabla por tipo de tiempo (formato de obtener_clasificacion).
+            None si falta alguna tabla materializada.
+        """
+        tipos = list(tipos)
+        if not season_id and temporada:
+            season_id = generate_season_id(liga_id, temporada)
+        
+        query: Dict[str, Any] = {
+            "liga_id": liga_id,
+            "season_id": season_id,
+            "tipo_tiempo": {"$in": [tipo.value for tipo in tipos]}
+        }
+        if jornada is not None:
+            query["jornada"] = {"$lte": jornada}
         
-        for fila in tabla.filas:
-            if fila.equipo.lower() == nombre_equipo.lower():
-                return fila
+        docs = await self.db[Config.COLECCION_CLASIFICACIONES].find(
+            query, {"_id": 0}
+        ).sort("jornada", -1).limit(len(tipos)).to_list(len(tipos))
         
-        return None
+        tablas = {doc["tipo_tiempo"]: self._materializada_a_dict(doc) for doc in docs}
+        if len(tablas) < len(tipos) or len({doc["jornada"] for doc in docs}) > 1:
+            return None
+        return {tipo.value: tablas[tipo.value] for tipo in tipos}
+    
+    def _materializada_a_dict(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Documento de clasificaciones -> formato de tabla_to_dict (más
+        season_id, jornada, ronda y hasta_fecha).
+        """
+        return {
+            'liga_id': doc['liga_id'],
+            'temporada': doc.get('temporada'),
+            'season_id': doc['season_id'],
+            'tipo_tiempo': doc['tipo_tiempo'],
+            'jornada': doc['jornada'],
+            'ronda': doc.get('ronda'),
+            'hasta_fecha': doc.get('hasta_fecha'),
+            'total_equipos': len(doc['filas']),
+            'fecha_actualizacion': doc['updated_at'].isoformat() if doc.get('updated_at') else None,
+            'clasificacion': [fila_a_dict(fila) for fila in doc['filas']]
+        }
     
     def tabla_to_dict(self, tabla: TablaClasificacion) -> Dict[str, Any]:
         """
@@ -325,39 +549,7 @@ class ClassificationEngine:
             'total_equipos': len(tabla.filas),
             'fecha_actualizacion': tabla.fecha_actualizacion.isoformat(),
             'clasificacion': [
-                {
-                    'posicion': f.posicion,
-                    'equipo': f.equipo,
-                    'pj': f.pj,
-                    'v': f.v,
-                    'e': f.e,
-                    'd': f.d,
-                    'gf': f.gf,
-                    'gc': f.gc,
-                    'dif': f.dif,
-                    'pts': f.pts,
-                    'rendimiento': f.rendimiento,
-                    'local': {
-                        'pj': f.pj_l,
-                        'v': f.v_l,
-                        'e': f.e_l,
-                        'd': f.d_l,
-                        'gf': f.gf_l,
-                        'gc': f.gc_l,
-                        'pts': f.pts_l,
-                        'rendimiento': f.rendimiento_l
-                    },
-                    'visitante': {
-                        'pj': f.pj_v,
-                        'v': f.v_v,
-                        'e': f.e_v,
-                        'd': f.d_v,
-                        'gf': f.gf_v,
-                        'gc': f.gc_v,
-                        'pts': f.pts_v,
-                        'rendimiento': f.rendimiento_v
-                    }
-                }
+                fila_a_dict(f.model_dump())
                 for f in tabla.filas
             ]
         }
@@ -0,0 +1,608 @@
+"""
+========================================
+MÓDULO: cola_trabajos.py
+========================================
+
+Cola de trabajos persistente en MongoDB.
+
+Permite ejecutar tareas largas (scraping, construcción de estadísticas,
+backtesting) fuera del ciclo de una petición HTTP, con varios procesos
+(workers de uvicorn) compartiendo la misma cola.
+
+Cada trabajo es un documento de la colección `jobs` con su estado,
+progreso, logs y un lease: el worker que lo reclama lo renueva con
+latidos periódicos. Si el proceso muere, el lease caduca y otro worker
+vuelve a reclamar el trabajo (hasta TRABAJOS_MAX_INTENTOS veces).
+
+Estados:
+--------
+pendiente -> en_ejecucion -> completado | error | cancelado
+
+Clases:
+-------
+- ColaTrabajos: Operaciones atómicas sobre la colección de trabajos
+- ContextoTrabajo: Progreso/logs de un trabajo en ejecución
+- WorkerTrabajos: Bucle que reclama y ejecuta trabajos en paralelo
+"""
+
+from typing import Dict, List, Optional, Any, Callable, Awaitable
+from datetime import datetime, timezone, timedelta
+import asyncio
+import logging
+import os
+import socket
+import uuid
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+
+PENDIENTE = "pendiente"
+EN_EJECUCION = "en_ejecucion"
+COMPLETADO = "completado"
+ERROR = "error"
+CANCELADO = "cancelado"
+
+ESTADOS_ACTIVOS = [PENDIENTE, EN_EJECUCION]
+
+
+def _ahora() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class ColaTrabajos:
+    """
+    Cola de trabajos respaldada por una colección de MongoDB.
+    
+    Todas las transiciones de estado son operaciones atómicas
+    (find_one_and_update / update_one con filtro por worker), de modo
+    que varios procesos pueden compartir la cola sin coordinarse.
+    
+    Ejemplo de Uso:
+    ---------------
+    ```python
+    cola = ColaTrabajos(db)
+    await cola.asegurar_indices()
+    trabajo, nuevo = await cola.encolar('construir_estadisticas', {'season_id': 'SPAIN_LA_LIGA_2023-24'})
+    trabajo = await cola.obtener(trabajo['_id'])
+    ```
+    """
+    
+    def __init__(
+        self,
+        db,
+        lease_segundos: float = Config.TRABAJOS_LEASE_SEGUNDOS,
+        max_intentos: int = Config.TRABAJOS_MAX_INTENTOS
+    ):
+        """
+        Inicializa la cola.
+        
+        Parámetros:
+        -----------
+        db : AsyncIOMotorDatabase
+            Conexión a MongoDB
+        lease_segundos : float
+            Tiempo que un worker conserva un trabajo sin enviar latidos
+        max_intentos : int
+            Reclamaciones máximas de un trabajo (reintentos tras caídas)
+        """
+        self.db = db
+        self.collection = db[Config.COLECCION_TRABAJOS]
+        self.lease_segundos = lease_segundos
+        self.max_intentos = max_intentos
+        # Despierta a los workers de este proceso al encolar
+        self.nuevo_trabajo = asyncio.Event()
+    
+    async def asegurar_indices(self) -> None:
+        """
+        Crea los índices de la colección de trabajos.
+        
+        El índice único parcial sobre `clave` garantiza que no haya dos
+        trabajos pendientes equivalentes aunque se encolen desde procesos
+        distintos.
+        """
+        await self.collection.create_index([("estado", 1), ("creado", 1)], name="idx_estado_creado")
+        await self.collection.create_index([("tipo", 1), ("creado", -1)], name="idx_tipo_creado")
+        await self.collection.create_index([("padre_id", 1)], name="idx_padre")
+        await self.collection.create_index(
+            [("clave", 1)],
+            name="idx_clave_pendiente",
+            unique=True,
+            partialFilterExpression={"estado": PENDIENTE, "clave": {"$type": "string"}}
+        )
+    
+    async def encolar(
+        self,
+        tipo: str,
+        parametros: Optional[Dict[str, Any]] = None,
+        clave: Optional[str] = None,
+        padre_id: Optional[str] = None
+    ) -> tuple:
+        """
+        Agrega un trabajo a la cola.
+        
+        Parámetros:
+        -----------
+        tipo : str
+            Tipo de trabajo (debe tener manejador en el worker)
+        parametros : dict
+            Parámetros del trabajo
+        clave : str, optional
+            Clave de deduplicación: si ya hay un trabajo pendiente con la
+            misma clave se reutiliza en lugar de crear otro
+        padre_id : str, optional
+            Trabajo que originó este (p. ej. el scraping de una liga)
+        
+        Retorna:
+        --------
+        tuple
+            (trabajo, creado)
+        """
+        if clave:
+            existente = await self.collection.find_one({"clave": clave, "estado": PENDIENTE})
+            if existente:
+                return existente, False
+        
+        ahora = _ahora()
+        trabajo = {
+            "_id": str(uuid.uuid4()),
+            "tipo": tipo,
+            "parametros": parametros or {},
+            "clave": clave,
+            "padre_id": padre_id,
+            "estado": PENDIENTE,
+            "progreso": 0,
+            "mensaje": "En cola",
+            "logs": [],
+            "resultado": None,
+            "error": None,
+            "intentos": 0,
+            "worker_id": None,
+            "lease_hasta": None,
+            "cancelar": False,
+            "creado": ahora,
+            "actualizado": ahora,
+            "iniciado": None,
+            "terminado": None
+        }
+        
+        try:
+            await self.collection.insert_one(trabajo)
+        except DuplicateKeyError:
+            # Otro proceso encoló el mismo trabajo entre la búsqueda y la inserción
+            existente = await self.collection.find_one({"clave": clave, "estado": PENDIENTE})
+            if existente:
+                return existente, False
+            raise
+        
+        self.nuevo_trabajo.set()
+        logger.info(f"Trabajo encolado: {tipo} {trabajo['_id']}")
+        return trabajo, True
+    
+    async def reclamar(self, worker_id: str, tipos: List[str]) -> Optional[Dict[str, Any]]:
+        """
+        Reclama el trabajo más antiguo disponible.
+        
+        Disponible = pendiente, o en ejecución con el lease caducado
+        (su worker dejó de enviar latidos) y sin agotar los intentos.
+        
+        Retorna:
+        --------
+        dict or None
+            Trabajo reclamado
+        """
+        ahora = _ahora()
+        
+        # Trabajos abandonados demasiadas veces: no reintentar más
+        await self.collection.update_many(
+            {
+                "estado": EN_EJECUCION,
+                "lease_hasta": {"$lt": ahora},
+                "intentos": {"$gte": self.max_intentos}
+            },
+            {"$set": {
+                "estado": ERROR,
+                "error": "Lease expirado: el worker dejó de responder",
+                "terminado": ahora,
+                "actualizado": ahora
+            }}
+        )
+        
+        return await self.collection.find_one_and_update(
+            {
+                "tipo": {"$in": tipos},
+                "$or": [
+                    {"estado": PENDIENTE},
+                    {"estado": EN_EJECUCION, "lease_hasta": {"$lt": ahora}}
+                ]
+            },
+            {
+                "$set": {
+                    "estado": EN_EJECUCION,
+                    "worker_id": worker_id,
+                    "lease_hasta": ahora + timedelta(seconds=self.lease_segundos),
+                    "iniciado": ahora,
+                    "actualizado": ahora
+                },
+                "$inc": {"intentos": 1}
+            },
+            sort=[("creado", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+    
+    async def latido(
+        self,
+        trabajo_id: str,
+        worker_id: str,
+        progreso: Optional[int] = None,
+        mensaje: Optional[str] = None,
+        logs: Optional[List[str]] = None
+    ) -> Optional[bool]:
+        """
+        Renueva el lease de un trabajo y publica su progreso.
+        
+        Retorna:
+        --------
+        bool or None
+            True si se pidió cancelar el trabajo, False si no, y None si
+            este worker ya no es su dueño (el lease caducó y otro lo tomó)
+        """
+        ahora = _ahora()
+        actualizacion: Dict[str, Any] = {"$set": {
+            "lease_hasta": ahora + timedelta(seconds=self.lease_segundos),
+            "actualizado": ahora
+        }}
+        if progreso is not None:
+            actualizacion["$set"]["progreso"] = progreso
+        if mensaje is not None:
+            actualizacion["$set"]["mensaje"] = mensaje
+        if logs:
+            actualizacion["$push"] = {"logs": {"$each": logs, "$slice": -Config.TRABAJOS_MAX_LOGS}}
+        
+        trabajo = await self.collection.find_one_and_update(
+            {"_id": trabajo_id, "worker_id": worker_id, "estado": EN_EJECUCION},
+            actualizacion,
+            projection={"cancelar": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if trabajo is None:
+            return None
+        return bool(trabajo.get("cancelar"))
+    
+    async def finalizar(
+        self,
+        trabajo_id: str,
+        worker_id: str,
+        estado: str,
+        resultado: Any = None,
+        error: Optional[str] = None
+    ) -> bool:
+        """
+        Marca un trabajo como completado, con error o cancelado.
+        
+        Retorna:
+        --------
+        bool
+            False si este worker ya no era el dueño del trabajo
+        """
+        ahora = _ahora()
+        cambios: Dict[str, Any] = {
+            "estado": estado,
+            "error": error,
+            "lease_hasta": None,
+            "terminado": ahora,
+            "actualizado": ahora
+        }
+        if estado == COMPLETADO:
+            cambios["progreso"] = 100
+            cambios["resultado"] = resultado
+        
+        r = await self.collection.update_one(
+            {"_id": trabajo_id, "worker_id": worker_id, "estado": EN_EJECUCION},
+            {"$set": cambios}
+        )
+        return r.modified_count == 1
+    
+    async def liberar(self, trabajo_id: str, worker_id: str) -> None:
+        """
+        Devuelve un trabajo a la cola (el worker se está deteniendo).
+        
+        El intento no cuenta: otro worker lo retoma desde el principio.
+        """
+        await self.collection.update_one(
+            {"_id": trabajo_id, "worker_id": worker_id, "estado": EN_EJECUCION},
+            {
+                "$set": {
+                    "estado": PENDIENTE,
+                    "worker_id": None,
+                    "lease_hasta": None,
+                    "mensaje": "Reencolado (worker detenido)",
+                    "actualizado": _ahora()
+                },
+                "$inc": {"intentos": -1}
+            }
+        )
+        self.nuevo_trabajo.set()
+    
+    async def solicitar_cancelacion(self, trabajo_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Cancela un trabajo.
+        
+        Un trabajo pendiente se cancela de inmediato; uno en ejecución
+        queda marcado y su worker lo detiene en el siguiente latido.
+        
+        Retorna:
+        --------
+        dict or None
+            Trabajo actualizado, o None si no existe o ya terminó
+        """
+        ahora = _ahora()
+        trabajo = await self.collection.find_one_and_update(
+            {"_id": trabajo_id, "estado": PENDIENTE},
+            {"$set": {
+                "estado": CANCELADO,
+                "mensaje": "Proceso cancelado",
+                "terminado": ahora,
+                "actualizado": ahora
+            }},
+            return_document=ReturnDocument.AFTER
+        )
+        if trabajo:
+            return trabajo
+        
+        return await self.collection.find_one_and_update(
+            {"_id": trabajo_id, "estado": EN_EJECUCION},
+            {"$set": {"cancelar": True, "actualizado": ahora}},
+            return_document=ReturnDocument.AFTER
+        )
+    
+    async def obtener(self, trabajo_id: str) -> Optional[Dict[str, Any]]:
+        """Obtiene un trabajo por ID."""
+        return await self.collection.find_one({"_id": trabajo_id})
+    
+    async def activo(self, clave: str) -> Optional[Dict[str, Any]]:
+        """Trabajo pendiente o en ejecución con esa clave, si lo hay."""
+        return await self.collection.find_one(
+            {"clave": clave, "estado": {"$in": ESTADOS_ACTIVOS}},
+            {"logs": 0}
+        )
+    
+    async def listar(
+        self,
+        tipo: Optional[str] = None,
+        estado: Optional[str] = None,
+        padre_id: Optional[str] = None,
+        ids: Optional[List[str]] = None,
+        limite: int = 50,
+        con_logs: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Lista trabajos, del más reciente al más antiguo.
+        
+        Parámetros:
+        -----------
+        tipo, estado, padre_id : str, optional
+            Filtros
+        ids : list, optional
+            Solo estos trabajos
+        limite : int
+            Máximo de trabajos (0 = sin límite)
+        con_logs : bool
+            Incluir los logs (por defecto se omiten)
+        """
+        query: Dict[str, Any] = {}
+        if tipo:
+            query["tipo"] = tipo
+        if estado:
+            query["estado"] = estado
+        if padre_id:
+            query["padre_id"] = padre_id
+        if ids is not None:
+            query["_id"] = {"$in": ids}
+        
+        projection = None if con_logs else {"logs": 0}
+        cursor = self.collection.find(query, projection).sort("creado", -1)
+        if limite:
+            cursor = cursor.limit(limite)
+        return await cursor.to_list(length=limite or None)
+
+
+class ContextoTrabajo:
+    """
+    Vista de un trabajo en ejecución para su manejador.
+    
+    `reportar` y `log` son síncronos (se pueden llamar desde callbacks
+    como el de progreso del scraping): solo actualizan el estado local y
+    el worker lo vuelca a MongoDB en el siguiente latido.
+    """
+    
+    def __init__(self, trabajo: Dict[str, Any]):
+        self.id: str = trabajo["_id"]
+        self.tipo: str = trabajo["tipo"]
+        self.parametros: Dict[str, Any] = trabajo.get("parametros") or {}
+        self.progreso: int = trabajo.get("progreso", 0)
+        self.mensaje: str = trabajo.get("mensaje", "")
+        self._logs: List[str] = []
+        self._cambio = asyncio.Event()
+    
+    def reportar(self, progreso: Optional[int] = None, mensaje: Optional[str] = None) -> None:
+        """Actualiza el progreso (0-100) y/o el mensaje del trabajo."""
+        if progreso is not None:
+            self.progreso = max(0, min(100, int(progreso)))
+        if mensaje is not None:
+            self.mensaje = mensaje
+        self._cambio.set()
+    
+    def log(self, mensaje: str) -> None:
+        """Agrega una línea al log del trabajo."""
+        self._logs.append(f"{datetime.now()}: {mensaje}")
+        self._cambio.set()
+    
+    def _volcar(self) -> Dict[str, Any]:
+        """Cambios pendientes de publicar (para ColaTrabajos.latido)."""
+        logs, self._logs = self._logs, []
+        self._cambio.clear()
+        return {"progreso": self.progreso, "mensaje": self.mensaje, "logs": logs}
+
+
+Manejador = Callable[[ContextoTrabajo], Awaitable[Any]]
+
+
+class WorkerTrabajos:
+    """
+    Bucle de ejecución de trabajos.
+    
+    Lanza `concurrencia` ranuras; cada una reclama un trabajo, ejecuta su
+    manejador y envía latidos (lease + progreso) mientras corre. Cada
+    proceso del servidor puede tener su propio worker sobre la misma cola.
+    
+    Ejemplo de Uso:
+    ---------------
+    ```python
+    async def construir(ctx: ContextoTrabajo):
+        ctx.reportar(50, "Construyendo...")
+        return {"equipos": 20}
+    
+    worker = WorkerTrabajos(cola, {'construir_estadisticas': construir}, concurrencia=4)
+    worker.iniciar()
+    ...
+    await worker.detener()
+    ```
+    """
+    
+    def __init__(
+        self,
+        cola: ColaTrabajos,
+        manejadores: Dict[str, Manejador],
+        concurrencia: int = Config.TRABAJOS_CONCURRENCIA,
+        intervalo_sondeo: float = Config.TRABAJOS_INTERVALO_SONDEO
+    ):
+        """
+        Inicializa el worker.
+        
+        Parámetros:
+        -----------
+        cola : ColaTrabajos
+            Cola de la que reclamar trabajos
+        manejadores : dict
+            {tipo: corrutina(contexto) -> resultado}
+        concurrencia : int
+            Trabajos simultáneos en este proceso
+        intervalo_sondeo : float
+            Segundos entre consultas a la cola cuando está vacía
+        """
+        self.cola = cola
+        self.manejadores = manejadores
+        self.concurrencia = concurrencia
+        self.intervalo_sondeo = intervalo_sondeo
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._ranuras: List[asyncio.Task] = []
+        self._deteniendo = False
+    
+    @property
+    def tipos(self) -> List[str]:
+        return list(self.manejadores)
+    
+    def iniciar(self) -> None:
+        """Lanza las ranuras del worker en el event loop actual."""
+        self._deteniendo = False
+        self._ranuras = [
+            asyncio.create_task(self._ranura(i)) for i in range(self.concurrencia)
+        ]
+        logger.info(f"Worker {self.worker_id} iniciado con {self.concurrencia} ranuras: {self.tipos}")
+    
+    async def detener(self) -> None:
+        """Detiene las ranuras y devuelve a la cola los trabajos en curso."""
+        self._deteniendo = True
+        for ranura in self._ranuras:
+            ranura.cancel()
+        await asyncio.gather(*self._ranuras, return_exceptions=True)
+        self._ranuras = []
+        logger.info(f"Worker {self.worker_id} detenido")
+    
+    async def _ranura(self, indice: int) -> None:
+        while True:
+            try:
+                trabajo = await self.cola.reclamar(self.worker_id, self.tipos)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error reclamando trabajos: {str(e)}")
+                trabajo = None
+            
+            if trabajo is None:
+                self.cola.nuevo_trabajo.clear()
+                try:
+                    await asyncio.wait_for(self.cola.nuevo_trabajo.wait(), self.intervalo_sondeo)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            try:
+                await self._ejecutar(trabajo)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error ejecutando trabajo {trabajo['_id']}: {str(e)}")
+    
+    async def _ejecutar(self, trabajo: Dict[str, Any]) -> None:
+        """Ejecuta un trabajo reclamado enviando latidos hasta que termine."""
+        ctx = ContextoTrabajo(trabajo)
+        ctx.log(f"Iniciado por {self.worker_id} (intento {trabajo.get('intentos', 1)})")
+        tarea = asyncio.create_task(self.manejadores[ctx.tipo](ctx))
+        intervalo_latido = self.cola.lease_segundos / 3
+        propio = True
+        cancelada = False
+        
+        try:
+            while not tarea.done():
+                cambio = asyncio.create_task(ctx._cambio.wait())
+                await asyncio.wait({tarea, cambio}, timeout=intervalo_latido, return_when=asyncio.FIRST_COMPLETED)
+                cambio.cancel()
+                if tarea.done():
+                    break
+                
+                try:
+                    cancelar = await self.cola.latido(ctx.id, self.worker_id, **ctx._volcar())
+                except Exception as e:
+                    # Se reintenta en el siguiente latido, antes de que caduque el lease
+                    logger.warning(f"Latido fallido para {ctx.id}: {str(e)}")
+                    continue
+                
+                if cancelar is None:
+                    # Otro worker tomó el trabajo: abandonar sin escribir
+                    logger.warning(f"Trabajo {ctx.id} perdió el lease; se abandona")
+                    propio = False
+                    tarea.cancel()
+                elif cancelar and not cancelada:
+                    ctx.log("Cancelado por el usuario")
+                    cancelada = True
+                    tarea.cancel()
+            
+            try:
+                resultado = await tarea
+                estado, error = COMPLETADO, None
+            except asyncio.CancelledError:
+                resultado, estado, error = None, CANCELADO, None
+                ctx.reportar(mensaje="Proceso cancelado")
+            except Exception as e:
+                logger.error(f"Trabajo {ctx.tipo} {ctx.id} falló: {str(e)}")
+                resultado, estado, error = None, ERROR, str(e)
+                ctx.reportar(mensaje=f"Error: {str(e)}")
+                ctx.log(f"Error - {str(e)}")
+            
+            if propio:
+                await self.cola.latido(ctx.id, self.worker_id, **ctx._volcar())
+                await self.cola.finalizar(ctx.id, self.worker_id, estado, resultado, error)
+        
+        except asyncio.CancelledError:
+            # El worker se detiene: cancelar el manejador y reencolar
+            tarea.cancel()
+            await asyncio.gather(tarea, return_exceptions=True)
+            if propio and self._deteniendo:
+                await asyncio.shield(self.cola.liberar(ctx.id, self.worker_id))
+            raise
@@ -250,11 +250,62 @@ class Config:
         'goles_visita_1mt': 0.54,
     }
     
+    # Máximo de operaciones por bulk_write (un round-trip por bloque)
+    TAMANO_LOTE_ESCRITURA: int = 500
+    
+    # Máximo de pronósticos simultáneos en los endpoints por partido
+    # (jornada, mejores apuestas); cada uno hace varias lecturas a MongoDB
+    CONCURRENCIA_PRONOSTICOS: int = 8
+    
+    # Partidos por bloque en las respuestas en streaming (NDJSON/SSE)
+    TAMANO_BLOQUE_STREAM: int = 10
+    
+    # Documentos por bloque en /api/export (batch del cursor y de escritura)
+    TAMANO_BLOQUE_EXPORTACION: int = 500
+    
+    # Cache compartida de estadísticas de equipos (cache_estadisticas.py)
+    CACHE_EQUIPOS_MAX_ENTRADAS: int = 2000
+    CACHE_EQUIPOS_TTL_SEGUNDOS: int = 600
+    
+    # Series de snapshots por temporada en memoria (StatsBuilder): LRU + TTL
+    CACHE_SNAPSHOTS_MAX_TEMPORADAS: int = 20
+    CACHE_SNAPSHOTS_TTL_SEGUNDOS: int = 600
+    
+    # Memo de pronósticos en memoria (además del respaldo en MongoDB)
+    MEMO_PRONOSTICOS_MAX_ENTRADAS: int = 5000
+    
+    # Cola de trabajos en MongoDB (cola_trabajos.py)
+    # Trabajos simultáneos por proceso, lease renovado con latidos cada
+    # lease/3 segundos y reclamaciones máximas tras caídas del worker
+    TRABAJOS_CONCURRENCIA: int = 4
+    TRABAJOS_LEASE_SEGUNDOS: int = 60
+    TRABAJOS_INTERVALO_SONDEO: float = 1.0
+    TRABAJOS_MAX_INTENTOS: int = 3
+    TRABAJOS_MAX_LOGS: int = 200
+    
+    # Histórico consolidado precalculado (historico_equipos): temporadas
+    # del resumen guardado y temporadas candidatas por equipo
+    HISTORICO_TEMPORADAS: int = 3
+    HISTORICO_MAX_TEMPORADAS: int = 20
+    
+    # Índice H2H por pareja (h2h_pares): enfrentamientos guardados por pareja
+    H2H_MAX_PARTIDOS: int = 40
+    
+    # Backtesting walk-forward: procesos máximos (una temporada por tarea)
+    BACKTEST_MAX_PROCESOS: int = 8
+    
     # Colecciones de MongoDB
     COLECCION_PARTIDOS: str = "football_matches"
     COLECCION_ESTADISTICAS: str = "team_statistics"
     COLECCION_PRONOSTICOS: str = "predictions"
     COLECCION_VALIDACIONES: str = "validations"
+    COLECCION_SNAPSHOTS: str = "team_statistics_snapshots"
+    COLECCION_WATERMARKS: str = "stats_watermarks"
+    COLECCION_TRABAJOS: str = "jobs"
+    COLECCION_CLASIFICACIONES: str = "clasificaciones"
+    COLECCION_HISTORICO: str = "historico_equipos"
+    COLECCION_H2H: str = "h2h_pares"
+    COLECCION_MEMO: str = "pronosticos_memo"
     
     @classmethod
     def to_dict(cls) -> Dict[str, Any]:
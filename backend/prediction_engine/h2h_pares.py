@@ -0,0 +1,252 @@
+"""
+========================================
+MÓDULO: h2h_pares.py
+========================================
+
+Índice de enfrentamientos directos (H2H) por pareja de equipos.
+
+La colección `h2h_pares` guarda un documento por liga y pareja no
+ordenada de equipos (equipo_a < equipo_b), con los enfrentamientos
+terminados más recientes y los totales de toda la serie:
+
+    {liga_id, equipo_a, equipo_b,
+     partidos: [{match_id, season_id, fecha, equipo_local,
+                 equipo_visitante, goles_local_TR, goles_visitante_TR}, ...],
+     totales: {partidos, victorias_a, victorias_b, empates, goles_a, goles_b},
+     ultima_fecha, updated_at}
+
+`partidos` va del más reciente al más antiguo y se recorta a
+Config.H2H_MAX_PARTIDOS. Cada actualización recalcula las parejas
+afectadas desde football_matches, así que reingerir un partido (o
+corregir su resultado) no lo cuenta dos veces.
+
+Lo mantienen el scraper al guardar partidos (DatabaseManager), la
+importación de snapshots y StatsBuilder; lo lee HistoricoConsolidado.
+
+Funciones:
+----------
+- clave_par: Pareja en orden canónico
+- consulta_enfrentamientos: Filtro de football_matches para unas parejas
+- documentos_h2h: Documentos de h2h_pares a partir de los partidos
+- partidos_h2h: Enfrentamientos de un documento (límite y fecha)
+- reemplazos_h2h: Upserts de los documentos
+- actualizar_h2h_sync: Recalcula y guarda parejas (pymongo)
+"""
+
+from typing import Dict, Iterable, List, Optional, Any, Tuple
+from datetime import datetime, timezone
+import logging
+
+from pymongo import ReplaceOne
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+# Campos de football_matches que se guardan por enfrentamiento
+CAMPOS_ENFRENTAMIENTO = (
+    "match_id",
+    "season_id",
+    "fecha",
+    "equipo_local",
+    "equipo_visitante",
+    "goles_local_TR",
+    "goles_visitante_TR",
+)
+
+
+def clave_par(equipo1: str, equipo2: str) -> Tuple[str, str]:
+    """
+    Pareja en orden canónico (equipo_a, equipo_b), con equipo_a < equipo_b.
+    """
+    return (equipo1, equipo2) if equipo1 <= equipo2 else (equipo2, equipo1)
+
+
+def consulta_enfrentamientos(
+    liga_id: Optional[str] = None,
+    pares: Optional[Iterable[Tuple[str, str]]] = None
+) -> Dict[str, Any]:
+    """
+    Filtro de football_matches con los partidos terminados de unas parejas.
+    
+    Sin `pares` cubre toda la liga (o todas las ligas si tampoco hay
+    `liga_id`). Con `pares` filtra por los equipos involucrados: el
+    resultado puede incluir parejas no pedidas, que documentos_h2h descarta.
+    """
+    query: Dict[str, Any] = {"estado_del_partido": "Match Finished"}
+    if liga_id:
+        query["liga_id"] = liga_id
+    if pares is not None:
+        equipos = sorted({e for par in pares for e in par})
+        query["equipo_local"] = {"$in": equipos}
+        query["equipo_visitante"] = {"$in": equipos}
+    return query
+
+
+def _documento_vacio(liga_id: str, equipo_a: str, equipo_b: str, ahora: datetime) -> Dict[str, Any]:
+    """Documento de una pareja sin enfrentamientos."""
+    return {
+        "liga_id": liga_id,
+        "equipo_a": equipo_a,
+        "equipo_b": equipo_b,
+        "partidos": [],
+        "totales": {
+            "partidos": 0,
+            "victorias_a": 0,
+            "victorias_b": 0,
+            "empates": 0,
+            "goles_a": 0,
+            "goles_b": 0
+        },
+        "ultima_fecha": None,
+        "updated_at": ahora
+    }
+
+
+def documentos_h2h(
+    partidos: Iterable[Dict[str, Any]],
+    liga_id: Optional[str] = None,
+    pares: Optional[Iterable[Tuple[str, str]]] = None
+) -> Dict[Tuple[str, str, str], Dict[str, Any]]:
+    """
+    Construye los documentos de h2h_pares a partir de partidos terminados.
+    
+    Parámetros:
+    -----------
+    partidos : Iterable[dict]
+        Partidos terminados ordenados por fecha DESC (consulta_enfrentamientos)
+    liga_id : str, optional
+        Liga de las parejas pedidas
+    pares : Iterable[Tuple[str, str]], optional
+        Parejas a construir. Las que no tienen enfrentamientos reciben un
+        documento vacío; los partidos de otras parejas se ignoran. Sin
+        `pares` se construyen todas las parejas de los partidos.
+    
+    Retorna:
+    --------
+    Dict[(liga_id, equipo_a, equipo_b), dict]
+        Documento por pareja
+    """
+    # Milisegundos, como los guarda MongoDB (actualizar_h2h_sync compara updated_at)
+    ahora = datetime.now(timezone.utc)
+    ahora = ahora.replace(microsecond=ahora.microsecond // 1000 * 1000)
+    docs: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+    
+    if pares is not None:
+        for par in pares:
+            equipo_a, equipo_b = clave_par(*par)
+            docs[(liga_id, equipo_a, equipo_b)] = _documento_vacio(liga_id, equipo_a, equipo_b, ahora)
+    
+    for p in partidos:
+        equipo_a, equipo_b = clave_par(p["equipo_local"], p["equipo_visitante"])
+        clave = (p.get("liga_id", liga_id), equipo_a, equipo_b)
+        doc = docs.get(clave)
+        if doc is None:
+            if pares is not None:
+                continue
+            doc = docs[clave] = _documento_vacio(clave[0], equipo_a, equipo_b, ahora)
+        
+        g_local = p.get("goles_local_TR", 0) or 0
+        g_visita = p.get("goles_visitante_TR", 0) or 0
+        goles_a, goles_b = (g_local, g_visita) if p["equipo_local"] == equipo_a else (g_visita, g_local)
+        
+        totales = doc["totales"]
+        totales["partidos"] += 1
+        totales["goles_a"] += goles_a
+        totales["goles_b"] += goles_b
+        if goles_a > goles_b:
+            totales["victorias_a"] += 1
+        elif goles_a < goles_b:
+            totales["victorias_b"] += 1
+        else:
+            totales["empates"] += 1
+        
+        if doc["ultima_fecha"] is None:
+            doc["ultima_fecha"] = p.get("fecha")
+        if len(doc["partidos"]) < Config.H2H_MAX_PARTIDOS:
+            doc["partidos"].append({campo: p.get(campo) for campo in CAMPOS_ENFRENTAMIENTO})
+    
+    return docs
+
+
+def partidos_h2h(
+    doc: Dict[str, Any],
+    limite: int,
+    hasta_fecha: Optional[str] = None
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Últimos `limite` enfrentamientos del documento anteriores a `hasta_fecha`.
+    
+    Retorna None si el documento está recortado y no alcanza para
+    responder (hay que consultar football_matches).
+    """
+    partidos = doc.get("partidos", [])
+    if hasta_fecha:
+        partidos = [p for p in partidos if (p.get("fecha") or "") < hasta_fecha]
+    
+    recortado = len(doc.get("partidos", [])) < doc.get("totales", {}).get("partidos", 0)
+    if len(partidos) < limite and recortado:
+        return None
+    return partidos[:limite]
+
+
+def reemplazos_h2h(docs: Dict[Tuple[str, str, str], Dict[str, Any]]) -> List[ReplaceOne]:
+    """Upserts de los documentos de h2h_pares (clave liga_id + pareja)."""
+    return [
+        ReplaceOne(
+            {"liga_id": liga_id, "equipo_a": equipo_a, "equipo_b": equipo_b},
+            doc,
+            upsert=True
+        )
+        for (liga_id, equipo_a, equipo_b), doc in docs.items()
+    ]
+
+
+def actualizar_h2h_sync(
+    db,
+    liga_id: Optional[str] = None,
+    pares: Optional[Iterable[Tuple[str, str]]] = None
+) -> int:
+    """
+    Recalcula y guarda el índice H2H de unas parejas (pymongo).
+    
+    Sin `pares` reconstruye la liga completa (o todas las ligas si
+    tampoco hay `liga_id`) y elimina las parejas que ya no tienen
+    enfrentamientos.
+    
+    Parámetros:
+    -----------
+    db : pymongo.database.Database
+        Base de datos
+    liga_id : str, optional
+        Liga de las parejas (obligatoria si se pasan `pares`)
+    pares : Iterable[Tuple[str, str]], optional
+        Parejas a recalcular
+    
+    Retorna:
+    --------
+    int
+        Número de parejas guardadas
+    """
+    if pares is not None:
+        pares = list(pares)
+        if not pares:
+            return 0
+    
+    cursor = db[Config.COLECCION_PARTIDOS].find(
+        consulta_enfrentamientos(liga_id, pares),
+        {"_id": 0, "liga_id": 1, **{campo: 1 for campo in CAMPOS_ENFRENTAMIENTO}}
+    ).sort("fecha", -1)
+    docs = documentos_h2h(cursor, liga_id, pares)
+    
+    coleccion = db[Config.COLECCION_H2H]
+    if docs:
+        coleccion.bulk_write(reemplazos_h2h(docs), ordered=False)
+    if pares is None:
+        # Reconstrucción completa: fuera las parejas no recalculadas
+        filtro = {"liga_id": liga_id} if liga_id else {}
+        ahora = next(iter(docs.values()))["updated_at"] if docs else datetime.now(timezone.utc)
+        coleccion.delete_many({**filtro, "updated_at": {"$lt": ahora}})
+    
+    logger.info(f"Índice H2H actualizado: {len(docs)} parejas")
+    return len(docs)
@@ -12,15 +12,36 @@ temporadas para mejorar las predicciones, implementando:
 2. Historial de enfrentamientos directos (H2H)
 3. Tendencias a largo plazo por equipo
 
+Las estadísticas históricas ponderadas de cada equipo se guardan
+precalculadas en la colección historico_equipos (un documento por liga y
+equipo) y se refrescan cada vez que se construye una temporada del equipo.
+Los enfrentamientos directos se leen del índice por pareja h2h_pares
+(ver h2h_pares.py).
+
 Historial de Cambios:
 --------------------
 - v1.0.0 (Dic 2024): Versión inicial
+- v1.1.0: Históricos precalculados por equipo (historico_equipos)
+- v1.2.0: H2H desde el índice por pareja (h2h_pares) y H2H por jornada
+- v1.2.1: Factores históricos a fecha (hasta_fecha) sin temporadas futuras
 """
 
 from typing import Dict, List, Optional, Any, Tuple
-from datetime import datetime
+from datetime import datetime, timezone
 import logging
 
+from pymongo import ReplaceOne
+
+from .config import Config
+from .h2h_pares import (
+    CAMPOS_ENFRENTAMIENTO,
+    clave_par,
+    consulta_enfrentamientos,
+    documentos_h2h,
+    partidos_h2h,
+    reemplazos_h2h
+)
+
 logger = logging.getLogger(__name__)
 
 
@@ -82,6 +103,9 @@ class HistoricoConsolidado:
         """
         Obtiene estadísticas históricas consolidadas de un equipo.
         
+        Una lectura del histórico precalculado (historico_equipos); si el
+        equipo aún no lo tiene, se calcula y se guarda.
+        
         Parámetros:
         -----------
         equipo : str
@@ -95,34 +119,8 @@ class HistoricoConsolidado:
         --------
         Dict con estadísticas ponderadas
         """
-        # Obtener temporadas disponibles
-        seasons = await self.obtener_temporadas_disponibles(liga_id, equipo)
-        
-        if not seasons:
-            return None
-        
-        # Limitar a las últimas N temporadas
-        seasons = seasons[:temporadas]
-        
-        # Obtener stats de cada temporada desde team_statistics
-        stats_por_temporada = []
-        
-        for season_id in seasons:
-            stats = await self.db.team_statistics.find_one(
-                {"nombre": equipo, "season_id": season_id},
-                {"_id": 0}
-            )
-            if stats and "stats_completo" in stats:
-                stats_por_temporada.append({
-                    "season_id": season_id,
-                    "stats": stats["stats_completo"]
-                })
-        
-        if not stats_por_temporada:
-            return None
-        
-        # Calcular estadísticas ponderadas
-        return self._calcular_stats_ponderadas(stats_por_temporada)
+        historicos = await self.obtener_stats_historicas_lote([equipo], liga_id, temporadas)
+        return historicos.get(equipo)
     
     def _calcular_stats_ponderadas(
         self, 
@@ -213,11 +211,15 @@ class HistoricoConsolidado:
         equipo1: str,
         equipo2: str,
         liga_id: Optional[str] = None,
-        limite: int = 10
+        limite: int = 10,
+        hasta_fecha: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Obtiene historial de enfrentamientos directos (Head to Head).
         
+        Con liga_id es una lectura del índice h2h_pares; si la pareja aún
+        no está indexada se calcula y se guarda.
+        
         Parámetros:
         -----------
         equipo1, equipo2 : str
@@ -226,12 +228,42 @@ class HistoricoConsolidado:
             Filtrar por liga específica
         limite : int
             Máximo de partidos a considerar
+        hasta_fecha : str, optional
+            Fecha 'YYYY-MM-DD'. Solo considera partidos anteriores a ella.
         
         Retorna:
         --------
         Dict con estadísticas de enfrentamientos directos
         """
-        # Buscar partidos entre estos dos equipos
+        partidos = None
+        if liga_id:
+            equipo_a, equipo_b = clave_par(equipo1, equipo2)
+            doc = await self.db[Config.COLECCION_H2H].find_one(
+                {"liga_id": liga_id, "equipo_a": equipo_a, "equipo_b": equipo_b},
+                {"_id": 0}
+            )
+            if doc is None:
+                docs = await self.actualizar_h2h(liga_id, [(equipo1, equipo2)])
+                doc = docs[(liga_id, equipo_a, equipo_b)]
+            partidos = partidos_h2h(doc, limite, hasta_fecha)
+        
+        if partidos is None:
+            partidos = await self._consultar_h2h(equipo1, equipo2, liga_id, limite, hasta_fecha)
+        
+        return self._resumir_h2h(partidos, equipo1, equipo2)
+    
+    async def _consultar_h2h(
+        self,
+        equipo1: str,
+        equipo2: str,
+        liga_id: Optional[str],
+        limite: int,
+        hasta_fecha: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        """
+        Enfrentamientos directos leídos de football_matches (sin liga o
+        cuando el índice h2h_pares está recortado).
+        """
         query = {
             "$or": [
                 {"equipo_local": equipo1, "equipo_visitante": equipo2},
@@ -242,12 +274,25 @@ class HistoricoConsolidado:
         
         if liga_id:
             query["liga_id"] = liga_id
+        if hasta_fecha:
+            query["fecha"] = {"$lt": hasta_fecha}
         
-        partidos = await self.db.football_matches.find(
+        return await self.db.football_matches.find(
             query,
             {"_id": 0}
         ).sort("fecha", -1).limit(limite).to_list(limite)
+    
+    def _resumir_h2h(
+        self,
+        partidos: List[Dict[str, Any]],
+        equipo1: str,
+        equipo2: str
+    ) -> Dict[str, Any]:
+        """
+        Resume los enfrentamientos directos (más reciente primero).
         
+        Compartido por la consulta individual y la carga por lotes.
+        """
         if not partidos:
             return {
                 "tiene_historial": False,
@@ -358,7 +403,9 @@ class HistoricoConsolidado:
         equipo_local: str,
         equipo_visitante: str,
         liga_id: str,
-        season_id_actual: str
+        season_id_actual: str,
+        hasta_fecha: Optional[str] = None,
+        stats_actuales: Optional[Dict[str, Dict[str, Any]]] = None
     ) -> Dict[str, Any]:
         """
         Calcula factores de ajuste basados en histórico.
@@ -367,14 +414,45 @@ class HistoricoConsolidado:
         - factor_historico_local: Ajuste para el local basado en historial
         - factor_historico_visita: Ajuste para visitante
         - factor_h2h: Ajuste basado en enfrentamientos directos
+        
+        Con `hasta_fecha` todo es a esa fecha (backtesting): el H2H solo
+        usa enfrentamientos anteriores y las stats históricas solo las
+        temporadas anteriores a `season_id_actual` más la temporada actual
+        a la fecha, que se recibe en `stats_actuales` (stats_completo por
+        nombre de equipo). Ver _ponderar_hasta_fecha.
         """
-        # Obtener stats históricas
-        hist_local = await self.obtener_stats_historicas(equipo_local, liga_id, 3)
-        hist_visita = await self.obtener_stats_historicas(equipo_visitante, liga_id, 3)
+        # Obtener stats históricas de ambos equipos (una lectura)
+        if hasta_fecha:
+            docs = await self._documentos_historico([equipo_local, equipo_visitante], liga_id)
+            historicos = {
+                equipo: self._ponderar_hasta_fecha(
+                    docs[equipo], season_id_actual, (stats_actuales or {}).get(equipo), 3
+                )
+                for equipo in (equipo_local, equipo_visitante)
+            }
+        else:
+            historicos = await self.obtener_stats_historicas_lote(
+                [equipo_local, equipo_visitante], liga_id, 3
+            )
+        hist_local = historicos.get(equipo_local)
+        hist_visita = historicos.get(equipo_visitante)
         
         # Obtener H2H
-        h2h = await self.obtener_h2h(equipo_local, equipo_visitante, liga_id, 10)
+        h2h = await self.obtener_h2h(
+            equipo_local, equipo_visitante, liga_id, 10, hasta_fecha=hasta_fecha
+        )
         
+        return self._combinar_factores(hist_local, hist_visita, h2h)
+    
+    def _combinar_factores(
+        self,
+        hist_local: Optional[Dict[str, Any]],
+        hist_visita: Optional[Dict[str, Any]],
+        h2h: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Combina históricos y H2H en los factores de ajuste del pronóstico.
+        """
         factores = {
             "factor_local": 1.0,
             "factor_visita": 1.0,
@@ -414,3 +492,421 @@ class HistoricoConsolidado:
             factores["factor_h2h_visita"] = 0.95 + (pct_visita / 1000)
         
         return factores
+    
+    # ============================================
+    # CARGA POR LOTES
+    # ============================================
+    
+    async def obtener_stats_historicas_lote(
+        self,
+        equipos: List[str],
+        liga_id: str,
+        temporadas: int = 3
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Versión por lotes de obtener_stats_historicas.
+        
+        Lee el histórico precalculado de todos los equipos con una sola
+        consulta; los que aún no lo tienen se calculan y se guardan.
+        
+        Parámetros:
+        -----------
+        equipos : List[str]
+            Nombres de los equipos
+        liga_id : str
+            ID de la liga
+        temporadas : int
+            Número de temporadas a considerar (default: 3)
+        
+        Retorna:
+        --------
+        Dict[str, dict or None]
+            Stats ponderadas por nombre de equipo
+        """
+        docs = await self._documentos_historico(equipos, liga_id)
+        return {
+            equipo: self._historico_desde_doc(doc, temporadas)
+            for equipo, doc in docs.items()
+        }
+    
+    async def _documentos_historico(
+        self,
+        equipos: List[str],
+        liga_id: str
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Documentos de historico_equipos de varios equipos (una consulta);
+        los que aún no existen se calculan y se guardan.
+        """
+        equipos = list(set(equipos))
+        if not equipos:
+            return {}
+        
+        docs = {}
+        cursor = self.db[Config.COLECCION_HISTORICO].find(
+            {"liga_id": liga_id, "nombre": {"$in": equipos}},
+            {"_id": 0}
+        )
+        async for doc in cursor:
+            docs[doc["nombre"]] = doc
+        
+        faltantes = [equipo for equipo in equipos if equipo not in docs]
+        if faltantes:
+            docs.update(await self.actualizar_historicos(liga_id, faltantes))
+        
+        return docs
+    
+    async def obtener_historicos_liga(
+        self,
+        liga_id: str,
+        temporadas: int = 3
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Históricos precalculados de todos los equipos de una liga.
+        
+        Parámetros:
+        -----------
+        liga_id : str
+            ID de la liga
+        temporadas : int
+            Número de temporadas a considerar (default: 3)
+        
+        Retorna:
+        --------
+        Dict[str, dict or None]
+            Stats ponderadas por nombre de equipo (solo equipos con
+            histórico guardado)
+        """
+        historicos = {}
+        cursor = self.db[Config.COLECCION_HISTORICO].find({"liga_id": liga_id}, {"_id": 0})
+        async for doc in cursor:
+            historicos[doc["nombre"]] = self._historico_desde_doc(doc, temporadas)
+        return historicos
+    
+    def _historico_desde_doc(
+        self,
+        doc: Dict[str, Any],
+        temporadas: int
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Stats ponderadas de las últimas `temporadas` a partir del documento
+        de historico_equipos (el resumen por defecto ya viene calculado).
+        """
+        if temporadas == Config.HISTORICO_TEMPORADAS:
+            return doc.get("resumen")
+        return self._ponderar_temporadas(doc["seasons"], doc["stats_por_temporada"], temporadas)
+    
+    def _ponderar_temporadas(
+        self,
+        seasons: List[str],
+        stats_por_temporada: List[Dict[str, Any]],
+        temporadas: int
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Pondera las stats de las últimas `temporadas` temporadas del equipo
+        (las que no tienen estadísticas construidas no cuentan).
+        """
+        seleccion = set(seasons[:temporadas])
+        items = [item for item in stats_por_temporada if item["season_id"] in seleccion]
+        return self._calcular_stats_ponderadas(items) if items else None
+    
+    def _ponderar_hasta_fecha(
+        self,
+        doc: Optional[Dict[str, Any]],
+        season_id_actual: Optional[str],
+        stats_actual: Optional[Dict[str, Any]],
+        temporadas: int
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Stats ponderadas sin datos posteriores a la fecha del pronóstico.
+        
+        El resumen guardado incluye el cierre de la temporada actual (y de
+        las siguientes si se reconstruyó después), así que no sirve para
+        backtesting. Aquí la temporada actual son sus stats a la fecha
+        (`stats_actual`, solo si ya ha jugado) y del documento solo cuentan
+        las temporadas anteriores a `season_id_actual` (los season_id de
+        una liga ordenan cronológicamente), que ya habían terminado.
+        """
+        previas = [
+            s for s in (doc or {}).get("seasons", [])
+            if season_id_actual and s < season_id_actual
+        ][:temporadas - 1]
+        
+        items = []
+        if stats_actual and stats_actual.get("partidos_jugados"):
+            items.append({"season_id": season_id_actual, "stats": stats_actual})
+        items.extend(
+            item for item in (doc or {}).get("stats_por_temporada", [])
+            if item["season_id"] in previas
+        )
+        return self._calcular_stats_ponderadas(items) if items else None
+    
+    async def actualizar_historicos(
+        self,
+        liga_id: str,
+        equipos: List[str]
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Recalcula y guarda el histórico precalculado de varios equipos.
+        
+        Descubre las temporadas de todos los equipos con una sola
+        agregación y lee sus estadísticas con una sola consulta. Se llama
+        al construir o actualizar una temporada (StatsBuilder).
+        
+        Parámetros:
+        -----------
+        equipos : List[str]
+            Nombres de los equipos
+        liga_id : str
+            ID de la liga
+        
+        Retorna:
+        --------
+        Dict[str, dict]
+            Documento guardado por nombre de equipo
+        """
+        equipos = list(set(equipos))
+        if not equipos:
+            return {}
+        
+        pipeline = [
+            {"$match": {
+                "liga_id": liga_id,
+                "$or": [
+                    {"equipo_local": {"$in": equipos}},
+                    {"equipo_visitante": {"$in": equipos}}
+                ]
+            }},
+            {"$project": {
+                "_id": 0,
+                "season_id": 1,
+                "equipo": ["$equipo_local", "$equipo_visitante"]
+            }},
+            {"$unwind": "$equipo"},
+            {"$match": {"equipo": {"$in": equipos}}},
+            {"$group": {"_id": {"equipo": "$equipo", "season_id": "$season_id"}}}
+        ]
+        
+        seasons_por_equipo: Dict[str, List[str]] = {}
+        async for r in self.db.football_matches.aggregate(pipeline):
+            if r["_id"].get("season_id"):
+                seasons_por_equipo.setdefault(r["_id"]["equipo"], []).append(
+                    r["_id"]["season_id"]
+                )
+        
+        # Mismo recorte que obtener_temporadas_disponibles
+        for equipo, seasons in seasons_por_equipo.items():
+            seasons_por_equipo[equipo] = sorted(seasons, reverse=True)[:Config.HISTORICO_MAX_TEMPORADAS]
+        
+        todas_seasons = {s for seasons in seasons_por_equipo.values() for s in seasons}
+        stats_docs: Dict[Tuple[str, str], Dict] = {}
+        
+        if todas_seasons:
+            cursor = self.db.team_statistics.find(
+                {
+                    "nombre": {"$in": list(seasons_por_equipo.keys())},
+                    "season_id": {"$in": list(todas_seasons)}
+                },
+                {"_id": 0, "nombre": 1, "season_id": 1, "stats_completo": 1}
+            )
+            async for doc in cursor:
+                stats_docs.setdefault((doc["nombre"], doc["season_id"]), doc)
+        
+        ahora = datetime.now(timezone.utc)
+        docs: Dict[str, Dict[str, Any]] = {}
+        for equipo in equipos:
+            seasons = seasons_por_equipo.get(equipo, [])
+            stats_por_temporada = []
+            for season_id in seasons:
+                stats = stats_docs.get((equipo, season_id))
+                if stats and "stats_completo" in stats:
+                    stats_por_temporada.append({
+                        "season_id": season_id,
+                        "stats": stats["stats_completo"]
+                    })
+            
+            docs[equipo] = {
+                "liga_id": liga_id,
+                "nombre": equipo,
+                "seasons": seasons,
+                "stats_por_temporada": stats_por_temporada,
+                "resumen": self._ponderar_temporadas(
+                    seasons, stats_por_temporada, Config.HISTORICO_TEMPORADAS
+                ),
+                "updated_at": ahora
+            }
+        
+        await self.db[Config.COLECCION_HISTORICO].bulk_write([
+            ReplaceOne({"liga_id": liga_id, "nombre": equipo}, doc, upsert=True)
+            for equipo, doc in docs.items()
+        ], ordered=False)
+        
+        logger.info(f"Históricos actualizados para {len(docs)} equipos de {liga_id}")
+        return docs
+    
+    async def obtener_h2h_lote(
+        self,
+        pares: List[Tuple[str, str]],
+        liga_id: str,
+        limite: int = 10
+    ) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        """
+        Versión por lotes de obtener_h2h.
+        
+        Lee las parejas del índice h2h_pares con una sola consulta; las que
+        aún no están indexadas se calculan y se guardan juntas.
+        
+        Parámetros:
+        -----------
+        pares : List[Tuple[str, str]]
+            Parejas (equipo1, equipo2); el resumen se orienta según ese orden
+        liga_id : str
+            ID de la liga
+        limite : int
+            Máximo de partidos a considerar por pareja
+        
+        Retorna:
+        --------
+        Dict[(equipo1, equipo2), dict]
+            Resumen H2H por pareja, igual que obtener_h2h
+        """
+        if not pares:
+            return {}
+        
+        claves = {clave_par(*par) for par in pares}
+        docs: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        cursor = self.db[Config.COLECCION_H2H].find(
+            {
+                "liga_id": liga_id,
+                "$or": [{"equipo_a": a, "equipo_b": b} for a, b in sorted(claves)]
+            },
+            {"_id": 0}
+        )
+        async for doc in cursor:
+            docs[(liga_id, doc["equipo_a"], doc["equipo_b"])] = doc
+        
+        faltantes = [clave for clave in claves if (liga_id, *clave) not in docs]
+        if faltantes:
+            docs.update(await self.actualizar_h2h(liga_id, faltantes))
+        
+        resultado = {}
+        for equipo1, equipo2 in pares:
+            partidos = partidos_h2h(docs[(liga_id, *clave_par(equipo1, equipo2))], limite)
+            if partidos is None:
+                partidos = await self._consultar_h2h(equipo1, equipo2, liga_id, limite, None)
+            resultado[(equipo1, equipo2)] = self._resumir_h2h(partidos, equipo1, equipo2)
+        return resultado
+    
+    async def obtener_h2h_jornada(
+        self,
+        season_id: str,
+        ronda: str,
+        limite: int = 10
+    ) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        """
+        H2H de todos los partidos de una jornada.
+        
+        Una consulta para los partidos de la jornada y otra para sus
+        parejas en h2h_pares (obtener_h2h_lote).
+        
+        Parámetros:
+        -----------
+        season_id : str
+            ID de la temporada
+        ronda : str
+            Ronda (ej: 'Regular Season - 12')
+        limite : int
+            Máximo de partidos a considerar por pareja
+        
+        Retorna:
+        --------
+        Dict[(local, visitante), dict]
+            Resumen H2H por partido, orientado local/visitante
+        """
+        partidos = await self.db.football_matches.find(
+            {"season_id": season_id, "ronda": ronda},
+            {"_id": 0, "liga_id": 1, "equipo_local": 1, "equipo_visitante": 1}
+        ).sort("fecha", 1).to_list(None)
+        
+        pares_por_liga: Dict[str, List[Tuple[str, str]]] = {}
+        for p in partidos:
+            pares_por_liga.setdefault(p["liga_id"], []).append(
+                (p["equipo_local"], p["equipo_visitante"])
+            )
+        
+        resultado = {}
+        for liga_id, pares in pares_por_liga.items():
+            resultado.update(await self.obtener_h2h_lote(pares, liga_id, limite))
+        return resultado
+    
+    async def actualizar_h2h(
+        self,
+        liga_id: str,
+        pares: List[Tuple[str, str]]
+    ) -> Dict[Tuple[str, str, str], Dict[str, Any]]:
+        """
+        Recalcula y guarda el índice h2h_pares de varias parejas.
+        
+        Lee los enfrentamientos de todas las parejas con una sola consulta.
+        Se llama al construir o actualizar una temporada (StatsBuilder) y
+        cuando una lectura no encuentra la pareja.
+        
+        Parámetros:
+        -----------
+        liga_id : str
+            ID de la liga
+        pares : List[Tuple[str, str]]
+            Parejas a recalcular (en cualquier orden)
+        
+        Retorna:
+        --------
+        Dict[(liga_id, equipo_a, equipo_b), dict]
+            Documento guardado por pareja
+        """
+        if not pares:
+            return {}
+        
+        cursor = self.db.football_matches.find(
+            consulta_enfrentamientos(liga_id, pares),
+            {"_id": 0, "liga_id": 1, **{campo: 1 for campo in CAMPOS_ENFRENTAMIENTO}}
+        ).sort("fecha", -1)
+        docs = documentos_h2h([p async for p in cursor], liga_id, pares)
+        
+        if docs:
+            await self.db[Config.COLECCION_H2H].bulk_write(reemplazos_h2h(docs), ordered=False)
+        
+        logger.info(f"Índice H2H actualizado para {len(docs)} parejas de {liga_id}")
+        return docs
+    
+    async def calcular_factores_historicos_lote(
+        self,
+        pares: List[Tuple[str, str]],
+        liga_id: str
+    ) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        """
+        Versión por lotes de calcular_factor_historico.
+        
+        Parámetros:
+        -----------
+        pares : List[Tuple[str, str]]
+            Parejas (equipo_local, equipo_visitante)
+        liga_id : str
+            ID de la liga
+        
+        Retorna:
+        --------
+        Dict[(local, visitante), dict]
+            Factores de ajuste por partido
+        """
+        equipos = list({e for par in pares for e in par})
+        historicos = await self.obtener_stats_historicas_lote(equipos, liga_id, 3)
+        h2hs = await self.obtener_h2h_lote(pares, liga_id, 10)
+        
+        return {
+            (local, visitante): self._combinar_factores(
+                historicos.get(local),
+                historicos.get(visitante),
+                h2hs[(local, visitante)]
+            )
+            for local, visitante in pares
+        }
@@ -0,0 +1,476 @@
+"""
+========================================
+MÓDULO: indices.py
+========================================
+
+Índices de MongoDB del sistema y autochequeo de planes de consulta.
+
+Define en un solo lugar los índices de cada colección, pensados para las
+consultas que el motor ejecuta en cada pronóstico (forma reciente, H2H,
+estadísticas por equipo, memo de pronósticos...). Los crean tanto el
+servidor al iniciar (Motor) como el scraper (DatabaseManager, pymongo).
+
+El autochequeo ejecuta explain() sobre una muestra de esas consultas y
+marca las que recorren la colección completa (COLLSCAN).
+
+Funciones:
+----------
+- asegurar_indices: Crea todos los índices (Motor, asíncrono)
+- asegurar_indices_sync: Crea todos los índices (pymongo)
+- crear_indices_coleccion_sync: Índices de una colección (p. ej. staging)
+- verificar_indices: explain() de las consultas críticas
+"""
+
+from typing import Dict, List, Any, Tuple
+import logging
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure, PyMongoError
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+# Código de MongoDB: ya existe un índice con las mismas claves y otro nombre
+CODIGO_INDICE_EXISTENTE = 85
+
+# Índices por colección: (nombre, claves, opciones).
+# Orden de las claves: igualdades primero, después el campo de orden
+# (fecha) y por último los rangos.
+INDICES: Dict[str, List[Tuple[str, List[Tuple[str, int]], Dict[str, Any]]]] = {
+    Config.COLECCION_PARTIDOS: [
+        # Identificadores
+        ("idx_match_id", [("match_id", ASCENDING)], {"unique": True, "sparse": True}),
+        ("idx_id_partido", [("id_partido", ASCENDING)], {"unique": True}),
+        # Clave del upsert del scraper (estable aunque el partido se reprograme)
+        ("idx_external_match_id", [("external_match_id", ASCENDING)], {"sparse": True}),
+        ("idx_season_id", [("season_id", ASCENDING)], {"sparse": True}),
+        
+        # Partidos de una temporada (construcción de estadísticas, backtesting)
+        ("idx_season_liga_fecha", [("season_id", ASCENDING), ("liga_id", ASCENDING), ("fecha", ASCENDING)], {}),
+        ("idx_liga_fecha", [("liga_id", ASCENDING), ("fecha", ASCENDING)], {}),
+        # Rama legacy ({season_id: {$exists: false}, season}) de los $or
+        ("idx_liga_season_fecha", [("liga_id", ASCENDING), ("season", ASCENDING), ("fecha", ASCENDING)], {}),
+        
+        # Jornada y temporada completa
+        ("idx_season_ronda_fecha", [("season_id", ASCENDING), ("ronda", ASCENDING), ("fecha", ASCENDING)], {}),
+        ("idx_season_fecha_ronda", [("season_id", ASCENDING), ("fecha", ASCENDING), ("ronda", ASCENDING)], {}),
+        
+        # Forma reciente: cada rama del $or local/visitante usa su índice
+        (
+            "idx_local_liga_estado_fecha",
+            [("equipo_local", ASCENDING), ("liga_id", ASCENDING), ("estado_del_partido", ASCENDING), ("fecha", ASCENDING)],
+            {}
+        ),
+        (
+            "idx_visitante_liga_estado_fecha",
+            [("equipo_visitante", ASCENDING), ("liga_id", ASCENDING), ("estado_del_partido", ASCENDING), ("fecha", ASCENDING)],
+            {}
+        ),
+        
+        # H2H: pares local/visitante (también el H2H por lotes con $in)
+        ("idx_h2h_fecha", [("equipo_local", ASCENDING), ("equipo_visitante", ASCENDING), ("fecha", ASCENDING)], {}),
+        
+        # Búsquedas por ID de equipo
+        ("idx_equipo_local", [("id_equipo_local", ASCENDING)], {}),
+        ("idx_equipo_visitante", [("id_equipo_visitante", ASCENDING)], {}),
+        
+        # Estado de sincronización (delta de fixtures)
+        ("idx_api_league_season", [("api_league_id", ASCENDING), ("season", ASCENDING)], {}),
+    ],
+    "seasons": [
+        ("idx_seasons_season_id", [("season_id", ASCENDING)], {"unique": True}),
+        ("idx_seasons_liga_year", [("liga_id", ASCENDING), ("year", DESCENDING)], {}),
+    ],
+    Config.COLECCION_ESTADISTICAS: [
+        # Un equipo en una temporada ({nombre, liga_id, season_id}) y su
+        # histórico ({nombre, season_id}); la rama legacy usa el prefijo nombre
+        ("idx_stats_equipo", [("nombre", ASCENDING), ("season_id", ASCENDING), ("liga_id", ASCENDING)], {}),
+        # Todos los equipos de una temporada
+        ("idx_stats_liga_season", [("liga_id", ASCENDING), ("season_id", ASCENDING)], {}),
+    ],
+    Config.COLECCION_SNAPSHOTS: [
+        ("idx_snapshots_liga_season_equipo", [("liga_id", ASCENDING), ("season_id", ASCENDING), ("nombre", ASCENDING)], {}),
+    ],
+    Config.COLECCION_WATERMARKS: [
+        ("idx_watermarks_liga_season", [("liga_id", ASCENDING), ("season_id", ASCENDING)], {"unique": True}),
+    ],
+    Config.COLECCION_PRONOSTICOS: [
+        ("idx_pronosticos_id", [("id", ASCENDING)], {}),
+        ("idx_pronosticos_season", [("season_id", ASCENDING)], {"sparse": True}),
+    ],
+    Config.COLECCION_MEMO: [
+        # Una entrada por clave: dos fallos simultáneos no la duplican
+        ("idx_memo_clave", [("clave_memo", ASCENDING)], {"unique": True}),
+        # Invalidación de toda la liga al reconstruir una temporada
+        ("idx_memo_liga", [("liga_id", ASCENDING)], {}),
+    ],
+    Config.COLECCION_VALIDACIONES: [
+        ("idx_validaciones_fecha", [("fecha_validacion", ASCENDING)], {}),
+    ],
+    Config.COLECCION_HISTORICO: [
+        # Histórico de un equipo, de varios ($in) y de toda la liga (prefijo)
+        ("idx_historico_liga_equipo", [("liga_id", ASCENDING), ("nombre", ASCENDING)], {"unique": True}),
+    ],
+    Config.COLECCION_H2H: [
+        # Una lectura por pareja (o un $or de parejas para una jornada)
+        ("idx_h2h_par", [("liga_id", ASCENDING), ("equipo_a", ASCENDING), ("equipo_b", ASCENDING)], {"unique": True}),
+        # Reconstrucción completa: limpieza de parejas obsoletas
+        ("idx_h2h_liga_updated", [("liga_id", ASCENDING), ("updated_at", ASCENDING)], {}),
+    ],
+    Config.COLECCION_CLASIFICACIONES: [
+        # Tabla actual (jornada más alta) y "tras la jornada N" ($lte)
+        (
+            "idx_clasificaciones_jornada",
+            [("liga_id", ASCENDING), ("season_id", ASCENDING), ("tipo_tiempo", ASCENDING), ("jornada", ASCENDING)],
+            {"unique": True}
+        ),
+    ],
+}
+
+
+def _registrar_error(coleccion: str, nombre: str, error: PyMongoError, errores: List[Dict[str, str]]) -> None:
+    """
+    Registra el fallo de un índice sin interrumpir el resto.
+    """
+    if isinstance(error, OperationFailure) and error.code == CODIGO_INDICE_EXISTENTE:
+        # Mismas claves con otro nombre (p. ej. creado a mano): ya sirve
+        logger.info(f"Índice {coleccion}.{nombre} ya existe con otro nombre")
+        return
+    
+    logger.warning(f"No se pudo crear el índice {coleccion}.{nombre}: {error}")
+    errores.append({"coleccion": coleccion, "indice": nombre, "error": str(error)})
+
+
+async def asegurar_indices(db) -> List[Dict[str, str]]:
+    """
+    Crea los índices de todas las colecciones (Motor).
+    
+    create_index es idempotente: los índices existentes no se recrean.
+    Un índice que falla (p. ej. por duplicados) no impide crear el resto.
+    
+    Parámetros:
+    -----------
+    db : AsyncIOMotorDatabase
+        Base de datos
+    
+    Retorna:
+    --------
+    List[dict]
+        Índices que no se pudieron crear, con el error
+    """
+    errores: List[Dict[str, str]] = []
+    for coleccion, indices in INDICES.items():
+        for nombre, claves, opciones in indices:
+            try:
+                await db[coleccion].create_index(claves, name=nombre, **opciones)
+            except PyMongoError as e:
+                _registrar_error(coleccion, nombre, e, errores)
+    
+    logger.info(f"Índices verificados ({len(errores)} errores)")
+    return errores
+
+
+def asegurar_indices_sync(db) -> List[Dict[str, str]]:
+    """
+    Crea los índices de todas las colecciones (pymongo).
+    
+    Equivalente síncrono de asegurar_indices, para el scraper.
+    
+    Parámetros:
+    -----------
+    db : pymongo.database.Database
+        Base de datos
+    
+    Retorna:
+    --------
+    List[dict]
+        Índices que no se pudieron crear, con el error
+    """
+    errores: List[Dict[str, str]] = []
+    for coleccion, indices in INDICES.items():
+        for nombre, claves, opciones in indices:
+            try:
+                db[coleccion].create_index(claves, name=nombre, **opciones)
+            except PyMongoError as e:
+                _registrar_error(coleccion, nombre, e, errores)
+    
+    logger.info(f"Índices verificados ({len(errores)} errores)")
+    return errores
+
+
+def crear_indices_coleccion_sync(collection, coleccion: str) -> None:
+    """
+    Crea en `collection` los índices definidos para `coleccion` (pymongo).
+    
+    Permite indexar colecciones con otro nombre, como las de staging de
+    la importación, antes de ponerlas en servicio.
+    
+    Parámetros:
+    -----------
+    collection : pymongo.collection.Collection
+        Colección donde crear los índices
+    coleccion : str
+        Colección cuya definición de índices se usa
+    
+    Raises:
+    -------
+    PyMongoError
+        Si falla la creación (p. ej. match_id duplicados)
+    """
+    for nombre, claves, opciones in INDICES.get(coleccion, []):
+        collection.create_index(claves, name=nombre, **opciones)
+
+
+# ============================================
+# AUTOCHEQUEO (explain)
+# ============================================
+
+def _consultas_criticas(partido: Dict[str, Any], stats: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Consultas de cada pronóstico, con valores reales de la base de datos.
+    
+    Reproducen la forma de las consultas de StatsBuilder,
+    HistoricoConsolidado, PredictionEngine y ValidationEngine.
+    """
+    liga_id = partido.get("liga_id", "")
+    season_id = partido.get("season_id", "")
+    temporada = partido.get("season", 2023)
+    local = partido.get("equipo_local", "")
+    visitante = partido.get("equipo_visitante", "")
+    fecha = partido.get("fecha", "")
+    terminado = "Match Finished"
+    
+    rama_temporada = [
+        {"season_id": season_id},
+        {"season_id": {"$exists": False}, "season": temporada}
+    ]
+    nombre = stats.get("nombre", local)
+    
+    return [
+        {
+            "nombre": "forma_reciente",
+            "coleccion": Config.COLECCION_PARTIDOS,
+            "filtro": {
+                "liga_id": liga_id,
+                "estado_del_partido": terminado,
+                "$and": [
+                    {"$or": [{"equipo_local": local}, {"equipo_visitante": local}]},
+                    {"$or": rama_temporada}
+                ],
+                "fecha": {"$lt": fecha}
+            },
+            "orden": [("fecha", -1)],
+            "limite": 5
+        },
+        {
+            "nombre": "forma_reciente_todos",
+            "coleccion": Config.COLECCION_PARTIDOS,
+            "filtro": {"liga_id": liga_id, "estado_del_partido": terminado, "$or": rama_temporada},
+            "orden": [("fecha", -1)]
+        },
+        {
+            "nombre": "h2h",
+            "coleccion": Config.COLECCION_PARTIDOS,
+            "filtro": {
+                "$or": [
+                    {"equipo_local": local, "equipo_visitante": visitante},
+                    {"equipo_local": visitante, "equipo_visitante": local}
+                ],
+                "estado_del_partido": terminado,
+                "liga_id": liga_id,
+                "fecha": {"$lt": fecha}
+            },
+            "orden": [("fecha", -1)],
+            "limite": 10
+        },
+        {
+            "nombre": "h2h_lote",
+            "coleccion": Config.COLECCION_PARTIDOS,
+            "filtro": {
+                "liga_id": liga_id,
+                "estado_del_partido": terminado,
+                "equipo_local": {"$in": [local, visitante]},
+                "equipo_visitante": {"$in": [local, visitante]}
+            }
+        },
+        {
+            "nombre": "partidos_temporada",
+            "coleccion": Config.COLECCION_PARTIDOS,
+            "filtro": {"liga_id": liga_id, "estado_del_partido": terminado, "$or": rama_temporada},
+            "orden": [("fecha", 1)]
+        },
+        {
+            "nombre": "jornada",
+            "coleccion": Config.COLECCION_PARTIDOS,
+            "filtro": {"season_id": season_id, "ronda": partido.get("ronda", "")},
+            "orden": [("fecha", 1)]
+        },
+        {
+            "nombre": "temporada_completa",
+            "coleccion": Config.COLECCION_PARTIDOS,
+            "filtro": {"season_id": season_id},
+            "orden": [("fecha", 1), ("ronda", 1)]
+        },
+        {
+            "nombre": "estadisticas_equipo",
+            "coleccion": Config.COLECCION_ESTADISTICAS,
+            "filtro": {
+                "nombre": nombre,
+                "liga_id": liga_id,
+                "$or": [
+                    {"season_id": season_id},
+                    {"season_id": {"$exists": False}, "temporada": temporada}
+                ]
+            }
+        },
+        {
+            "nombre": "estadisticas_temporada",
+            "coleccion": Config.COLECCION_ESTADISTICAS,
+            "filtro": {"liga_id": liga_id, "season_id": season_id}
+        },
+        {
+            "nombre": "historico_equipo",
+            "coleccion": Config.COLECCION_ESTADISTICAS,
+            "filtro": {"nombre": nombre, "season_id": season_id}
+        },
+        {
+            "nombre": "snapshots",
+            "coleccion": Config.COLECCION_SNAPSHOTS,
+            "filtro": {"liga_id": liga_id, "season_id": season_id, "nombre": {"$in": [local, visitante]}}
+        },
+        {
+            "nombre": "watermark",
+            "coleccion": Config.COLECCION_WATERMARKS,
+            "filtro": {"liga_id": liga_id, "season_id": season_id}
+        },
+        {
+            "nombre": "clasificacion_jornada",
+            "coleccion": Config.COLECCION_CLASIFICACIONES,
+            "filtro": {"liga_id": liga_id, "season_id": season_id, "tipo_tiempo": "completo", "jornada": {"$lte": 1}},
+            "orden": [("jornada", -1)],
+            "limite": 1
+        },
+        {
+            "nombre": "historico_equipos",
+            "coleccion": Config.COLECCION_HISTORICO,
+            "filtro": {"liga_id": liga_id, "nombre": {"$in": [local, visitante]}}
+        },
+        {
+            "nombre": "h2h_par",
+            "coleccion": Config.COLECCION_H2H,
+            "filtro": {
+                "liga_id": liga_id,
+                "equipo_a": min(local, visitante),
+                "equipo_b": max(local, visitante)
+            }
+        },
+        {
+            "nombre": "memo_pronosticos",
+            "coleccion": Config.COLECCION_MEMO,
+            "filtro": {"clave_memo": {"$in": [""]}}
+        },
+        {
+            "nombre": "pronostico_por_id",
+            "coleccion": Config.COLECCION_PRONOSTICOS,
+            "filtro": {"id": ""}
+        },
+        {
+            "nombre": "efectividad",
+            "coleccion": Config.COLECCION_VALIDACIONES,
+            "filtro": {"fecha_validacion": {"$gte": fecha}}
+        },
+    ]
+
+
+def _etapas(plan: Any) -> List[str]:
+    """
+    Etapas (stage) de un plan de explain(), recorriéndolo completo.
+    
+    Cubre inputStage/inputStages y el formato de motor SBE (queryPlan).
+    """
+    etapas: List[str] = []
+    if isinstance(plan, dict):
+        if isinstance(plan.get("stage"), str):
+            etapas.append(plan["stage"])
+        for valor in plan.values():
+            etapas.extend(_etapas(valor))
+    elif isinstance(plan, list):
+        for valor in plan:
+            etapas.extend(_etapas(valor))
+    return etapas
+
+
+def _indices_usados(plan: Any) -> List[str]:
+    """
+    Nombres de índice (indexName) que aparecen en un plan.
+    """
+    indices: List[str] = []
+    if isinstance(plan, dict):
+        if isinstance(plan.get("indexName"), str) and plan["indexName"] not in indices:
+            indices.append(plan["indexName"])
+        for valor in plan.values():
+            indices.extend(i for i in _indices_usados(valor) if i not in indices)
+    elif isinstance(plan, list):
+        for valor in plan:
+            indices.extend(i for i in _indices_usados(valor) if i not in indices)
+    return indices
+
+
+async def verificar_indices(db) -> Dict[str, Any]:
+    """
+    Ejecuta explain() sobre las consultas críticas y marca los COLLSCAN.
+    
+    Los valores de las consultas se toman de un partido terminado y de
+    unas estadísticas reales, para que el planificador vea datos
+    representativos.
+    
+    Parámetros:
+    -----------
+    db : AsyncIOMotorDatabase
+        Base de datos
+    
+    Retorna:
+    --------
+    dict
+        {'ok': bool, 'collscan': [nombres], 'consultas': [{nombre,
+        coleccion, etapas, indices, collscan}]}. `ok` es False si alguna
+        consulta crítica recorre la colección completa.
+    """
+    partido = await db[Config.COLECCION_PARTIDOS].find_one(
+        {"estado_del_partido": "Match Finished", "season_id": {"$exists": True}},
+        {"_id": 0}
+    ) or {}
+    stats = await db[Config.COLECCION_ESTADISTICAS].find_one(
+        {"liga_id": partido.get("liga_id"), "season_id": partido.get("season_id")},
+        {"_id": 0, "nombre": 1}
+    ) or {}
+    
+    resultados = []
+    for consulta in _consultas_criticas(partido, stats):
+        cursor = db[consulta["coleccion"]].find(consulta["filtro"])
+        if consulta.get("orden"):
+            cursor = cursor.sort(consulta["orden"])
+        if consulta.get("limite"):
+            cursor = cursor.limit(consulta["limite"])
+        
+        resultado = {"nombre": consulta["nombre"], "coleccion": consulta["coleccion"]}
+        try:
+            plan = (await cursor.explain()).get("queryPlanner", {}).get("winningPlan", {})
+        except (PyMongoError, NotImplementedError) as e:
+            resultado["error"] = str(e)
+            resultados.append(resultado)
+            continue
+        
+        etapas = _etapas(plan)
+        resultado["etapas"] = etapas
+        resultado["indices"] = _indices_usados(plan)
+        # EOF: la colección no existe todavía (no hay nada que recorrer)
+        resultado["collscan"] = "COLLSCAN" in etapas
+        resultados.append(resultado)
+    
+    collscan = [r["nombre"] for r in resultados if r.get("collscan")]
+    for nombre in collscan:
+        logger.warning(f"Consulta crítica sin índice (COLLSCAN): {nombre}")
+    
+    return {"ok": not collscan, "collscan": collscan, "consultas": resultados}
@@ -27,11 +27,15 @@ Historial de Cambios:
 - v1.0.0 (Dic 2024): Versión inicial con algoritmo base del Excel
 """
 
-from typing import Optional, Dict, Any, Tuple
+from typing import Optional, Dict, Any, List, Tuple, Union
+from collections import OrderedDict
 from datetime import datetime, timezone
 import logging
 import math
 
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
+
 from .models import (
     Equipo,
     EstadisticasEquipo,
@@ -48,9 +52,17 @@ from .config import (
     AmbosMarcamEnum
 )
 from .stats_builder import StatsBuilder
+from .calculo_vectorizado import (
+    calcular_tiempos_lote,
+    over_under_desde_probabilidades,
+    CODIGOS_RESULTADO
+)
 
 logger = logging.getLogger(__name__)
 
+# Código de MongoDB: clave duplicada en un índice único
+CODIGO_CLAVE_DUPLICADA = 11000
+
 
 class PredictionEngine:
     """
@@ -73,6 +85,9 @@ class PredictionEngine:
     generar_pronostico(equipo_local, equipo_visitante, liga_id)
         Genera pronóstico completo para un partido
     
+    generar_pronosticos_lote(partidos, liga_id, season_id)
+        Genera pronósticos para muchos partidos con consultas masivas
+    
     generar_pronostico_tiempo(stats_local, stats_visita, tipo_tiempo)
         Genera pronóstico para un tiempo específico
     
@@ -108,6 +123,11 @@ class PredictionEngine:
         self.umbrales = Umbrales()
         self.usar_historico = usar_historico
         
+        # Memo de pronósticos: clave_memo -> Pronostico
+        self._memo: "OrderedDict[str, Pronostico]" = OrderedDict()
+        self.memo_aciertos = 0
+        self.memo_fallos = 0
+        
         # Importar aquí para evitar circular imports
         from .historico_consolidado import HistoricoConsolidado
         self.historico = HistoricoConsolidado(db)
@@ -121,7 +141,11 @@ class PredictionEngine:
         liga_id: str,
         temporada: Optional[int] = None,
         season_id: Optional[str] = None,
-        partido_id: Optional[str] = None
+        partido_id: Optional[str] = None,
+        hasta_fecha: Optional[str] = None,
+        forma_local: Optional[Dict[str, Any]] = None,
+        forma_visitante: Optional[Dict[str, Any]] = None,
+        usar_memo: bool = True
     ) -> Pronostico:
         """
         Genera pronóstico completo para un partido.
@@ -147,6 +171,17 @@ class PredictionEngine:
             ID de temporada estructurado (preferido)
         partido_id : str, optional
             ID del partido (para tracking)
+        hasta_fecha : str, optional
+            Fecha 'YYYY-MM-DD'. Si se indica, solo se usan datos de
+            partidos anteriores a ella (backtesting sin datos futuros).
+        forma_local, forma_visitante : dict, optional
+            Forma reciente ya calculada (ej: con obtener_forma_reciente_todos
+            para toda una jornada). Si no se indica, se consulta.
+        usar_memo : bool
+            Si True (y hay season_id, sin hasta_fecha), devuelve el
+            pronóstico ya calculado con las mismas entradas: mismos
+            equipos, partido, temporada, versión del algoritmo y versiones
+            de las estadísticas. Ver _clave_memo.
         
         Retorna:
         --------
@@ -160,12 +195,28 @@ class PredictionEngine:
         """
         logger.info(f"Generando pronóstico: {equipo_local} vs {equipo_visitante}, season_id={season_id}")
         
+        # Pronóstico ya calculado con las mismas entradas
+        clave_memo = None
+        version_temporada = None
+        if usar_memo and season_id and not hasta_fecha:
+            versiones = await self._version_estadisticas(liga_id, season_id)
+            clave_memo = self._clave_memo(equipo_local, equipo_visitante, season_id, versiones, partido_id)
+            memo = await self._buscar_memo([clave_memo])
+            if clave_memo in memo:
+                logger.debug(f"Pronóstico servido desde memo: {clave_memo}")
+                return memo[clave_memo]
+            # El resultado se guarda con esta versión: la cache no debe servir
+            # equipos anteriores (reconstrucción hecha en otro proceso)
+            version_temporada = versiones[0]
+        
         # Obtener estadísticas de ambos equipos
         stats_local = await self.stats_builder.obtener_stats_equipo(
-            equipo_local, liga_id, temporada, season_id
+            equipo_local, liga_id, temporada, season_id, hasta_fecha=hasta_fecha,
+            version=version_temporada
         )
         stats_visitante = await self.stats_builder.obtener_stats_equipo(
-            equipo_visitante, liga_id, temporada, season_id
+            equipo_visitante, liga_id, temporada, season_id, hasta_fecha=hasta_fecha,
+            version=version_temporada
         )
         
         # Validar que existen estadísticas
@@ -175,25 +226,219 @@ class PredictionEngine:
             raise ValueError(f"No se encontraron estadísticas para {equipo_visitante}")
         
         # Obtener forma reciente de ambos equipos
-        forma_local = await self.stats_builder.obtener_forma_reciente(
-            equipo_local, liga_id, season_id, temporada
-        )
-        forma_visitante = await self.stats_builder.obtener_forma_reciente(
-            equipo_visitante, liga_id, season_id, temporada
-        )
+        if forma_local is None:
+            forma_local = await self.stats_builder.obtener_forma_reciente(
+                equipo_local, liga_id, season_id, temporada, hasta_fecha=hasta_fecha
+            )
+        if forma_visitante is None:
+            forma_visitante = await self.stats_builder.obtener_forma_reciente(
+                equipo_visitante, liga_id, season_id, temporada, hasta_fecha=hasta_fecha
+            )
         
         # Obtener factores históricos (H2H + múltiples temporadas)
         factores_historicos = None
         if self.usar_historico:
             try:
                 factores_historicos = await self.historico.calcular_factor_historico(
-                    equipo_local, equipo_visitante, liga_id, season_id
+                    equipo_local, equipo_visitante, liga_id, season_id,
+                    hasta_fecha=hasta_fecha,
+                    stats_actuales={
+                        equipo_local: stats_local.stats_completo.model_dump(),
+                        equipo_visitante: stats_visitante.stats_completo.model_dump()
+                    } if hasta_fecha else None
                 )
                 logger.debug(f"Factores históricos obtenidos: {factores_historicos.get('temporadas_analizadas', 0)} temporadas, H2H: {factores_historicos.get('h2h', {}).get('tiene_historial', False)}")
             except Exception as e:
                 logger.warning(f"Error obteniendo factores históricos: {e}")
                 factores_historicos = None
         
+        pronostico = self._construir_pronostico(
+            equipo_local=equipo_local,
+            equipo_visitante=equipo_visitante,
+            liga_id=liga_id,
+            season_id=season_id,
+            partido_id=partido_id,
+            stats_local=stats_local,
+            stats_visitante=stats_visitante,
+            forma_local=forma_local,
+            forma_visitante=forma_visitante,
+            factores_historicos=factores_historicos
+        )
+        
+        # Guardar en base de datos
+        await self._guardar_pronostico(pronostico, clave_memo)
+        if clave_memo:
+            self._recordar(clave_memo, pronostico)
+        
+        logger.info(f"Pronóstico generado: TC={pronostico.tiempo_completo.pronostico}, "
+                   f"1MT={pronostico.primer_tiempo.pronostico}, 2MT={pronostico.segundo_tiempo.pronostico}")
+        
+        return pronostico
+    
+    async def generar_pronosticos_lote(
+        self,
+        partidos: List[Dict[str, Any]],
+        liga_id: str,
+        season_id: Optional[str] = None,
+        temporada: Optional[int] = None,
+        formas: Optional[Dict[str, Dict[str, Any]]] = None
+    ) -> List[Union[Pronostico, Exception]]:
+        """
+        Genera pronósticos para muchos partidos de una misma temporada.
+        
+        Equivalente a llamar generar_pronostico por cada partido, pero
+        carga todas las entradas con unas pocas consultas masivas:
+        
+        1. Estadísticas de todos los equipos (1 consulta)
+        2. Forma reciente de todos los equipos (1 consulta)
+        3. Históricos y H2H de todas las parejas (3 consultas)
+        4. Cálculo vectorizado de los 3 tiempos (calculo_vectorizado)
+        5. Persistencia con una única escritura
+        
+        Los partidos con un pronóstico en memo (ver generar_pronostico)
+        no se recalculan.
+        
+        Parámetros:
+        -----------
+        partidos : List[dict]
+            Partidos de football_matches (equipo_local, equipo_visitante, match_id)
+        liga_id : str
+            ID de la liga
+        season_id : str, optional
+            ID de temporada estructurado (preferido)
+        temporada : int, optional
+            Año de la temporada (legacy)
+        formas : Dict[str, dict], optional
+            Forma reciente ya calculada por equipo (útil al procesar la
+            temporada en bloques). Si no se indica, se consulta.
+        
+        Retorna:
+        --------
+        List[Pronostico | Exception]
+            Lista alineada con `partidos`. Si un partido no pudo
+            pronosticarse, su posición contiene la excepción (igual que
+            asyncio.gather con return_exceptions=True).
+        """
+        logger.info(f"Generando pronósticos por lote: {len(partidos)} partidos, season_id={season_id}")
+        
+        if not partidos:
+            return []
+        
+        resultados: List[Union[Pronostico, Exception, None]] = [None] * len(partidos)
+        
+        # Pronósticos ya calculados con las mismas entradas
+        claves_memo: List[Optional[str]] = [None] * len(partidos)
+        if season_id:
+            versiones = await self._version_estadisticas(liga_id, season_id)
+            claves_memo = [
+                self._clave_memo(
+                    p["equipo_local"], p["equipo_visitante"], season_id, versiones, p.get("match_id")
+                )
+                for p in partidos
+            ]
+            memo = await self._buscar_memo(claves_memo)
+            for i, clave in enumerate(claves_memo):
+                if clave in memo:
+                    resultados[i] = memo[clave]
+        
+        pendientes = [i for i, r in enumerate(resultados) if r is None]
+        if not pendientes:
+            logger.info(f"Pronósticos por lote servidos desde memo: {len(resultados)}")
+            return resultados
+        
+        # Estadísticas de todos los equipos de la temporada
+        equipos = await self.stats_builder.obtener_todos_equipos(
+            liga_id, temporada, season_id=season_id
+        )
+        equipos_por_nombre = {e.nombre: e for e in equipos}
+        
+        # Forma reciente de todos los equipos
+        if formas is None:
+            formas = await self.stats_builder.obtener_forma_reciente_todos(
+                liga_id, season_id, temporada=temporada
+            )
+        
+        # Factores históricos (H2H + múltiples temporadas) de todas las parejas
+        pares = list(dict.fromkeys(
+            (partidos[i]["equipo_local"], partidos[i]["equipo_visitante"]) for i in pendientes
+        ))
+        factores_por_par: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        if self.usar_historico:
+            try:
+                factores_por_par = await self.historico.calcular_factores_historicos_lote(
+                    pares, liga_id
+                )
+            except Exception as e:
+                logger.warning(f"Error obteniendo factores históricos por lote: {e}")
+                factores_por_par = {}
+        
+        forma_vacia = self.stats_builder._resumir_forma([], "")
+        entradas: List[Dict[str, Any]] = []
+        
+        for i in pendientes:
+            partido = partidos[i]
+            equipo_local = partido["equipo_local"]
+            equipo_visitante = partido["equipo_visitante"]
+            stats_local = equipos_por_nombre.get(equipo_local)
+            stats_visitante = equipos_por_nombre.get(equipo_visitante)
+            
+            if not stats_local:
+                resultados[i] = ValueError(f"No se encontraron estadísticas para {equipo_local}")
+                continue
+            if not stats_visitante:
+                resultados[i] = ValueError(f"No se encontraron estadísticas para {equipo_visitante}")
+                continue
+            
+            entradas.append({
+                "indice": i,
+                "equipo_local": equipo_local,
+                "equipo_visitante": equipo_visitante,
+                "partido_id": partido.get("match_id"),
+                "stats_local": stats_local,
+                "stats_visitante": stats_visitante,
+                "forma_local": formas.get(equipo_local, forma_vacia),
+                "forma_visitante": formas.get(equipo_visitante, forma_vacia),
+                "factores_historicos": factores_por_par.get((equipo_local, equipo_visitante))
+            })
+        
+        for entrada, pronostico in zip(
+            entradas,
+            self._construir_pronosticos_vectorizado(entradas, liga_id, season_id)
+        ):
+            resultados[entrada["indice"]] = pronostico
+        
+        # Guardar en base de datos (solo los recién calculados)
+        nuevos = [i for i in pendientes if isinstance(resultados[i], Pronostico)]
+        await self._guardar_pronosticos_lote(
+            [resultados[i] for i in nuevos],
+            [claves_memo[i] for i in nuevos]
+        )
+        for i in nuevos:
+            if claves_memo[i]:
+                self._recordar(claves_memo[i], resultados[i])
+        
+        logger.info(f"Pronósticos por lote generados: {len(resultados)}")
+        return resultados
+    
+    def _construir_pronostico(
+        self,
+        equipo_local: str,
+        equipo_visitante: str,
+        liga_id: str,
+        season_id: Optional[str],
+        partido_id: Optional[str],
+        stats_local: Equipo,
+        stats_visitante: Equipo,
+        forma_local: Dict[str, Any],
+        forma_visitante: Dict[str, Any],
+        factores_historicos: Optional[Dict[str, Any]]
+    ) -> Pronostico:
+        """
+        Construye el Pronostico completo a partir de entradas ya cargadas.
+        
+        No accede a la base de datos; lo usan tanto generar_pronostico
+        como generar_pronosticos_lote.
+        """
         # Generar pronóstico para cada tiempo
         pronostico_tc = self._generar_pronostico_tiempo(
             stats_local.stats_completo,
@@ -225,7 +470,7 @@ class PredictionEngine:
         # Crear pronóstico completo
         h2h_info = factores_historicos.get("h2h") if factores_historicos else None
         
-        pronostico = Pronostico(
+        return Pronostico(
             partido_id=partido_id,
             equipo_local=equipo_local,
             equipo_visitante=equipo_visitante,
@@ -242,14 +487,92 @@ class PredictionEngine:
             temporadas_analizadas=factores_historicos.get("temporadas_analizadas", 1) if factores_historicos else 1,
             version_algoritmo=Config.VERSION
         )
+    
+    def _construir_pronosticos_vectorizado(
+        self,
+        entradas: List[Dict[str, Any]],
+        liga_id: str,
+        season_id: Optional[str]
+    ) -> List[Union[Pronostico, Exception]]:
+        """
+        Versión por lotes de _construir_pronostico.
         
-        # Guardar en base de datos
-        await self._guardar_pronostico(pronostico)
+        Calcula los 3 tiempos de todos los partidos con el núcleo
+        vectorizado y arma los objetos Pronostico. El resultado es
+        idéntico al de llamar _construir_pronostico por cada entrada.
+        
+        Parámetros:
+        -----------
+        entradas : List[dict]
+            Argumentos de _construir_pronostico por partido
+        liga_id : str
+            ID de la liga
+        season_id : str, optional
+            ID de temporada estructurado
         
-        logger.info(f"Pronóstico generado: TC={pronostico_tc.pronostico}, "
-                   f"1MT={pronostico_1mt.pronostico}, 2MT={pronostico_2mt.pronostico}")
+        Retorna:
+        --------
+        List[Pronostico | Exception]
+            Alineada con `entradas`
+        """
+        if not entradas:
+            return []
+        
+        tiempos = calcular_tiempos_lote(
+            [e["stats_local"] for e in entradas],
+            [e["stats_visitante"] for e in entradas],
+            [e["forma_local"] for e in entradas],
+            [e["forma_visitante"] for e in entradas],
+            [e["factores_historicos"] for e in entradas]
+        )
         
-        return pronostico
+        def pronostico_tiempo(tipo: TipoTiempo, i: int) -> PronosticoTiempo:
+            fila = tiempos[tipo]
+            return PronosticoTiempo(
+                pronostico=CODIGOS_RESULTADO[int(fila["pronostico"][i])],
+                doble_oportunidad=str(fila["doble_oportunidad"][i]),
+                ambos_marcan=str(fila["ambos_marcan"][i]),
+                probabilidades=Probabilidades(
+                    porcentaje_local=float(fila["porcentaje_local"][i]),
+                    porcentaje_empate=float(fila["porcentaje_empate"][i]),
+                    porcentaje_visita=float(fila["porcentaje_visita"][i])
+                ),
+                confianza=float(fila["confianza"][i]),
+                factor_local=self._factor_en_escala(float(fila["factor_local"][i])),
+                factor_visita=self._factor_en_escala(float(fila["factor_visita"][i])),
+                over_under=over_under_desde_probabilidades(fila, i),
+                goles_esperados={
+                    "local": float(fila["goles_local"][i]),
+                    "visitante": float(fila["goles_visitante"][i]),
+                    "total": float(fila["goles_total"][i])
+                }
+            )
+        
+        resultados: List[Union[Pronostico, Exception]] = []
+        for i, entrada in enumerate(entradas):
+            try:
+                factores_historicos = entrada["factores_historicos"]
+                resultados.append(Pronostico(
+                    partido_id=entrada["partido_id"],
+                    equipo_local=entrada["equipo_local"],
+                    equipo_visitante=entrada["equipo_visitante"],
+                    liga_id=liga_id,
+                    season_id=season_id,
+                    tiempo_completo=pronostico_tiempo(TipoTiempo.COMPLETO, i),
+                    primer_tiempo=pronostico_tiempo(TipoTiempo.PRIMER_TIEMPO, i),
+                    segundo_tiempo=pronostico_tiempo(TipoTiempo.SEGUNDO_TIEMPO, i),
+                    forma_reciente={
+                        "local": entrada["forma_local"],
+                        "visitante": entrada["forma_visitante"]
+                    },
+                    h2h=factores_historicos.get("h2h") if factores_historicos else None,
+                    temporadas_analizadas=factores_historicos.get("temporadas_analizadas", 1) if factores_historicos else 1,
+                    version_algoritmo=Config.VERSION
+                ))
+            except Exception as e:
+                resultados.append(e)
+        
+        return resultados
     
     def _generar_pronostico_tiempo(
         self,
@@ -349,8 +672,8 @@ class PredictionEngine:
             ambos_marcan=ambos_marcan,
             probabilidades=probabilidades,
             confianza=confianza,
-            factor_local=factor_local,
-            factor_visita=factor_visita,
+            factor_local=self._factor_en_escala(factor_local),
+            factor_visita=self._factor_en_escala(factor_visita),
             over_under=over_under,
             goles_esperados=goles_esperados
         )
@@ -484,6 +807,13 @@ class PredictionEngine:
         else:
             return 1
     
+    def _factor_en_escala(self, factor: float) -> int:
+        """
+        Factor ajustado por histórico (fraccionario) en la escala 1-5
+        que reporta PronosticoTiempo.
+        """
+        return min(5, max(1, round(factor)))
+    
     def _aplicar_algoritmo_decision(
         self,
         probabilidades: Probabilidades,
@@ -1005,7 +1335,11 @@ class PredictionEngine:
         # Limitar a rango 0-100
         return round(max(0, min(100, confianza)), 2)
     
-    async def _guardar_pronostico(self, pronostico: Pronostico) -> None:
+    async def _guardar_pronostico(
+        self,
+        pronostico: Pronostico,
+        clave_memo: Optional[str] = None
+    ) -> None:
         """
         Guarda el pronóstico en la base de datos.
         
@@ -1013,13 +1347,164 @@ class PredictionEngine:
         -----------
         pronostico : Pronostico
             Pronóstico a guardar
+        clave_memo : str, optional
+            Si se indica, también se guarda en el memo con esa clave
+            (ver _guardar_memo)
         """
-        collection = self.db[Config.COLECCION_PRONOSTICOS]
+        await self._guardar_pronosticos_lote([pronostico], [clave_memo])
+        logger.debug(f"Pronóstico guardado: {pronostico.id}")
+    
+    async def _guardar_pronosticos_lote(
+        self,
+        pronosticos: List[Pronostico],
+        claves_memo: Optional[List[Optional[str]]] = None
+    ) -> None:
+        """
+        Guarda varios pronósticos con una única escritura.
+        
+        Parámetros:
+        -----------
+        pronosticos : List[Pronostico]
+            Pronósticos a guardar
+        claves_memo : List[str | None], optional
+            Clave de memo de cada pronóstico; los que la tienen también
+            se guardan en el memo (ver _guardar_memo)
+        """
+        if not pronosticos:
+            return
         
-        # Convertir a dict
-        pronostico_dict = pronostico.model_dump()
+        claves_memo = claves_memo or [None] * len(pronosticos)
+        docs = [pronostico.model_dump() for pronostico in pronosticos]
         
-        # Insertar
-        await collection.insert_one(pronostico_dict)
+        # Antes de insertar: insert_many añade _id a los documentos
+        await self._guardar_memo([
+            (clave, dict(doc)) for doc, clave in zip(docs, claves_memo) if clave
+        ])
+        await self.db[Config.COLECCION_PRONOSTICOS].insert_many(docs, ordered=False)
         
-        logger.debug(f"Pronóstico guardado: {pronostico.id}")
+        logger.debug(f"Pronósticos guardados por lote: {len(pronosticos)}")
+    
+    async def _guardar_memo(self, entradas: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """
+        Guarda pronósticos en el memo (colección pronosticos_memo).
+        
+        Upsert por clave_memo (índice único). Si dos peticiones calculan
+        a la vez el mismo pronóstico, la segunda choca con la clave que
+        acaba de escribir la primera (E11000); se ignora, porque ambas
+        tienen las mismas entradas.
+        """
+        if not entradas:
+            return
+        
+        try:
+            await self.db[Config.COLECCION_MEMO].bulk_write([
+                ReplaceOne({"clave_memo": clave}, {**doc, "clave_memo": clave}, upsert=True)
+                for clave, doc in entradas
+            ], ordered=False)
+        except BulkWriteError as e:
+            errores = e.details.get("writeErrors", [])
+            if any(error.get("code") != CODIGO_CLAVE_DUPLICADA for error in errores):
+                raise
+            logger.debug(f"Memo ya guardado por otra petición: {len(errores)} claves")
+    
+    # ============================================
+    # MEMO DE PRONÓSTICOS
+    # ============================================
+    
+    async def _version_estadisticas(self, liga_id: str, season_id: str) -> Tuple[int, int]:
+        """
+        Versiones de las estadísticas: (temporada, liga).
+        
+        StatsBuilder incrementa la versión de la marca de agua cada vez
+        que reconstruye o actualiza una temporada. La de la liga es la
+        suma de las de todas sus temporadas: cambia con cualquier
+        reconstrucción, también de temporadas anteriores, que alteran los
+        históricos (historico_equipos, h2h_pares).
+        """
+        version_temporada = 0
+        version_liga = 0
+        cursor = self.db[Config.COLECCION_WATERMARKS].find(
+            {"liga_id": liga_id},
+            {"_id": 0, "season_id": 1, "version": 1}
+        )
+        async for doc in cursor:
+            version_liga += doc.get("version", 0)
+            if doc.get("season_id") == season_id:
+                version_temporada = doc.get("version", 0)
+        return version_temporada, version_liga
+    
+    def _clave_memo(
+        self,
+        equipo_local: str,
+        equipo_visitante: str,
+        season_id: str,
+        versiones: Tuple[int, int],
+        partido_id: Optional[str] = None
+    ) -> str:
+        """
+        Clave de memo: equipos, partido, temporada, versión del algoritmo y
+        versiones de las estadísticas.
+        
+        El pronóstico guardado incluye partido_id, así que cada partido
+        (o la ausencia de partido) tiene su propia entrada. Sin histórico
+        la versión de la liga no influye.
+        """
+        version_temporada, version_liga = versiones
+        historico = f"H{version_liga}" if self.usar_historico else "-"
+        return (
+            f"{equipo_local}|{equipo_visitante}|{partido_id or ''}|{season_id}|"
+            f"{Config.VERSION}|{version_temporada}|{historico}"
+        )
+    
+    async def _buscar_memo(self, claves: List[str]) -> Dict[str, Pronostico]:
+        """
+        Busca pronósticos en el memo (memoria y luego MongoDB).
+        
+        Retorna:
+        --------
+        Dict[str, Pronostico]
+            Solo las claves encontradas
+        """
+        encontrados: Dict[str, Pronostico] = {}
+        faltantes = []
+        
+        for clave in dict.fromkeys(claves):
+            if clave in self._memo:
+                self._memo.move_to_end(clave)
+                encontrados[clave] = self._memo[clave]
+            else:
+                faltantes.append(clave)
+        
+        if faltantes:
+            cursor = self.db[Config.COLECCION_MEMO].find(
+                {"clave_memo": {"$in": faltantes}}, {"_id": 0}
+            )
+            async for doc in cursor:
+                clave = doc.pop("clave_memo")
+                pronostico = Pronostico(**doc)
+                encontrados[clave] = pronostico
+                self._recordar(clave, pronostico)
+        
+        self.memo_aciertos += sum(1 for c in claves if c in encontrados)
+        self.memo_fallos += sum(1 for c in claves if c not in encontrados)
+        return encontrados
+    
+    def _recordar(self, clave: str, pronostico: Pronostico) -> None:
+        """Guarda un pronóstico en el memo en memoria (LRU acotado)."""
+        self._memo[clave] = pronostico
+        self._memo.move_to_end(clave)
+        while len(self._memo) > Config.MEMO_PRONOSTICOS_MAX_ENTRADAS:
+            self._memo.popitem(last=False)
+    
+    def estadisticas_memo(self) -> Dict[str, Any]:
+        """
+        Retorna contadores de uso del memo de pronósticos.
+        """
+        consultas = self.memo_aciertos + self.memo_fallos
+        return {
+            "entradas": len(self._memo),
+            "max_entradas": Config.MEMO_PRONOSTICOS_MAX_ENTRADAS,
+            "aciertos": self.memo_aciertos,
+            "fallos": self.memo_fallos,
+            "tasa_aciertos": round(self.memo_aciertos / consultas * 100, 2) if consultas else 0.0
+        }
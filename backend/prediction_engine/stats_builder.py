@@ -14,6 +14,13 @@ Actualización v1.1.0:
 - Soporte para season_id estructurado
 - Fallback de compatibilidad para datos legacy
 
+Actualización v1.2.0:
+- Snapshots acumulados por partido (series prefix-sum por equipo)
+- Consulta de estadísticas a una fecha (hasta_fecha) sin datos futuros
+- Actualización incremental con marca de agua por temporada
+- Forma reciente de todos los equipos con una sola consulta
+- Cache compartida por temporada (cache_estadisticas.py)
+
 Flujo de Datos:
 --------------
 Partidos (MongoDB) → StatsBuilder → Estadísticas por Equipo (MongoDB)
@@ -26,18 +33,63 @@ Historial de Cambios:
 --------------------
 - v1.0.0 (Dic 2024): Versión inicial
 - v1.1.0 (Dic 2024): Soporte para season_id
+- v1.2.0: Snapshots por fecha para backtesting sin fuga de datos
+- v1.3.0: actualizar_estadisticas (modo incremental)
+- v1.4.0: obtener_forma_reciente_todos
+- v1.5.0: Lecturas a través de la cache compartida de equipos
+- v1.6.0: Clasificaciones materializadas por jornada (colección clasificaciones)
+- v1.7.0: Refresco del histórico precalculado de los equipos (historico_equipos)
+- v1.8.0: Refresco del índice H2H por pareja (h2h_pares)
+- v1.8.1: Rematerialización incremental de clasificaciones desde la tabla guardada
+- v1.8.2: Área de trabajo de equipos local a cada construcción (construcciones concurrentes)
+- v1.8.3: Versión de la marca de agua en las entradas de la cache compartida
+- v1.8.4: snapshots_cache acotada (LRU + TTL)
 """
 
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timezone
+from bisect import bisect_left
+from collections import OrderedDict
+import time
 import logging
 
+from pymongo import UpdateOne, ReplaceOne, ReturnDocument
+
 from .models import Equipo, EstadisticasEquipo
 from .config import Config, TipoTiempo, ResultadoEnum
+from .cache_estadisticas import obtener_cache_equipos
+from .tablas_clasificacion import numero_jornada, fila_clasificacion, cargar_fila, ordenar_filas
+from .historico_consolidado import HistoricoConsolidado
+from .h2h_pares import clave_par
 
 logger = logging.getLogger(__name__)
 
 
+# Contadores acumulables de EstadisticasEquipo (los derivados se recalculan)
+CAMPOS_ACUMULADOS = (
+    'partidos_jugados', 'victorias', 'empates', 'derrotas',
+    'goles_favor', 'goles_contra', 'diferencia_goles', 'puntos',
+    'pj_local', 'v_local', 'e_local', 'd_local',
+    'gf_local', 'gc_local', 'pts_local',
+    'pj_visita', 'v_visita', 'e_visita', 'd_visita',
+    'gf_visita', 'gc_visita', 'pts_visita',
+)
+
+# Atributo de Equipo -> clave de la serie en el documento de snapshots
+TIEMPOS_SNAPSHOT = {
+    'stats_completo': 'completo',
+    'stats_primer_tiempo': 'primer_tiempo',
+    'stats_segundo_tiempo': 'segundo_tiempo',
+}
+
+
+# Campos de un partido que necesita la materialización de clasificaciones
+CAMPOS_PARTIDO_CLASIFICACION = (
+    'equipo_local', 'equipo_visitante', 'fecha', 'ronda',
+    'goles_local_TR', 'goles_visitante_TR', 'goles_local_1MT', 'goles_visitante_1MT',
+)
+
+
 def generate_season_id(liga_id: str, temporada: int) -> str:
     """Genera un season_id a partir de liga_id y temporada."""
     next_year = (temporada + 1) % 100
@@ -55,16 +107,25 @@ class StatsBuilder:
     ----------
     db : AsyncIOMotorDatabase
         Conexión a la base de datos MongoDB
-    equipos_cache : Dict[str, Equipo]
-        Cache de equipos procesados
+    cache : CacheEstadisticas
+        Cache LRU/TTL de lecturas, compartida por todos los motores
+    snapshots_cache : OrderedDict[str, (float, Dict[str, dict])]
+        Series de snapshots por temporada (clave: "{liga_id}|{season_id}"),
+        LRU + TTL: caducan para ver las reconstrucciones de otros procesos
     
     Métodos Públicos:
     ----------------
     construir_estadisticas(liga_id, temporada, season_id)
         Construye estadísticas para todos los equipos de una liga
     
-    obtener_stats_equipo(nombre, liga_id, temporada, season_id)
-        Obtiene estadísticas de un equipo específico
+    actualizar_estadisticas(liga_id, temporada, season_id)
+        Aplica solo los partidos terminados aún no procesados
+    
+    obtener_stats_equipo(nombre, liga_id, temporada, season_id, hasta_fecha)
+        Obtiene estadísticas de un equipo específico (opcionalmente a una fecha)
+    
+    obtener_forma_reciente_todos(liga_id, season_id, n_partidos, hasta_fecha)
+        Forma reciente (últimos N) de todos los equipos de la temporada
     
     Ejemplo de Uso:
     ---------------
@@ -95,7 +156,9 @@ class StatsBuilder:
             Conexión a MongoDB (motor async)
         """
         self.db = db
-        self.equipos_cache: Dict[str, Equipo] = {}
+        self.cache = obtener_cache_equipos(db)
+        self.snapshots_cache: "OrderedDict[str, Tuple[float, Dict[str, Dict[str, Any]]]]" = OrderedDict()
+        self.historico = HistoricoConsolidado(db)
         logger.info("StatsBuilder inicializado")
     
     async def construir_estadisticas(
@@ -112,6 +175,10 @@ class StatsBuilder:
         2. Procesa cada partido cronológicamente
         3. Acumula estadísticas por equipo
         4. Guarda en la colección team_statistics
+        5. Guarda la serie acumulada por fecha en team_statistics_snapshots
+        6. Materializa la clasificación tras cada jornada (clasificaciones)
+        7. Refresca el histórico multi-temporada de los equipos (historico_equipos)
+        8. Refresca el índice H2H de las parejas de la temporada (h2h_pares)
         
         Parámetros:
         -----------
@@ -159,25 +226,13 @@ class StatsBuilder:
         
         logger.info(f"Construyendo estadísticas para {liga_id}, season_id={effective_season_id}, temporada={temporada}")
         
-        # Limpiar cache
-        self.equipos_cache = {}
-        
-        # Construir query con fallback para compatibilidad
-        query = {"liga_id": liga_id, "estado_del_partido": "Match Finished"}
+        # Área de trabajo local: cada construcción acumula sobre sus propios
+        # equipos, así dos ligas pueden construirse a la vez con el mismo builder
+        equipos: Dict[str, Equipo] = {}
         
-        if effective_season_id:
-            # Query que busca por season_id O por season (datos legacy)
-            query["$or"] = [
-                {"season_id": effective_season_id},
-                # Fallback para datos sin season_id
-                {
-                    "season_id": {"$exists": False},
-                    "season": effective_temporada
-                }
-            ]
-        elif temporada:
-            # Solo temporada (legacy puro)
-            query["season"] = temporada
+        query = self._query_partidos_temporada(
+            liga_id, temporada, effective_temporada, effective_season_id
+        )
         
         partidos = await self.db[Config.COLECCION_PARTIDOS].find(
             query
@@ -189,38 +244,340 @@ class StatsBuilder:
         
         logger.info(f"Procesando {len(partidos)} partidos")
         
-        # Procesar cada partido
+        # Procesar cada partido y registrar el acumulado tras cada fecha
+        series: Dict[str, Dict[str, Any]] = {}
         for partido in partidos:
-            await self._procesar_partido(
+            self._procesar_partido(
                 partido, 
                 liga_id, 
                 effective_temporada,
-                effective_season_id
+                effective_season_id,
+                equipos
             )
+            for nombre in (partido['equipo_local'], partido['equipo_visitante']):
+                self._registrar_snapshot(
+                    series, equipos[f"{liga_id}_{nombre}"], partido.get('fecha', '')
+                )
         
         # Calcular campos derivados para cada equipo
-        for equipo in self.equipos_cache.values():
+        for equipo in equipos.values():
             equipo.stats_completo.calcular_derivados()
             equipo.stats_primer_tiempo.calcular_derivados()
             equipo.stats_segundo_tiempo.calcular_derivados()
             equipo.updated_at = datetime.now(timezone.utc)
         
         # Guardar en base de datos
-        await self._guardar_estadisticas(liga_id, effective_temporada, effective_season_id)
+        await self._guardar_estadisticas(
+            liga_id, effective_temporada, effective_season_id, list(equipos.values())
+        )
+        await self._guardar_snapshots(series, liga_id, effective_temporada, effective_season_id)
+        await self._materializar_clasificaciones(partidos, liga_id, effective_temporada, effective_season_id)
+        await self.historico.actualizar_historicos(
+            liga_id, [equipo.nombre for equipo in equipos.values()]
+        )
+        await self.historico.actualizar_h2h(
+            liga_id, list({clave_par(p['equipo_local'], p['equipo_visitante']) for p in partidos})
+        )
+        version = await self._guardar_watermark(liga_id, effective_season_id, partidos, reiniciar=True)
+        self._refrescar_cache(liga_id, effective_season_id, equipos.values(), version)
         
-        logger.info(f"Estadísticas construidas para {len(self.equipos_cache)} equipos")
-        return self.equipos_cache
+        logger.info(f"Estadísticas construidas para {len(equipos)} equipos")
+        return equipos
     
-    async def _procesar_partido(
+    async def actualizar_estadisticas(
+        self,
+        liga_id: str,
+        temporada: Optional[int] = None,
+        season_id: Optional[str] = None
+    ) -> Dict[str, Equipo]:
+        """
+        Actualiza las estadísticas aplicando solo los partidos nuevos.
+        
+        Usa la marca de agua de la temporada (match_ids ya procesados y
+        última fecha) para leer únicamente los partidos terminados que
+        faltan, y solo reescribe los equipos que jugaron esos partidos.
+        
+        Si no hay marca de agua, o algún partido nuevo es anterior a la
+        última fecha procesada (ej: partido aplazado), o no tiene match_id,
+        hace una reconstrucción completa con construir_estadisticas.
+        
+        Parámetros:
+        -----------
+        liga_id : str
+            Identificador de la liga
+        temporada : int, optional
+            Año de la temporada (legacy)
+        season_id : str, optional
+            ID de temporada estructurado (preferido)
+        
+        Retorna:
+        --------
+        Dict[str, Equipo]
+            Equipos actualizados (vacío si no había partidos nuevos)
+        """
+        effective_season_id = season_id
+        effective_temporada = temporada or 2023
+        
+        if not effective_season_id and temporada:
+            effective_season_id = generate_season_id(liga_id, temporada)
+        
+        watermark = await self.db[Config.COLECCION_WATERMARKS].find_one(
+            {"liga_id": liga_id, "season_id": effective_season_id}
+        )
+        if not watermark:
+            logger.info(f"Sin marca de agua para {effective_season_id}, reconstrucción completa")
+            return await self.construir_estadisticas(liga_id, temporada, effective_season_id)
+        
+        query = self._query_partidos_temporada(
+            liga_id, temporada, effective_temporada, effective_season_id
+        )
+        query["match_id"] = {"$nin": watermark.get("procesados", [])}
+        
+        nuevos = await self.db[Config.COLECCION_PARTIDOS].find(
+            query
+        ).sort("fecha", 1).to_list(None)
+        
+        if not nuevos:
+            logger.info(f"Sin partidos nuevos para {effective_season_id}")
+            return {}
+        
+        ultima_fecha = watermark.get("ultima_fecha") or ""
+        if any(not p.get("match_id") or p.get("fecha", "") < ultima_fecha for p in nuevos):
+            logger.info(f"Partidos fuera de orden en {effective_season_id}, reconstrucción completa")
+            return await self.construir_estadisticas(liga_id, temporada, effective_season_id)
+        
+        logger.info(f"Aplicando {len(nuevos)} partidos nuevos a {effective_season_id}")
+        
+        # Cargar estado actual de los equipos afectados
+        nombres = sorted(
+            {p["equipo_local"] for p in nuevos} | {p["equipo_visitante"] for p in nuevos}
+        )
+        equipos = await self._cargar_equipos(
+            nombres, liga_id, effective_temporada, effective_season_id
+        )
+        series = await self._cargar_series(nombres, liga_id, effective_season_id)
+        
+        for partido in nuevos:
+            self._procesar_partido(
+                partido,
+                liga_id,
+                effective_temporada,
+                effective_season_id,
+                equipos
+            )
+            for nombre in (partido['equipo_local'], partido['equipo_visitante']):
+                self._registrar_snapshot(
+                    series, equipos[f"{liga_id}_{nombre}"], partido.get('fecha', '')
+                )
+        
+        for equipo in equipos.values():
+            equipo.stats_completo.calcular_derivados()
+            equipo.stats_primer_tiempo.calcular_derivados()
+            equipo.stats_segundo_tiempo.calcular_derivados()
+            equipo.updated_at = datetime.now(timezone.utc)
+        
+        await self._guardar_estadisticas(
+            liga_id, effective_temporada, effective_season_id, list(equipos.values())
+        )
+        await self._guardar_snapshots(
+            series, liga_id, effective_temporada, effective_season_id, completo=False
+        )
+        
+        await self._actualizar_clasificaciones(
+            nuevos, liga_id, temporada, effective_temporada, effective_season_id
+        )
+        await self.historico.actualizar_historicos(
+            liga_id, [equipo.nombre for equipo in equipos.values()]
+        )
+        await self.historico.actualizar_h2h(
+            liga_id, list({clave_par(p['equipo_local'], p['equipo_visitante']) for p in nuevos})
+        )
+        version = await self._guardar_watermark(liga_id, effective_season_id, nuevos)
+        self._refrescar_cache(liga_id, effective_season_id, equipos.values(), version)
+        
+        logger.info(f"Estadísticas actualizadas para {len(equipos)} equipos")
+        return equipos
+    
+    def _refrescar_cache(
+        self,
+        liga_id: str,
+        season_id: Optional[str],
+        equipos,
+        version: Optional[int] = None
+    ) -> None:
+        """
+        Invalida la temporada en la cache compartida y guarda los equipos recién escritos.
+        
+        `version` es la de la marca de agua recién guardada.
+        """
+        self.cache.invalidar_temporada(liga_id, season_id)
+        for equipo in equipos:
+            self.cache.guardar(equipo, season_id, version)
+    
+    def _query_partidos_temporada(
+        self,
+        liga_id: str,
+        temporada: Optional[int],
+        effective_temporada: int,
+        effective_season_id: Optional[str]
+    ) -> Dict[str, Any]:
+        """
+        Query de partidos terminados de una temporada, con fallback legacy.
+        """
+        query = {"liga_id": liga_id, "estado_del_partido": "Match Finished"}
+        
+        if effective_season_id:
+            # Query que busca por season_id O por season (datos legacy)
+            query["$or"] = [
+                {"season_id": effective_season_id},
+                # Fallback para datos sin season_id
+                {
+                    "season_id": {"$exists": False},
+                    "season": effective_temporada
+                }
+            ]
+        elif temporada:
+            # Solo temporada (legacy puro)
+            query["season"] = temporada
+        
+        return query
+    
+    async def _cargar_equipos(
+        self,
+        nombres: List[str],
+        liga_id: str,
+        temporada: int,
+        season_id: Optional[str]
+    ) -> Dict[str, Equipo]:
+        """
+        Carga desde la base de datos el estado guardado de varios equipos.
+        
+        Retorna el área de trabajo (clave "{liga_id}_{nombre}") sobre la que
+        _procesar_partido acumula los partidos nuevos. Los que aún no existen
+        se crean vacíos.
+        """
+        query = {"liga_id": liga_id, "nombre": {"$in": nombres}}
+        if season_id:
+            query["season_id"] = season_id
+        else:
+            query["temporada"] = temporada
+        
+        docs = {}
+        async for doc in self.db[Config.COLECCION_ESTADISTICAS].find(query):
+            doc.pop('_id', None)
+            docs[doc["nombre"]] = doc
+        
+        equipos = {}
+        for nombre in nombres:
+            clave = f"{liga_id}_{nombre}"
+            if nombre in docs:
+                equipo = Equipo(**docs[nombre])
+            else:
+                equipo = Equipo(
+                    nombre=nombre,
+                    liga_id=liga_id,
+                    temporada=temporada,
+                    season_id=season_id
+                )
+            equipos[clave] = equipo
+        
+        return equipos
+    
+    async def _cargar_series(
+        self,
+        nombres: List[str],
+        liga_id: str,
+        season_id: Optional[str]
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Carga las series de snapshots de varios equipos (sin metadatos).
+        """
+        series = {}
+        cursor = self.db[Config.COLECCION_SNAPSHOTS].find(
+            {"liga_id": liga_id, "season_id": season_id, "nombre": {"$in": nombres}},
+            {"_id": 0, "fechas": 1, "nombre": 1, **{t: 1 for t in TIEMPOS_SNAPSHOT.values()}}
+        )
+        async for doc in cursor:
+            series[doc.pop("nombre")] = doc
+        return series
+    
+    async def _guardar_watermark(
+        self,
+        liga_id: str,
+        season_id: Optional[str],
+        partidos: List[Dict[str, Any]],
+        reiniciar: bool = False
+    ) -> int:
+        """
+        Registra los partidos procesados en la marca de agua de la temporada.
+        
+        Parámetros:
+        -----------
+        liga_id : str
+            ID de la liga
+        season_id : str, optional
+            ID de temporada estructurado
+        partidos : List[dict]
+            Partidos recién procesados
+        reiniciar : bool
+            True tras una reconstrucción completa (reemplaza la lista)
+        
+        Cada llamada incrementa "version", que PredictionEngine usa en la
+        clave de memo de pronósticos.
+        
+        Retorna:
+        --------
+        int
+            La nueva versión de la marca de agua
+        """
+        match_ids = [p["match_id"] for p in partidos if p.get("match_id")]
+        ultima_fecha = max((p.get("fecha", "") for p in partidos), default="")
+        ahora = datetime.now(timezone.utc)
+        
+        if reiniciar:
+            update = {
+                "$set": {
+                    "procesados": match_ids,
+                    "ultima_fecha": ultima_fecha,
+                    "updated_at": ahora
+                },
+                "$inc": {"version": 1}
+            }
+        else:
+            update = {
+                "$addToSet": {"procesados": {"$each": match_ids}},
+                "$max": {"ultima_fecha": ultima_fecha},
+                "$set": {"updated_at": ahora},
+                "$inc": {"version": 1}
+            }
+        
+        watermark = await self.db[Config.COLECCION_WATERMARKS].find_one_and_update(
+            {"liga_id": liga_id, "season_id": season_id},
+            update,
+            projection={"_id": 0, "version": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        
+        # Las entradas del memo con la versión anterior ya no se sirven
+        # (tampoco las de otras temporadas de la liga, cuyo histórico
+        # cambia); los pronósticos siguen en predictions como historial
+        await self.db[Config.COLECCION_MEMO].delete_many({"liga_id": liga_id})
+        return watermark["version"]
+    
+    def _procesar_partido(
         self,
         partido: Dict[str, Any],
         liga_id: str,
         temporada: int,
-        season_id: Optional[str] = None
+        season_id: Optional[str],
+        equipos: Dict[str, Equipo]
     ) -> None:
         """
         Procesa un partido y actualiza las estadísticas de ambos equipos.
         
+        Solo trabaja en memoria (lo usa también el backtesting walk-forward).
+        
         Parámetros:
         -----------
         partido : dict
@@ -231,6 +588,8 @@ class StatsBuilder:
             Año de la temporada
         season_id : str, optional
             ID de temporada estructurado
+        equipos : Dict[str, Equipo]
+            Área de trabajo de la construcción sobre la que acumular
         
         Lógica:
         -------
@@ -244,10 +603,10 @@ class StatsBuilder:
         
         # Obtener o crear equipos
         equipo_local = self._obtener_o_crear_equipo(
-            equipo_local_nombre, liga_id, temporada, season_id
+            equipo_local_nombre, liga_id, temporada, season_id, equipos
         )
         equipo_visitante = self._obtener_o_crear_equipo(
-            equipo_visitante_nombre, liga_id, temporada, season_id
+            equipo_visitante_nombre, liga_id, temporada, season_id, equipos
         )
         
         # Extraer goles
@@ -293,10 +652,11 @@ class StatsBuilder:
         nombre: str,
         liga_id: str,
         temporada: int,
-        season_id: Optional[str] = None
+        season_id: Optional[str],
+        equipos: Dict[str, Equipo]
     ) -> Equipo:
         """
-        Obtiene un equipo del cache o lo crea si no existe.
+        Obtiene un equipo del área de trabajo o lo crea si no existe.
         
         Parámetros:
         -----------
@@ -308,6 +668,8 @@ class StatsBuilder:
             Año de la temporada
         season_id : str, optional
             ID de temporada estructurado
+        equipos : Dict[str, Equipo]
+            Área de trabajo de la construcción
         
         Retorna:
         --------
@@ -316,15 +678,15 @@ class StatsBuilder:
         """
         clave = f"{liga_id}_{nombre}"
         
-        if clave not in self.equipos_cache:
-            self.equipos_cache[clave] = Equipo(
+        if clave not in equipos:
+            equipos[clave] = Equipo(
                 nombre=nombre,
                 liga_id=liga_id,
                 temporada=temporada,
                 season_id=season_id
             )
         
-        return self.equipos_cache[clave]
+        return equipos[clave]
     
     def _actualizar_stats(
         self,
@@ -430,12 +792,15 @@ class StatsBuilder:
         self,
         liga_id: str,
         temporada: int,
-        season_id: Optional[str] = None
-    ) -> None:
+        season_id: Optional[str],
+        equipos: List[Equipo]
+    ) -> Dict[str, int]:
         """
         Guarda las estadísticas en MongoDB.
         
-        Usa upsert para crear o actualizar según corresponda.
+        Usa upsert para crear o actualizar según corresponda, enviando
+        todas las operaciones en bulk_write desordenados (un round-trip
+        por bloque de Config.TAMANO_LOTE_ESCRITURA equipos).
         
         Parámetros:
         -----------
@@ -445,10 +810,18 @@ class StatsBuilder:
             Año de la temporada
         season_id : str, optional
             ID de temporada estructurado
+        equipos : List[Equipo]
+            Equipos a guardar
+        
+        Retorna:
+        --------
+        Dict[str, int]
+            Conteos {"upserted", "modified", "matched"}
         """
         collection = self.db[Config.COLECCION_ESTADISTICAS]
         
-        for clave, equipo in self.equipos_cache.items():
+        operaciones = []
+        for equipo in equipos:
             # Convertir a dict para MongoDB
             equipo_dict = equipo.model_dump()
             
@@ -465,25 +838,405 @@ class StatsBuilder:
                 upsert_query["temporada"] = temporada
             
             # Upsert: actualizar si existe, crear si no
-            await collection.update_one(
+            operaciones.append(UpdateOne(
                 upsert_query,
                 {"$set": equipo_dict},
                 upsert=True
+            ))
+        
+        conteos = await self._escribir_en_bloques(collection, operaciones)
+        
+        logger.info(f"Guardadas estadísticas de {len(equipos)} equipos: {conteos}")
+        return conteos
+    
+    async def _escribir_en_bloques(
+        self,
+        collection,
+        operaciones: List[UpdateOne]
+    ) -> Dict[str, int]:
+        """
+        Ejecuta operaciones en bulk_write desordenados por bloques.
+        
+        Parámetros:
+        -----------
+        collection : AsyncIOMotorCollection
+            Colección destino
+        operaciones : List[UpdateOne]
+            Operaciones a ejecutar
+        
+        Retorna:
+        --------
+        Dict[str, int]
+            Conteos acumulados {"upserted", "modified", "matched"}
+        """
+        conteos = {"upserted": 0, "modified": 0, "matched": 0}
+        tamano = Config.TAMANO_LOTE_ESCRITURA
+        
+        for inicio in range(0, len(operaciones), tamano):
+            resultado = await collection.bulk_write(
+                operaciones[inicio:inicio + tamano],
+                ordered=False
             )
+            conteos["upserted"] += resultado.upserted_count
+            conteos["modified"] += resultado.modified_count
+            conteos["matched"] += resultado.matched_count
+        
+        return conteos
+    
+    def _registrar_snapshot(
+        self,
+        series: Dict[str, Dict[str, Any]],
+        equipo: Equipo,
+        fecha: str
+    ) -> None:
+        """
+        Añade a la serie del equipo el acumulado tras su último partido.
+        
+        La serie es un prefix-sum: la posición i contiene los contadores
+        acumulados después de los i+1 primeros partidos del equipo.
+        """
+        serie = series.get(equipo.nombre)
+        if serie is None:
+            serie = series[equipo.nombre] = {
+                "fechas": [],
+                **{
+                    tiempo: {campo: [] for campo in CAMPOS_ACUMULADOS}
+                    for tiempo in TIEMPOS_SNAPSHOT.values()
+                }
+            }
         
-        logger.info(f"Guardadas estadísticas de {len(self.equipos_cache)} equipos")
+        serie["fechas"].append(fecha)
+        for atributo, tiempo in TIEMPOS_SNAPSHOT.items():
+            stats = getattr(equipo, atributo)
+            for campo in CAMPOS_ACUMULADOS:
+                serie[tiempo][campo].append(getattr(stats, campo))
+    
+    async def _guardar_snapshots(
+        self,
+        series: Dict[str, Dict[str, Any]],
+        liga_id: str,
+        temporada: int,
+        season_id: Optional[str] = None,
+        completo: bool = True
+    ) -> None:
+        """
+        Guarda las series de snapshots (un documento por equipo y temporada).
+        
+        Parámetros:
+        -----------
+        series : dict
+            Series generadas con _registrar_snapshot, por nombre de equipo
+        liga_id : str
+            ID de la liga
+        temporada : int
+            Año de la temporada
+        season_id : str, optional
+            ID de temporada estructurado
+        completo : bool
+            True si `series` cubre todos los equipos de la temporada
+        """
+        collection = self.db[Config.COLECCION_SNAPSHOTS]
+        ahora = datetime.now(timezone.utc)
+        
+        await self._escribir_en_bloques(collection, [
+            UpdateOne(
+                {"nombre": nombre, "liga_id": liga_id, "season_id": season_id},
+                {"$set": {
+                    "nombre": nombre,
+                    "liga_id": liga_id,
+                    "season_id": season_id,
+                    "temporada": temporada,
+                    **serie,
+                    "updated_at": ahora
+                }},
+                upsert=True
+            )
+            for nombre, serie in series.items()
+        ])
+        
+        clave = f"{liga_id}|{season_id}"
+        if completo:
+            self._guardar_series_cache(clave, series)
+        else:
+            en_cache = self._series_en_cache(clave)
+            if en_cache is not None:
+                en_cache.update(series)
+        logger.info(f"Guardados snapshots de {len(series)} equipos")
+    
+    async def _actualizar_clasificaciones(
+        self,
+        nuevos: List[Dict[str, Any]],
+        liga_id: str,
+        temporada: Optional[int],
+        effective_temporada: int,
+        season_id: Optional[str]
+    ) -> int:
+        """
+        Rematerializa solo las clasificaciones que cambian con `nuevos`.
+        
+        Las tablas anteriores a la primera jornada de los partidos nuevos
+        no cambian: se parte de la última tabla guardada antes de esa
+        jornada y se reproducen solo los partidos de esa jornada y las
+        siguientes (más las rondas sin número, que van al final). Si falta
+        la tabla de partida se rematerializa la temporada completa.
+        
+        Retorna:
+        --------
+        int
+            Número de jornadas materializadas
+        """
+        query = self._query_partidos_temporada(liga_id, temporada, effective_temporada, season_id)
+        rondas = await self.db[Config.COLECCION_PARTIDOS].distinct("ronda", query)
+        numeradas = [n for n in map(numero_jornada, rondas) if n is not None]
+        desde = min(
+            (n for n in (numero_jornada(p.get('ronda')) for p in nuevos) if n is not None),
+            default=max(numeradas, default=0) + 1
+        )
+        
+        base = []
+        if any(n < desde for n in numeradas):
+            base = await self.db[Config.COLECCION_CLASIFICACIONES].find(
+                {"liga_id": liga_id, "season_id": season_id, "jornada": {"$lt": desde}},
+                {"_id": 0, "tipo_tiempo": 1, "jornada": 1, "filas": 1}
+            ).sort("jornada", -1).limit(len(TipoTiempo)).to_list(None)
+            if len(base) < len(TipoTiempo) or len({doc["jornada"] for doc in base}) > 1:
+                logger.info(f"Sin tabla de partida para {season_id}, se rematerializa completa")
+                base = []
+            else:
+                # None: partidos sin ronda (van al final, como las rondas sin número)
+                query["ronda"] = {"$in": [
+                    r for r in rondas
+                    if numero_jornada(r) is None or numero_jornada(r) >= desde
+                ] + [None]}
+        
+        partidos = await self.db[Config.COLECCION_PARTIDOS].find(
+            query, {"_id": 0, **{campo: 1 for campo in CAMPOS_PARTIDO_CLASIFICACION}}
+        ).sort("fecha", 1).to_list(None)
+        return await self._materializar_clasificaciones(
+            partidos, liga_id, effective_temporada, season_id, base=base,
+            jornada_maxima=max(numeradas, default=0)
+        )
+    
+    async def _materializar_clasificaciones(
+        self,
+        partidos: List[Dict[str, Any]],
+        liga_id: str,
+        temporada: int,
+        season_id: Optional[str],
+        base: Optional[List[Dict[str, Any]]] = None,
+        jornada_maxima: Optional[int] = None
+    ) -> int:
+        """
+        Guarda la clasificación tras cada jornada, para cada tipo de tiempo.
+        
+        Agrupa los partidos por jornada (número final de la ronda; las
+        rondas sin número van después, en orden de aparición), los acumula
+        jornada a jornada y escribe un documento por jornada y tipo de
+        tiempo en la colección clasificaciones. Las jornadas que ya no
+        existen se eliminan.
+        
+        Parámetros:
+        -----------
+        partidos : List[dict]
+            Partidos terminados ordenados por fecha: los de la temporada, o
+            con `base` los de las jornadas posteriores a ella
+        liga_id : str
+            ID de la liga
+        temporada : int
+            Año de la temporada
+        season_id : str, optional
+            ID de temporada estructurado
+        base : List[dict], optional
+            Tablas guardadas (una por tipo de tiempo) de la jornada desde
+            la que se continúa. Sin `base` se parte de cero.
+        jornada_maxima : int, optional
+            Mayor jornada numerada de toda la temporada; las rondas sin
+            número se numeran a partir de ella. Por defecto, la mayor de
+            `partidos` (válido solo si son todos los de la temporada).
+        
+        Retorna:
+        --------
+        int
+            Número de jornadas materializadas
+        """
+        numeros = [numero_jornada(p.get('ronda')) for p in partidos]
+        if jornada_maxima is None:
+            jornada_maxima = max((n for n in numeros if n is not None), default=0)
+        siguiente = jornada_maxima
+        sin_numero: Dict[str, int] = {}
+        
+        por_jornada: Dict[int, List[Dict[str, Any]]] = {}
+        rondas: Dict[int, str] = {}
+        for partido, numero in zip(partidos, numeros):
+            if numero is None:
+                ronda = partido.get('ronda') or ''
+                if ronda not in sin_numero:
+                    siguiente += 1
+                    sin_numero[ronda] = siguiente
+                numero = sin_numero[ronda]
+            por_jornada.setdefault(numero, []).append(partido)
+            rondas.setdefault(numero, partido.get('ronda') or '')
+        
+        # Todos los equipos aparecen desde la primera jornada (con 0 puntos)
+        equipos: Dict[str, Equipo] = {}
+        for doc in base or []:
+            tipo = TipoTiempo(doc['tipo_tiempo'])
+            for fila in doc['filas']:
+                equipo = self._obtener_o_crear_equipo(fila['equipo'], liga_id, temporada, season_id, equipos)
+                cargar_fila(equipo.obtener_stats(tipo), fila)
+        for nombre in sorted({p['equipo_local'] for p in partidos} | {p['equipo_visitante'] for p in partidos}):
+            self._obtener_o_crear_equipo(nombre, liga_id, temporada, season_id, equipos)
+        
+        collection = self.db[Config.COLECCION_CLASIFICACIONES]
+        ahora = datetime.now(timezone.utc)
+        operaciones = []
+        
+        for jornada in sorted(por_jornada):
+            for partido in por_jornada[jornada]:
+                self._procesar_partido(partido, liga_id, temporada, season_id, equipos)
+            
+            hasta_fecha = max(p.get('fecha', '') for p in por_jornada[jornada])
+            for tipo in TipoTiempo:
+                filas = []
+                for equipo in equipos.values():
+                    stats = equipo.obtener_stats(tipo)
+                    stats.calcular_derivados()
+                    filas.append(fila_clasificacion(equipo.nombre, stats))
+                
+                clave = {
+                    "liga_id": liga_id,
+                    "season_id": season_id,
+                    "tipo_tiempo": tipo.value,
+                    "jornada": jornada
+                }
+                operaciones.append(ReplaceOne(
+                    clave,
+                    {
+                        **clave,
+                        "temporada": temporada,
+                        "ronda": rondas[jornada],
+                        "hasta_fecha": hasta_fecha,
+                        "filas": ordenar_filas(filas),
+                        "updated_at": ahora
+                    },
+                    upsert=True
+                ))
+        
+        await self._escribir_en_bloques(collection, operaciones)
+        await collection.delete_many({
+            "liga_id": liga_id,
+            "season_id": season_id,
+            "jornada": {"$gt": max([jornada_maxima, *por_jornada])}
+        })
+        
+        logger.info(f"Materializadas clasificaciones de {len(por_jornada)} jornadas")
+        return len(por_jornada)
+    
+    async def _obtener_series_temporada(
+        self,
+        liga_id: str,
+        season_id: Optional[str]
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Obtiene las series de snapshots de toda una temporada.
+        
+        Se cargan con una sola consulta y quedan en memoria, de modo que
+        las consultas posteriores (ej: backtesting) no tocan la base de datos.
+        """
+        clave = f"{liga_id}|{season_id}"
+        series = self._series_en_cache(clave)
+        if series is None:
+            series = {}
+            cursor = self.db[Config.COLECCION_SNAPSHOTS].find(
+                {"liga_id": liga_id, "season_id": season_id},
+                {"_id": 0}
+            )
+            async for doc in cursor:
+                series[doc["nombre"]] = doc
+            self._guardar_series_cache(clave, series)
+        
+        return series
+    
+    def _series_en_cache(self, clave: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        Series de una temporada en snapshots_cache (None si no están o caducaron).
+        """
+        entrada = self.snapshots_cache.get(clave)
+        if entrada is None or time.monotonic() - entrada[0] > Config.CACHE_SNAPSHOTS_TTL_SEGUNDOS:
+            self.snapshots_cache.pop(clave, None)
+            return None
+        self.snapshots_cache.move_to_end(clave)
+        return entrada[1]
+    
+    def _guardar_series_cache(self, clave: str, series: Dict[str, Dict[str, Any]]) -> None:
+        """
+        Guarda las series de una temporada, expulsando las menos usadas.
+        """
+        self.snapshots_cache[clave] = (time.monotonic(), series)
+        self.snapshots_cache.move_to_end(clave)
+        while len(self.snapshots_cache) > Config.CACHE_SNAPSHOTS_MAX_TEMPORADAS:
+            self.snapshots_cache.popitem(last=False)
+    
+    async def _obtener_stats_hasta_fecha(
+        self,
+        nombre: str,
+        liga_id: str,
+        temporada: Optional[int],
+        season_id: Optional[str],
+        hasta_fecha: str
+    ) -> Optional[Equipo]:
+        """
+        Reconstruye las estadísticas de un equipo antes de una fecha.
+        
+        Solo cuenta partidos con fecha estrictamente anterior a
+        `hasta_fecha`. Búsqueda binaria sobre la serie: O(log n).
+        """
+        series = await self._obtener_series_temporada(liga_id, season_id)
+        serie = series.get(nombre)
+        
+        if not serie:
+            logger.warning(
+                f"Sin snapshots para {nombre} ({season_id}); "
+                f"reconstruir estadísticas de la temporada"
+            )
+            return None
+        
+        # Número de partidos jugados antes de hasta_fecha
+        n = bisect_left(serie["fechas"], hasta_fecha)
+        
+        equipo = Equipo(
+            nombre=nombre,
+            liga_id=liga_id,
+            temporada=serie.get("temporada") or temporada or 2023,
+            season_id=season_id
+        )
+        
+        if n > 0:
+            for atributo, tiempo in TIEMPOS_SNAPSHOT.items():
+                stats = EstadisticasEquipo(**{
+                    campo: serie[tiempo][campo][n - 1] for campo in CAMPOS_ACUMULADOS
+                })
+                stats.calcular_derivados()
+                setattr(equipo, atributo, stats)
+        
+        return equipo
     
     async def obtener_stats_equipo(
         self,
         nombre: str,
         liga_id: str,
         temporada: Optional[int] = None,
-        season_id: Optional[str] = None
+        season_id: Optional[str] = None,
+        hasta_fecha: Optional[str] = None,
+        version: Optional[int] = None
     ) -> Optional[Equipo]:
         """
         Obtiene las estadísticas de un equipo específico.
         
-        Primero busca en cache, luego en base de datos.
+        Primero busca en la cache compartida (por temporada), luego en
+        base de datos.
+        Con `hasta_fecha`, devuelve el acumulado de los partidos jugados
+        antes de esa fecha (sin datos futuros), leído de los snapshots.
         
         Parámetros:
         -----------
@@ -495,6 +1248,12 @@ class StatsBuilder:
             Año de la temporada (legacy)
         season_id : str, optional
             ID de temporada estructurado (preferido)
+        hasta_fecha : str, optional
+            Fecha 'YYYY-MM-DD'. Solo cuenta partidos anteriores a ella.
+        version : int, optional
+            Versión de la marca de agua de la temporada. Si se indica, la
+            cache solo sirve equipos leídos o escritos con esa versión (una
+            reconstrucción en otro proceso no invalida esta cache).
         
         Retorna:
         --------
@@ -517,18 +1276,31 @@ class StatsBuilder:
             'SPAIN_LA_LIGA', 
             temporada=2023
         )
+        
+        # Estadísticas a una fecha (backtesting)
+        stats = await builder.obtener_stats_equipo(
+            'Barcelona',
+            'SPAIN_LA_LIGA',
+            season_id='SPAIN_LA_LIGA_2023-24',
+            hasta_fecha='2024-01-15'
+        )
         ```
         """
-        # Buscar en cache primero
-        clave = f"{liga_id}_{nombre}"
-        if clave in self.equipos_cache:
-            return self.equipos_cache[clave]
-        
         # Determinar season_id efectivo
         effective_season_id = season_id
         if not effective_season_id and temporada:
             effective_season_id = generate_season_id(liga_id, temporada)
         
+        if hasta_fecha:
+            return await self._obtener_stats_hasta_fecha(
+                nombre, liga_id, temporada, effective_season_id, hasta_fecha
+            )
+        
+        # Buscar en cache primero
+        equipo = self.cache.obtener(liga_id, effective_season_id, nombre, version)
+        if equipo:
+            return equipo
+        
         # Construir query con fallback para compatibilidad
         query = {
             "nombre": nombre,
@@ -553,7 +1325,7 @@ class StatsBuilder:
             # Remover _id para evitar problemas con Pydantic
             doc.pop('_id', None)
             equipo = Equipo(**doc)
-            self.equipos_cache[clave] = equipo
+            self.cache.guardar(equipo, effective_season_id, version)
             return equipo
         
         return None
@@ -605,7 +1377,9 @@ class StatsBuilder:
         
         async for doc in cursor:
             doc.pop('_id', None)
-            equipos.append(Equipo(**doc))
+            equipo = Equipo(**doc)
+            self.cache.guardar(equipo, effective_season_id)
+            equipos.append(equipo)
         
         return equipos
 
@@ -616,7 +1390,8 @@ class StatsBuilder:
         liga_id: str,
         season_id: Optional[str] = None,
         temporada: Optional[int] = None,
-        n_partidos: int = 5
+        n_partidos: int = 5,
+        hasta_fecha: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Obtiene la forma reciente de un equipo (últimos N partidos).
@@ -633,6 +1408,8 @@ class StatsBuilder:
             Año de temporada (legacy)
         n_partidos : int
             Número de partidos a considerar (default: 5)
+        hasta_fecha : str, optional
+            Fecha 'YYYY-MM-DD'. Solo considera partidos anteriores a ella.
         
         Retorna:
         --------
@@ -667,11 +1444,100 @@ class StatsBuilder:
                 ]}
             ]
         
+        if hasta_fecha:
+            query["fecha"] = {"$lt": hasta_fecha}
+        
         # Obtener últimos N partidos ordenados por fecha descendente
         partidos = await self.db[Config.COLECCION_PARTIDOS].find(
             query
-        ).sort("fecha_partido", -1).limit(n_partidos).to_list(n_partidos)
+        ).sort("fecha", -1).limit(n_partidos).to_list(n_partidos)
         
+        return self._resumir_forma(partidos, nombre_equipo)
+    
+    async def obtener_forma_reciente_todos(
+        self,
+        liga_id: str,
+        season_id: Optional[str] = None,
+        n_partidos: int = 5,
+        hasta_fecha: Optional[str] = None,
+        temporada: Optional[int] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Obtiene la forma reciente de todos los equipos de una temporada.
+        
+        Equivale a llamar obtener_forma_reciente por cada equipo, pero con
+        una sola consulta: recorre los partidos terminados del más reciente
+        al más antiguo y asigna a cada equipo sus primeros N.
+        
+        Parámetros:
+        -----------
+        liga_id : str
+            ID de la liga
+        season_id : str, optional
+            ID de temporada estructurado
+        n_partidos : int
+            Número de partidos a considerar (default: 5)
+        hasta_fecha : str, optional
+            Fecha 'YYYY-MM-DD'. Solo considera partidos anteriores a ella.
+        temporada : int, optional
+            Año de temporada (legacy)
+        
+        Retorna:
+        --------
+        Dict[str, dict]
+            Forma reciente por nombre de equipo (mismo formato que
+            obtener_forma_reciente). Solo incluye equipos con partidos.
+        """
+        effective_season_id = season_id
+        if not effective_season_id and temporada:
+            effective_season_id = generate_season_id(liga_id, temporada)
+        
+        query: Dict[str, Any] = {
+            "liga_id": liga_id,
+            "estado_del_partido": "Match Finished"
+        }
+        if effective_season_id:
+            query["$or"] = [
+                {"season_id": effective_season_id},
+                {"season_id": {"$exists": False}, "season": temporada or 2023}
+            ]
+        if hasta_fecha:
+            query["fecha"] = {"$lt": hasta_fecha}
+        
+        cursor = self.db[Config.COLECCION_PARTIDOS].find(
+            query,
+            {
+                "_id": 0,
+                "equipo_local": 1,
+                "equipo_visitante": 1,
+                "goles_local_TR": 1,
+                "goles_visitante_TR": 1
+            }
+        ).sort("fecha", -1)
+        
+        partidos_por_equipo: Dict[str, List[Dict[str, Any]]] = {}
+        async for partido in cursor:
+            for nombre in (partido["equipo_local"], partido["equipo_visitante"]):
+                lista = partidos_por_equipo.setdefault(nombre, [])
+                if len(lista) < n_partidos:
+                    lista.append(partido)
+        
+        return {
+            nombre: self._resumir_forma(lista, nombre)
+            for nombre, lista in partidos_por_equipo.items()
+        }
+    
+    def _resumir_forma(
+        self,
+        partidos: List[Dict[str, Any]],
+        nombre_equipo: str
+    ) -> Dict[str, Any]:
+        """
+        Resume una lista de partidos (más reciente primero) en la forma del equipo.
+        
+        Compartido por obtener_forma_reciente y obtener_forma_reciente_todos,
+        de modo que ambas producen exactamente el mismo resultado.
+        """
         if not partidos:
             return {
                 "ultimos_5": [],
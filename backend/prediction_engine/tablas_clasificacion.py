@@ -0,0 +1,179 @@
+"""
+========================================
+MÓDULO: tablas_clasificacion.py
+========================================
+
+Filas de clasificación ligeras (diccionarios) y utilidades compartidas
+por StatsBuilder, que materializa las tablas por jornada en la colección
+`clasificaciones`, y ClassificationEngine, que las lee.
+
+Cada documento de `clasificaciones` es la tabla de una liga/temporada
+para un tipo de tiempo después de una jornada:
+
+    {liga_id, season_id, temporada, tipo_tiempo, jornada, ronda,
+     hasta_fecha, filas: [fila, ...], updated_at}
+
+La tabla "tras la jornada N" acumula los partidos terminados de las
+jornadas 1..N (un partido aplazado cuenta en su jornada, no en la fecha
+en que se jugó).
+
+Funciones:
+----------
+- numero_jornada: Número de jornada a partir de la ronda
+- fila_clasificacion: Fila (dict) a partir de EstadisticasEquipo
+- cargar_fila: Contadores de EstadisticasEquipo a partir de una fila
+- ordenar_filas: Ordena y asigna posiciones
+- fila_a_dict: Fila en el formato de la API (local/visitante anidados)
+"""
+
+from typing import Dict, List, Optional, Any
+import re
+
+from .models import EstadisticasEquipo
+
+# "Regular Season - 12" -> 12
+PATRON_JORNADA = re.compile(r'(\d+)\s*$')
+
+# Clave de la fila -> contador de EstadisticasEquipo
+CAMPOS_FILA = {
+    'pj': 'partidos_jugados',
+    'v': 'victorias',
+    'e': 'empates',
+    'd': 'derrotas',
+    'gf': 'goles_favor',
+    'gc': 'goles_contra',
+    'dif': 'diferencia_goles',
+    'pts': 'puntos',
+    'pj_l': 'pj_local',
+    'v_l': 'v_local',
+    'e_l': 'e_local',
+    'd_l': 'd_local',
+    'gf_l': 'gf_local',
+    'gc_l': 'gc_local',
+    'pts_l': 'pts_local',
+    'pj_v': 'pj_visita',
+    'v_v': 'v_visita',
+    'e_v': 'e_visita',
+    'd_v': 'd_visita',
+    'gf_v': 'gf_visita',
+    'gc_v': 'gc_visita',
+    'pts_v': 'pts_visita',
+}
+
+
+def numero_jornada(ronda: Optional[str]) -> Optional[int]:
+    """
+    Número de jornada de una ronda ("Regular Season - 12" -> 12).
+    
+    Retorna None si la ronda no termina en un número (p. ej. "Final").
+    """
+    coincidencia = PATRON_JORNADA.search(ronda or "")
+    return int(coincidencia.group(1)) if coincidencia else None
+
+
+def fila_clasificacion(nombre: str, stats: EstadisticasEquipo) -> Dict[str, Any]:
+    """
+    Fila de clasificación (campos de FilaClasificacion) sin validación Pydantic.
+    
+    `stats` debe tener los derivados calculados (calcular_derivados).
+    """
+    return {
+        'posicion': 0,
+        'equipo': nombre,
+        
+        # Generales
+        'pj': stats.partidos_jugados,
+        'v': stats.victorias,
+        'e': stats.empates,
+        'd': stats.derrotas,
+        'gf': stats.goles_favor,
+        'gc': stats.goles_contra,
+        'dif': stats.diferencia_goles,
+        'pts': stats.puntos,
+        
+        # Local
+        'pj_l': stats.pj_local,
+        'v_l': stats.v_local,
+        'e_l': stats.e_local,
+        'd_l': stats.d_local,
+        'gf_l': stats.gf_local,
+        'gc_l': stats.gc_local,
+        'pts_l': stats.pts_local,
+        
+        # Visitante
+        'pj_v': stats.pj_visita,
+        'v_v': stats.v_visita,
+        'e_v': stats.e_visita,
+        'd_v': stats.d_visita,
+        'gf_v': stats.gf_visita,
+        'gc_v': stats.gc_visita,
+        'pts_v': stats.pts_visita,
+        
+        # Rendimientos
+        'rendimiento': stats.rendimiento_general,
+        'rendimiento_l': stats.rendimiento_local,
+        'rendimiento_v': stats.rendimiento_visita
+    }
+
+
+def cargar_fila(stats: EstadisticasEquipo, fila: Dict[str, Any]) -> None:
+    """
+    Restaura en `stats` los contadores de una fila guardada (in situ).
+    
+    Los derivados (rendimientos, promedios) se recalculan con
+    calcular_derivados.
+    """
+    for campo, atributo in CAMPOS_FILA.items():
+        setattr(stats, atributo, fila[campo])
+
+
+def ordenar_filas(filas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Ordena las filas y asigna posiciones (in situ).
+    
+    Criterios: puntos, diferencia de goles y goles a favor (DESC), y
+    nombre (ASC) como desempate final.
+    """
+    filas.sort(key=lambda f: (-f['pts'], -f['dif'], -f['gf'], f['equipo']))
+    for idx, fila in enumerate(filas, 1):
+        fila['posicion'] = idx
+    return filas
+
+
+def fila_a_dict(fila: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convierte una fila al formato de respuesta de la API.
+    """
+    return {
+        'posicion': fila['posicion'],
+        'equipo': fila['equipo'],
+        'pj': fila['pj'],
+        'v': fila['v'],
+        'e': fila['e'],
+        'd': fila['d'],
+        'gf': fila['gf'],
+        'gc': fila['gc'],
+        'dif': fila['dif'],
+        'pts': fila['pts'],
+        'rendimiento': fila['rendimiento'],
+        'local': {
+            'pj': fila['pj_l'],
+            'v': fila['v_l'],
+            'e': fila['e_l'],
+            'd': fila['d_l'],
+            'gf': fila['gf_l'],
+            'gc': fila['gc_l'],
+            'pts': fila['pts_l'],
+            'rendimiento': fila['rendimiento_l']
+        },
+        'visitante': {
+            'pj': fila['pj_v'],
+            'v': fila['v_v'],
+            'e': fila['e_v'],
+            'd': fila['d_v'],
+            'gf': fila['gf_v'],
+            'gc': fila['gc_v'],
+            'pts': fila['pts_v'],
+            'rendimiento': fila['rendimiento_v']
+        }
+    }
@@ -1,19 +1,21 @@
-from fastapi import FastAPI, APIRouter, HTTPException, BackgroundTasks
+from fastapi import FastAPI, APIRouter, HTTPException
 from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
 from typing import List, Optional, Dict, Any
 import uuid
 from datetime import datetime, timezone
-import subprocess
 import json
+import heapq
 import io
 import csv
+import zlib
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -30,6 +32,9 @@ mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
 client = None
 db = None
 
+# Pipeline de ingesta de API-Futbol (en proceso)
+from api_football.main import scrape
+
 # Importar el Motor de Pronósticos
 from prediction_engine import (
     StatsBuilder,
@@ -38,8 +43,14 @@ from prediction_engine import (
     ValidationEngine,
     BacktestingEngine,
     TipoTiempo,
+    ColaTrabajos,
+    ContextoTrabajo,
+    WorkerTrabajos,
+    asegurar_indices,
+    verificar_indices,
     Config as PredictionConfig
 )
+from prediction_engine.cola_trabajos import ESTADOS_ACTIVOS
 
 # Create the main app
 app = FastAPI(
@@ -61,6 +72,7 @@ historico_engine = None
 async def startup_db_client():
     """Conectar a MongoDB al iniciar la aplicación."""
     global client, db, stats_builder, classification_engine, prediction_engine, validation_engine, backtesting_engine, historico_engine
+    global cola_trabajos, worker_trabajos
     try:
         mongo_url_env = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
         db_name = os.environ.get('DB_NAME', 'test_database')
@@ -87,18 +99,32 @@ async def startup_db_client():
         
         logger.info("Motores de pronósticos inicializados correctamente")
         
+        # Índices de las consultas del motor y autochequeo de planes
+        # (los COLLSCAN de consultas críticas quedan en el log)
+        try:
+            await asegurar_indices(db)
+            await verificar_indices(db)
+        except Exception as e:
+            logger.warning(f"No se pudieron verificar los índices: {e}")
+        
+        # Cola de trabajos. JOB_WORKER_CONCURRENCY=0 deja este proceso solo
+        # como API (los trabajos los ejecuta otro proceso con worker)
+        cola_trabajos = ColaTrabajos(db)
+        await cola_trabajos.asegurar_indices()
+        concurrencia = int(os.environ.get('JOB_WORKER_CONCURRENCY', PredictionConfig.TRABAJOS_CONCURRENCIA))
+        if concurrencia > 0:
+            worker_trabajos = WorkerTrabajos(cola_trabajos, MANEJADORES_TRABAJOS, concurrencia)
+            worker_trabajos.iniciar()
+        
     except Exception as e:
         logger.error(f"Error conectando a MongoDB: {e}")
         # No fallar el inicio, pero advertir
         logger.warning("El servidor iniciará sin conexión a MongoDB")
 
-# Global variable to track scraping status
-scraping_status = {
-    "is_running": False,
-    "progress": 0,
-    "message": "Listo para iniciar",
-    "logs": []
-}
+# Cola de trabajos persistente (scraping, estadísticas, backtesting) y
+# worker de este proceso; se inicializan en startup
+cola_trabajos = None
+worker_trabajos = None
 
 # Models
 class MatchFilter(BaseModel):
@@ -119,8 +145,9 @@ class ExportRequest(BaseModel):
     liga_id: Optional[str] = None
     temporada: Optional[int] = None
     season_id: Optional[str] = None
-    limit: int = 1000
+    limit: Optional[int] = 1000  # None o 0 = sin límite
     include_fields: Optional[List[str]] = None  # Campos específicos a exportar
+    gzip: bool = False  # Content-Encoding: gzip
 
 # Routes
 @api_router.get("/")
@@ -262,89 +289,166 @@ async def get_leagues():
         logging.error(f"Error getting leagues: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-async def run_scraping_task(request: ScrapeRequest):
-    """Ejecutar scraping en background y construir estadísticas automáticamente."""
-    global scraping_status
+def _trabajo_publico(trabajo: Dict[str, Any]) -> Dict[str, Any]:
+    """Documento de la cola con `id` en lugar de `_id`."""
+    publico = dict(trabajo)
+    publico["id"] = publico.pop("_id")
+    return publico
+
+
+def _inferir_liga_temporada(
+    liga_id: Optional[str],
+    temporada: Optional[int],
+    season_id: Optional[str]
+) -> tuple:
+    """Infiere (liga_id, temporada, season_id) a partir de lo que se indique."""
+    if season_id:
+        # Formato: LIGA_ID_YYYY-YY (ej: ENGLAND_PREMIER_LEAGUE_2022-23)
+        parts = season_id.rsplit('_', 1)
+        if len(parts) == 2:
+            if not liga_id:
+                liga_id = parts[0]  # ENGLAND_PREMIER_LEAGUE
+            try:
+                if not temporada:
+                    temporada = int(parts[1].split('-')[0])  # 2022
+            except ValueError:
+                pass
     
-    try:
-        scraping_status["is_running"] = True
-        scraping_status["progress"] = 10
-        scraping_status["message"] = "Iniciando extracción de datos..."
-        scraping_status["logs"].append(f"{datetime.now()}: Proceso iniciado")
-        
-        # Construir comando
-        cmd = ["python", "-m", "api_football.main", "--season", str(request.season)]
-        
-        if request.limit:
-            cmd.extend(["--limit", str(request.limit)])
-        
-        league_id = None
-        if request.league_ids and len(request.league_ids) > 0:
-            league_id = request.league_ids[0]
-            cmd.extend(["--league-id", str(league_id)])
-        
-        scraping_status["progress"] = 20
-        scraping_status["message"] = "Extrayendo partidos de la API..."
-        
-        # Ejecutar proceso de scraping
-        result = subprocess.run(
-            cmd,
-            cwd=ROOT_DIR,
-            capture_output=True,
-            text=True,
-            timeout=600
+    # Valores por defecto solo si no se puede inferir nada
+    if not liga_id:
+        liga_id = "SPAIN_LA_LIGA"
+    if not temporada:
+        temporada = 2023
+    if not season_id:
+        season_id = f"{liga_id}_{temporada}-{(temporada + 1) % 100:02d}"
+    
+    return liga_id, temporada, season_id
+
+
+async def _trabajo_scrape(ctx: ContextoTrabajo) -> Dict[str, Any]:
+    """
+    Trabajo 'scrape': extrae partidos de API-Futbol en proceso.
+    
+    La ingesta (api_football.main.scrape) hace las peticiones HTTP y las
+    escrituras en hilos, así que el servidor sigue respondiendo mientras
+    corre. Al terminar encola un trabajo 'construir_estadisticas' por cada
+    temporada afectada; los workers los procesan en paralelo.
+    """
+    parametros = ctx.parametros
+    season = parametros.get("season", 2023)
+    ctx.reportar(10, "Iniciando extracción de datos...")
+    ctx.log("Proceso iniciado")
+    
+    def progreso(terminadas: int, total: int, stats: Dict[str, Any]) -> None:
+        ctx.reportar(10 + int(90 * terminadas / total), f"Extrayendo partidos ({terminadas}/{total} ligas)...")
+        ctx.log(
+            f"{stats['liga']}: {stats['insertados']} nuevos, "
+            f"{stats['actualizados']} actualizados, {stats['errores']} errores"
         )
-        
-        if result.returncode != 0:
-            scraping_status["progress"] = 100
-            scraping_status["message"] = f"Error en extracción: {result.stderr[:200]}"
-            scraping_status["logs"].append(f"{datetime.now()}: Error - {result.stderr[:100]}")
-            return
-        
-        scraping_status["progress"] = 60
-        scraping_status["message"] = "Extracción completada. Construyendo estadísticas..."
-        scraping_status["logs"].append(f"{datetime.now()}: Extracción completada")
-        
-        # Construir season_id para las estadísticas
-        if league_id:
-            # Mapear league_id de API a liga_id interno
-            liga_mapping = await _get_liga_id_from_api_id(league_id)
-            if liga_mapping:
-                season_id = f"{liga_mapping}_{request.season}-{(request.season + 1) % 100:02d}"
-                
-                scraping_status["progress"] = 70
-                scraping_status["message"] = f"Construyendo estadísticas para {season_id}..."
-                scraping_status["logs"].append(f"{datetime.now()}: Construyendo estadísticas para {season_id}")
-                
-                try:
-                    equipos = await stats_builder.construir_estadisticas(
-                        liga_id=liga_mapping,
-                        temporada=request.season,
-                        season_id=season_id
-                    )
-                    scraping_status["logs"].append(f"{datetime.now()}: Estadísticas construidas para {len(equipos)} equipos")
-                except Exception as e:
-                    scraping_status["logs"].append(f"{datetime.now()}: Advertencia construyendo stats: {str(e)[:100]}")
-        
-        scraping_status["progress"] = 100
-        scraping_status["message"] = "✅ Proceso completado: datos extraídos y estadísticas construidas"
-        scraping_status["logs"].append(f"{datetime.now()}: Proceso completado exitosamente")
-        
-    except subprocess.TimeoutExpired:
-        scraping_status["message"] = "Timeout: Proceso tomó demasiado tiempo"
-        scraping_status["logs"].append(f"{datetime.now()}: Timeout")
-    except Exception as e:
-        scraping_status["message"] = f"Error: {str(e)}"
-        scraping_status["logs"].append(f"{datetime.now()}: Error - {str(e)}")
-    finally:
-        scraping_status["is_running"] = False
+    
+    resultados = await scrape(
+        league_ids=parametros.get("league_ids"),
+        season=season,
+        limit_leagues=parametros.get("limit"),
+        progress=progreso
+    )
+    
+    if not resultados:
+        raise ValueError("Error en extracción: no se encontraron ligas")
+    
+    ctx.log("Extracción completada")
+    
+    # Temporadas con partidos escritos (liga_id, season_id)
+    temporadas = []
+    for stats in resultados:
+        liga_id = stats.get("liga_id")
+        season_ids = stats.get("season_ids") or []
+        if not liga_id and stats.get("fixtures_obtenidos") and stats.get("errores"):
+            # Partidos descargados pero no escritos: mapear el ID de la API
+            liga_id = await _get_liga_id_from_api_id(stats["api_league_id"])
+            if liga_id:
+                season_ids = [f"{liga_id}_{season}-{(season + 1) % 100:02d}"]
+        temporadas.extend((liga_id, season_id) for season_id in season_ids if liga_id)
+    
+    hijos = []
+    for liga_id, season_id in temporadas:
+        # Incremental: solo aplica los partidos que aún no se procesaron
+        trabajo, _ = await cola_trabajos.encolar(
+            "construir_estadisticas",
+            {"liga_id": liga_id, "season_id": season_id, "incremental": True},
+            clave=f"construir_estadisticas:{season_id}",
+            padre_id=ctx.id
+        )
+        hijos.append(trabajo["_id"])
+        ctx.log(f"Estadísticas de {season_id} encoladas")
+    
+    ctx.reportar(100, "Extracción completada. Construyendo estadísticas...")
+    return {
+        "ligas": resultados,
+        "temporadas": [season_id for _, season_id in temporadas],
+        "trabajos_estadisticas": hijos
+    }
+
+
+async def _trabajo_construir_estadisticas(ctx: ContextoTrabajo) -> Dict[str, Any]:
+    """Trabajo 'construir_estadisticas': reconstrucción (o actualización incremental) de una temporada."""
+    parametros = ctx.parametros
+    liga_id, temporada, season_id = _inferir_liga_temporada(
+        parametros.get("liga_id"), parametros.get("temporada"), parametros.get("season_id")
+    )
+    ctx.reportar(10, f"Construyendo estadísticas para {season_id}...")
+    ctx.log(f"Construyendo estadísticas para {season_id}")
+    
+    construir = (
+        stats_builder.actualizar_estadisticas
+        if parametros.get("incremental", False)
+        else stats_builder.construir_estadisticas
+    )
+    equipos = await construir(liga_id=liga_id, temporada=temporada, season_id=season_id)
+    
+    ctx.reportar(100, f"Estadísticas construidas para {len(equipos)} equipos")
+    ctx.log(f"Estadísticas actualizadas para {len(equipos)} equipos")
+    return {
+        "liga_id": liga_id,
+        "temporada": temporada,
+        "season_id": season_id,
+        "equipos": list(equipos.keys())
+    }
+
+
+async def _trabajo_backtest(ctx: ContextoTrabajo) -> Dict[str, Any]:
+    """Trabajo 'backtest': backtesting de una temporada o liga (o walk-forward)."""
+    parametros = ctx.parametros
+    if parametros.get("modo") == "walk_forward":
+        ctx.reportar(10, "Ejecutando backtesting walk-forward...")
+        return await backtesting_engine.ejecutar_walk_forward(
+            season_ids=parametros.get("season_ids"),
+            liga_ids=parametros.get("liga_ids"),
+            procesos=parametros.get("procesos"),
+            usar_historico=parametros.get("usar_historico", True)
+        )
+    
+    ctx.reportar(10, "Ejecutando backtesting...")
+    return await backtesting_engine.ejecutar_backtesting(
+        season_id=parametros.get("season_id"),
+        liga_id=parametros.get("liga_id"),
+        limite=parametros.get("limite", 100)
+    )
+
+
+# Tipos de trabajo que ejecuta el worker de cada proceso
+MANEJADORES_TRABAJOS = {
+    "scrape": _trabajo_scrape,
+    "construir_estadisticas": _trabajo_construir_estadisticas,
+    "backtest": _trabajo_backtest,
+}
 
 
 async def _get_liga_id_from_api_id(api_league_id: int) -> str:
     """Obtiene el liga_id interno a partir del ID de la API."""
     # Buscar en los partidos existentes
     match = await db.football_matches.find_one(
-        {"id_liga": api_league_id},
+        {"$or": [{"api_league_id": api_league_id}, {"id_liga": api_league_id}]},
         {"liga_id": 1}
     )
     if match:
@@ -365,44 +469,254 @@ async def _get_liga_id_from_api_id(api_league_id: int) -> str:
     }
     return liga_map.get(api_league_id)
 
+def _clave_scrape(request: ScrapeRequest) -> str:
+    return "scrape:" + json.dumps(request.model_dump(), sort_keys=True)
+
+
+async def _estado_scraping(trabajo: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Estado de un scraping en el formato histórico de /scrape/status.
+    
+    Combina el trabajo 'scrape' (0-60%) con los trabajos de estadísticas
+    que encoló (60-100%).
+    """
+    ids_hijos = (trabajo.get("resultado") or {}).get("trabajos_estadisticas") or []
+    hijos = await cola_trabajos.listar(ids=ids_hijos, limite=0, con_logs=True) if ids_hijos else []
+    
+    activo = trabajo["estado"] in ESTADOS_ACTIVOS
+    terminados = sum(1 for h in hijos if h["estado"] not in ESTADOS_ACTIVOS)
+    fallidos = sum(1 for h in hijos if h["estado"] == "error")
+    
+    if activo or trabajo["estado"] != "completado":
+        progreso = int(trabajo["progreso"] * 0.6)
+        mensaje = trabajo["mensaje"]
+    elif terminados < len(hijos):
+        progreso = 60 + int(40 * terminados / len(hijos))
+        mensaje = f"Construyendo estadísticas ({terminados}/{len(hijos)} temporadas)..."
+    else:
+        progreso = 100
+        mensaje = (
+            f"Proceso completado con errores en {fallidos} temporadas" if fallidos
+            else "✅ Proceso completado: datos extraídos y estadísticas construidas"
+        )
+    if trabajo["estado"] in ("error", "cancelado"):
+        progreso = 100
+    
+    logs = sorted(trabajo.get("logs", []) + [log for h in hijos for log in h.get("logs", [])])
+    
+    return {
+        "job_id": trabajo["_id"],
+        "estado": trabajo["estado"],
+        "is_running": activo or terminados < len(hijos),
+        "progress": progreso,
+        "message": mensaje,
+        "logs": logs,
+        "trabajos": [
+            {
+                "id": h["_id"],
+                "season_id": h["parametros"].get("season_id"),
+                "estado": h["estado"],
+                "progreso": h["progreso"],
+                "mensaje": h["mensaje"]
+            }
+            for h in hijos
+        ]
+    }
+
+
 @api_router.post("/scrape/start")
-async def start_scraping(request: ScrapeRequest, background_tasks: BackgroundTasks):
-    """Iniciar proceso de scraping."""
-    global scraping_status
+async def start_scraping(request: ScrapeRequest):
+    """
+    Iniciar proceso de scraping.
     
-    if scraping_status["is_running"]:
+    Encola un trabajo 'scrape' en la cola persistente; lo ejecuta el
+    worker de cualquiera de los procesos del servidor.
+    """
+    clave = _clave_scrape(request)
+    if await cola_trabajos.activo(clave):
         raise HTTPException(status_code=400, detail="Ya hay un proceso en ejecución")
     
-    scraping_status = {
-        "is_running": True,
-        "progress": 0,
-        "message": "Iniciando...",
-        "logs": []
-    }
+    trabajo, _ = await cola_trabajos.encolar("scrape", request.model_dump(), clave=clave)
+    
+    return {"message": "Proceso iniciado", "job_id": trabajo["_id"], "status": await _estado_scraping(trabajo)}
+
+@api_router.post("/scrape/cancel")
+async def cancel_scraping(job_id: Optional[str] = None):
+    """Cancelar un scraping (por defecto el más reciente) y sus trabajos de estadísticas."""
+    trabajo = await _obtener_scraping(job_id)
+    estado = await _estado_scraping(trabajo)
+    if not estado["is_running"]:
+        raise HTTPException(status_code=400, detail="No hay un proceso en ejecución")
     
-    background_tasks.add_task(run_scraping_task, request)
+    await cola_trabajos.solicitar_cancelacion(trabajo["_id"])
+    for hijo in estado["trabajos"]:
+        await cola_trabajos.solicitar_cancelacion(hijo["id"])
     
-    return {"message": "Proceso iniciado", "status": scraping_status}
+    return {"message": "Cancelación solicitada", "status": await _estado_scraping(await cola_trabajos.obtener(trabajo["_id"]))}
 
 @api_router.get("/scrape/status")
-async def get_scraping_status():
-    """Obtener estado del scraping."""
-    return scraping_status
+async def get_scraping_status(job_id: Optional[str] = None):
+    """Obtener estado del scraping (por defecto el más reciente)."""
+    try:
+        trabajo = await _obtener_scraping(job_id)
+    except HTTPException:
+        if job_id:
+            raise
+        return {"is_running": False, "progress": 0, "message": "Listo para iniciar", "logs": []}
+    
+    return await _estado_scraping(trabajo)
+
+
+async def _obtener_scraping(job_id: Optional[str]) -> Dict[str, Any]:
+    """Trabajo 'scrape' indicado o el más reciente (404 si no hay)."""
+    if job_id:
+        trabajo = await cola_trabajos.obtener(job_id)
+    else:
+        recientes = await cola_trabajos.listar(tipo="scrape", limite=1, con_logs=True)
+        trabajo = recientes[0] if recientes else None
+    
+    if not trabajo or trabajo["tipo"] != "scrape":
+        raise HTTPException(status_code=404, detail="Proceso de scraping no encontrado")
+    return trabajo
+
+
+# ============================================
+# COLA DE TRABAJOS
+# ============================================
+
+class TrabajoRequest(BaseModel):
+    """Request para encolar un trabajo."""
+    tipo: str = Field(description="scrape, construir_estadisticas o backtest")
+    parametros: Dict[str, Any] = Field(default_factory=dict)
+
+
+@api_router.post("/jobs")
+async def create_job(request: TrabajoRequest):
+    """
+    Encola un trabajo.
+    
+    **Tipos:**
+    - `scrape`: `{league_ids, season, limit}` (como /scrape/start)
+    - `construir_estadisticas`: `{season_id, liga_id, temporada, incremental}`
+    - `backtest`: `{season_id, liga_id, limite}`, o
+      `{modo: "walk_forward", season_ids, liga_ids, procesos, usar_historico}`
+    
+    Un `construir_estadisticas` igual a otro aún pendiente no se duplica.
+    """
+    if request.tipo not in MANEJADORES_TRABAJOS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Tipo de trabajo no válido: {request.tipo}. Opciones: {list(MANEJADORES_TRABAJOS)}"
+        )
+    
+    clave = None
+    if request.tipo == "construir_estadisticas":
+        _, _, season_id = _inferir_liga_temporada(
+            request.parametros.get("liga_id"),
+            request.parametros.get("temporada"),
+            request.parametros.get("season_id")
+        )
+        clave = f"construir_estadisticas:{season_id}"
+    
+    trabajo, creado = await cola_trabajos.encolar(request.tipo, request.parametros, clave=clave)
+    return {"success": True, "creado": creado, "trabajo": _trabajo_publico(trabajo)}
+
+@api_router.get("/jobs")
+async def list_jobs(tipo: Optional[str] = None, estado: Optional[str] = None, limite: int = 50):
+    """Lista trabajos de la cola, del más reciente al más antiguo (sin logs)."""
+    trabajos = await cola_trabajos.listar(tipo=tipo, estado=estado, limite=limite)
+    return {"success": True, "total": len(trabajos), "trabajos": [_trabajo_publico(t) for t in trabajos]}
+
+@api_router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Estado, progreso, logs y resultado de un trabajo."""
+    trabajo = await cola_trabajos.obtener(job_id)
+    if not trabajo:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return _trabajo_publico(trabajo)
+
+@api_router.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """Cancela un trabajo pendiente o en ejecución."""
+    trabajo = await cola_trabajos.solicitar_cancelacion(job_id)
+    if not trabajo:
+        if await cola_trabajos.obtener(job_id):
+            raise HTTPException(status_code=400, detail="El trabajo ya terminó")
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return {"message": "Cancelación solicitada", "trabajo": _trabajo_publico(trabajo)}
+
+FORMATOS_EXPORTACION = ("csv", "json", "ndjson")
+
+
+async def _filas_exportacion(bloques, formato: str, campos: Optional[List[str]], filtros: Dict[str, Any]):
+    """
+    Serializa bloques de partidos en el formato de exportación.
+    
+    Solo hay un bloque en memoria a la vez. En JSON se mantiene la forma
+    {"filtros", "datos", "total"} de la respuesta no streaming; "total" va
+    al final porque no se conoce hasta recorrer el cursor.
+    """
+    total = 0
+    if formato == "csv":
+        buffer = io.StringIO()
+        writer = None
+        async for bloque in bloques:
+            if writer is None:
+                writer = csv.DictWriter(buffer, fieldnames=campos or list(bloque[0].keys()), extrasaction='ignore')
+                writer.writeheader()
+            writer.writerows(bloque)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    
+    elif formato == "ndjson":
+        async for bloque in bloques:
+            yield "".join(json.dumps(doc, default=str, ensure_ascii=False) + "\n" for doc in bloque)
+    
+    else:
+        yield '{"filtros": ' + json.dumps(filtros, ensure_ascii=False) + ', "datos": ['
+        async for bloque in bloques:
+            separador = "" if total == 0 else ","
+            yield separador + ",".join(json.dumps(doc, default=str, ensure_ascii=False) for doc in bloque)
+            total += len(bloque)
+        yield f'], "total": {total}}}'
+
+
+async def _comprimir_gzip(partes):
+    """Comprime al vuelo una secuencia de textos (Content-Encoding: gzip)."""
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for parte in partes:
+        datos = compresor.compress(parte.encode("utf-8"))
+        if datos:
+            yield datos
+    yield compresor.flush()
+
 
 @api_router.post("/export")
 async def export_data(request: ExportRequest):
     """
     Exportar datos de partidos.
     
+    La respuesta se genera en streaming directamente desde el cursor de
+    MongoDB, por bloques, así que la memoria no depende del tamaño del
+    export.
+    
     **Parámetros:**
-    - `format`: "csv" o "json"
+    - `format`: "csv", "json" o "ndjson"
     - `liga_id`: Filtrar por liga
     - `temporada`: Filtrar por año (legacy)
     - `season_id`: Filtrar por temporada estructurada (preferido)
-    - `limit`: Límite de registros
+    - `limit`: Límite de registros (null o 0 = sin límite)
     - `include_fields`: Lista de campos a incluir (opcional)
+    - `gzip`: Comprimir la respuesta (Content-Encoding: gzip)
     """
     try:
+        if request.format not in FORMATOS_EXPORTACION:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Formato '{request.format}' no soportado. Use: {', '.join(FORMATOS_EXPORTACION)}"
+            )
+        
         collection = db.football_matches
         query = {}
         
@@ -434,40 +748,32 @@ async def export_data(request: ExportRequest):
             for field in request.include_fields:
                 projection[field] = 1
         
-        # Obtener datos
-        cursor = collection.find(query, projection).sort("fecha", 1)
+        # Cursor por bloques: nunca se carga el export completo
+        tamano = PredictionConfig.TAMANO_BLOQUE_EXPORTACION
+        cursor = collection.find(query, projection).sort("fecha", 1).batch_size(tamano)
         if request.limit:
             cursor = cursor.limit(request.limit)
         
-        matches = await cursor.to_list(request.limit or 10000)
-        
-        if not matches:
+        bloques = _en_bloques(cursor, tamano)
+        try:
+            primer_bloque = await bloques.__anext__()
+        except StopAsyncIteration:
             raise HTTPException(status_code=404, detail="No hay datos para exportar con los filtros especificados")
         
-        if request.format == "json":
-            return {
-                "total": len(matches),
-                "filtros": {
-                    "liga_id": request.liga_id,
-                    "temporada": request.temporada,
-                    "season_id": request.season_id
-                },
-                "datos": matches
-            }
+        async def _todos_los_bloques():
+            yield primer_bloque
+            async for bloque in bloques:
+                yield bloque
         
-        elif request.format == "csv":
-            # Crear CSV
-            output = io.StringIO()
-            
-            # Usar campos específicos o todos los del primer registro
-            fieldnames = request.include_fields if request.include_fields else list(matches[0].keys())
-            
-            writer = csv.DictWriter(output, fieldnames=fieldnames, extrasaction='ignore')
-            writer.writeheader()
-            writer.writerows(matches)
-            
-            output.seek(0)
-            
+        filtros = {
+            "liga_id": request.liga_id,
+            "temporada": request.temporada,
+            "season_id": request.season_id
+        }
+        cuerpo = _filas_exportacion(_todos_los_bloques(), request.format, request.include_fields, filtros)
+        
+        headers = {}
+        if request.format != "json":
             # Generar nombre de archivo descriptivo
             filename_parts = ["partidos"]
             if request.season_id:
@@ -476,16 +782,15 @@ async def export_data(request: ExportRequest):
                 filename_parts.append(request.liga_id)
             filename_parts.append(datetime.now().strftime('%Y%m%d'))
             
-            filename = "_".join(filename_parts) + ".csv"
-            
-            return StreamingResponse(
-                iter([output.getvalue()]),
-                media_type="text/csv",
-                headers={"Content-Disposition": f"attachment; filename={filename}"}
-            )
+            filename = "_".join(filename_parts) + "." + request.format
+            headers["Content-Disposition"] = f"attachment; filename={filename}"
         
-        else:
-            raise HTTPException(status_code=400, detail=f"Formato '{request.format}' no soportado. Use 'csv' o 'json'")
+        if request.gzip:
+            cuerpo = _comprimir_gzip(cuerpo)
+            headers["Content-Encoding"] = "gzip"
+        
+        media_types = {"csv": "text/csv", "json": "application/json", "ndjson": "application/x-ndjson"}
+        return StreamingResponse(cuerpo, media_type=media_types[request.format], headers=headers)
             
     except HTTPException:
         raise
@@ -556,26 +861,9 @@ async def build_statistics(request: ConstruirStatsRequest):
     """
     try:
         # Inferir liga_id y temporada de season_id si no se proporcionan
-        effective_liga_id = request.liga_id
-        effective_temporada = request.temporada
-        
-        if request.season_id:
-            # Formato: LIGA_ID_YYYY-YY (ej: ENGLAND_PREMIER_LEAGUE_2022-23)
-            parts = request.season_id.rsplit('_', 1)
-            if len(parts) == 2:
-                if not effective_liga_id:
-                    effective_liga_id = parts[0]  # ENGLAND_PREMIER_LEAGUE
-                try:
-                    if not effective_temporada:
-                        effective_temporada = int(parts[1].split('-')[0])  # 2022
-                except ValueError:
-                    pass
-        
-        # Valores por defecto solo si no se puede inferir nada
-        if not effective_liga_id:
-            effective_liga_id = "SPAIN_LA_LIGA"
-        if not effective_temporada:
-            effective_temporada = 2023
+        effective_liga_id, effective_temporada, effective_season_id = _inferir_liga_temporada(
+            request.liga_id, request.temporada, request.season_id
+        )
         
         equipos = await stats_builder.construir_estadisticas(
             liga_id=effective_liga_id,
@@ -583,11 +871,6 @@ async def build_statistics(request: ConstruirStatsRequest):
             season_id=request.season_id
         )
         
-        # Determinar season_id efectivo para respuesta
-        effective_season_id = request.season_id
-        if not effective_season_id and effective_temporada:
-            effective_season_id = f"{effective_liga_id}_{effective_temporada}-{(effective_temporada + 1) % 100:02d}"
-        
         return {
             "success": True,
             "message": f"Estadísticas construidas para {len(equipos)} equipos",
@@ -608,16 +891,24 @@ async def get_classification(
     liga_id: Optional[str] = None,
     temporada: Optional[int] = None,
     tipo_tiempo: str = "completo",
-    season_id: Optional[str] = None
+    season_id: Optional[str] = None,
+    jornada: Optional[int] = None,
+    tipos_tiempo: Optional[str] = None
 ):
     """
     Obtiene la tabla de clasificación.
     
+    Lee la tabla materializada al construir estadísticas; si la temporada
+    no tiene tablas materializadas, la genera a partir de team_statistics.
+    
     **Parámetros:**
     - `liga_id`: ID de la liga (opcional, se infiere de season_id)
     - `temporada`: Año de la temporada (legacy, se infiere de season_id)
     - `tipo_tiempo`: "completo", "primer_tiempo" o "segundo_tiempo"
     - `season_id`: ID estructurado de temporada (preferido)
+    - `jornada`: Tabla tras esa jornada (opcional, por defecto la actual)
+    - `tipos_tiempo`: Varios tipos separados por coma, o "todos". Devuelve
+      las tablas juntas en `tablas` (una sola lectura de equipos)
     
     **Retorna:**
     - Tabla de posiciones ordenada por puntos
@@ -651,6 +942,29 @@ async def get_classification(
         }
         tipo = tiempo_map.get(tipo_tiempo, TipoTiempo.COMPLETO)
         
+        if tipos_tiempo:
+            return await _clasificaciones_varios_tiempos(
+                effective_liga_id, effective_temporada, season_id, jornada,
+                list(tiempo_map.values()) if tipos_tiempo == "todos" else [
+                    tiempo_map[t.strip()] for t in tipos_tiempo.split(",") if t.strip() in tiempo_map
+                ]
+            )
+        
+        materializada = await classification_engine.obtener_clasificacion(
+            liga_id=effective_liga_id,
+            season_id=season_id,
+            tipo_tiempo=tipo,
+            jornada=jornada,
+            temporada=effective_temporada
+        )
+        if materializada:
+            return materializada
+        if jornada is not None:
+            raise ValueError(
+                f"No hay clasificación por jornada para {season_id or effective_liga_id}; "
+                f"construir estadísticas de la temporada"
+            )
+        
         tabla = await classification_engine.generar_clasificacion(
             liga_id=effective_liga_id,
             temporada=effective_temporada,
@@ -675,6 +989,36 @@ async def get_classification(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _clasificaciones_varios_tiempos(
+    liga_id: str,
+    temporada: int,
+    season_id: Optional[str],
+    jornada: Optional[int],
+    tipos: List[TipoTiempo]
+) -> Dict[str, Any]:
+    """Tablas de varios tipos de tiempo: materializadas o generadas en una pasada."""
+    if not tipos:
+        raise ValueError("tipos_tiempo no contiene ningún tipo válido")
+    
+    effective_season_id = season_id or f"{liga_id}_{temporada}-{(temporada + 1) % 100:02d}"
+    tablas = await classification_engine.obtener_clasificaciones(
+        liga_id, effective_season_id, tipos, jornada
+    )
+    if tablas is None:
+        if jornada is not None:
+            raise ValueError(
+                f"No hay clasificación por jornada para {effective_season_id}; "
+                f"construir estadísticas de la temporada"
+            )
+        tablas = await classification_engine.generar_clasificaciones(
+            liga_id, season_id, tipos, temporada
+        )
+        for tabla in tablas.values():
+            tabla['season_id'] = effective_season_id
+    
+    return {"liga_id": liga_id, "season_id": effective_season_id, "tablas": tablas}
+
+
 @api_router.post("/prediction/generate")
 async def generate_prediction(request: PronosticoRequest):
     """
@@ -732,6 +1076,75 @@ async def generate_prediction(request: PronosticoRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _ejecutar_acotado(items, funcion, limite: int = PredictionConfig.CONCURRENCIA_PRONOSTICOS):
+    """
+    Ejecuta `funcion(item)` para cada item con a lo sumo `limite` tareas simultáneas.
+    
+    Conserva el orden de entrada. Las excepciones no cancelan al resto:
+    se devuelven en la posición del item que falló.
+    """
+    semaforo = asyncio.Semaphore(max(1, limite))
+    
+    async def _ejecutar(item):
+        async with semaforo:
+            return await funcion(item)
+    
+    return await asyncio.gather(*(_ejecutar(item) for item in items), return_exceptions=True)
+
+
+FORMATOS_RESPUESTA = ("json", "ndjson", "sse")
+
+
+def _validar_formato(formato: str) -> None:
+    """Valida el parámetro `formato` de los endpoints con modo streaming."""
+    if formato not in FORMATOS_RESPUESTA:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Formato '{formato}' no soportado. Use: {', '.join(FORMATOS_RESPUESTA)}"
+        )
+
+
+def _respuesta_stream(registros, formato: str) -> StreamingResponse:
+    """
+    Convierte un generador asíncrono de registros en una respuesta en streaming.
+    
+    Cada registro es un dict con la clave "tipo" ("partido", "apuesta",
+    "resumen" o "error"). En NDJSON se emite una línea JSON por registro;
+    en SSE, un evento con `event: <tipo>`.
+    """
+    async def _cuerpo():
+        try:
+            async for registro in registros:
+                datos = json.dumps(registro, default=str, ensure_ascii=False)
+                if formato == "sse":
+                    yield f"event: {registro['tipo']}\ndata: {datos}\n\n"
+                else:
+                    yield datos + "\n"
+        except Exception as e:
+            # La respuesta ya empezó: el error viaja como último registro
+            logging.error(f"Error en respuesta streaming: {str(e)}")
+            datos = json.dumps({"tipo": "error", "detail": str(e)}, ensure_ascii=False)
+            yield f"event: error\ndata: {datos}\n\n" if formato == "sse" else datos + "\n"
+    
+    return StreamingResponse(
+        _cuerpo(),
+        media_type="text/event-stream" if formato == "sse" else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
+async def _en_bloques(cursor, tamano: int):
+    """Agrupa los documentos de un cursor en listas de a lo sumo `tamano`."""
+    bloque = []
+    async for doc in cursor:
+        bloque.append(doc)
+        if len(bloque) >= tamano:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+
 @api_router.get("/prediction/jornada")
 async def get_jornada_predictions(
     season_id: str,
@@ -781,15 +1194,19 @@ async def get_jornada_predictions(
         if not partidos:
             raise HTTPException(status_code=404, detail=f"No se encontraron partidos para la jornada '{jornada}'")
         
-        # Generar pronósticos para cada partido
-        resultados = []
-        for partido in partidos:
+        # Forma reciente de todos los equipos (una sola consulta)
+        formas = await stats_builder.obtener_forma_reciente_todos(liga_id, season_id)
+        
+        # Generar pronósticos para cada partido (concurrencia acotada)
+        async def procesar(partido):
             try:
                 pronostico = await prediction_engine.generar_pronostico(
                     equipo_local=partido["equipo_local"],
                     equipo_visitante=partido["equipo_visitante"],
                     liga_id=liga_id,
-                    season_id=season_id
+                    season_id=season_id,
+                    forma_local=formas.get(partido["equipo_local"]),
+                    forma_visitante=formas.get(partido["equipo_visitante"])
                 )
                 
                 tc = pronostico.tiempo_completo
@@ -802,7 +1219,7 @@ async def get_jornada_predictions(
                     partido["equipo_visitante"], liga_id, season_id=season_id
                 )
                 
-                resultados.append({
+                return {
                     "equipo_local": partido["equipo_local"],
                     "equipo_visitante": partido["equipo_visitante"],
                     "fecha": partido.get("fecha"),
@@ -830,15 +1247,17 @@ async def get_jornada_predictions(
                         "promedio_gc": stats_visita.stats_completo.promedio_gc if stats_visita else 0
                     },
                     "forma_reciente": pronostico.forma_reciente
-                })
+                }
             except Exception as e:
                 logging.warning(f"Error generando pronóstico para {partido['equipo_local']} vs {partido['equipo_visitante']}: {e}")
-                resultados.append({
+                return {
                     "equipo_local": partido["equipo_local"],
                     "equipo_visitante": partido["equipo_visitante"],
                     "fecha": partido.get("fecha"),
                     "error": str(e)
-                })
+                }
+        
+        resultados = await _ejecutar_acotado(partidos, procesar)
         
         return {
             "success": True,
@@ -891,14 +1310,163 @@ async def get_h2h(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@api_router.get("/prediction/h2h/jornada")
+async def get_h2h_jornada(
+    season_id: str,
+    jornada: str,
+    limite: int = 10
+):
+    """
+    Obtiene el H2H de todos los partidos de una jornada.
+    
+    Lee todas las parejas del índice h2h_pares en una sola consulta.
+    
+    **Parámetros:**
+    - `season_id`: ID de temporada
+    - `jornada`: Nombre de la jornada (ej: "Regular Season - 1")
+    - `limite`: Máximo de partidos a considerar por pareja (default: 10)
+    
+    **Retorna:**
+    - H2H de cada partido, orientado local/visitante
+    """
+    try:
+        h2hs = await historico_engine.obtener_h2h_jornada(season_id, jornada, limite)
+        if not h2hs:
+            raise HTTPException(status_code=404, detail=f"No se encontraron partidos para la jornada '{jornada}'")
+        
+        return {
+            "success": True,
+            "season_id": season_id,
+            "jornada": jornada,
+            "partidos": [
+                {"equipo_local": local, "equipo_visitante": visitante, "h2h": h2h}
+                for (local, visitante), h2h in h2hs.items()
+            ]
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error obteniendo H2H de jornada: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _fila_temporada(
+    partido: Dict[str, Any],
+    pronostico,
+    equipos_stats: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Fila de /prediction/temporada-completa para un partido.
+    
+    `pronostico` puede ser la excepción devuelta por generar_pronosticos_lote;
+    en ese caso la fila lleva el error.
+    """
+    try:
+        if isinstance(pronostico, Exception):
+            raise pronostico
+        
+        # Extraer número de jornada
+        jornada = partido.get("ronda", "")
+        jornada_num = int(jornada.replace("Regular Season - ", "")) if "Regular Season" in jornada else 0
+        
+        tc = pronostico.tiempo_completo
+        
+        # Stats de equipos
+        stats_local = equipos_stats.get(partido["equipo_local"])
+        stats_visita = equipos_stats.get(partido["equipo_visitante"])
+        
+        return {
+            "jornada": jornada,
+            "jornada_num": jornada_num,
+            "fecha": partido.get("fecha"),
+            "equipo_local": partido["equipo_local"],
+            "equipo_visitante": partido["equipo_visitante"],
+            "pronostico": tc.pronostico,
+            "doble_oportunidad": tc.doble_oportunidad,
+            "ambos_marcan": tc.ambos_marcan,
+            "over_under": tc.over_under,
+            "probabilidades": {
+                "local": tc.probabilidades.porcentaje_local,
+                "empate": tc.probabilidades.porcentaje_empate,
+                "visita": tc.probabilidades.porcentaje_visita
+            },
+            "confianza": tc.confianza,
+            "goles_esperados": tc.goles_esperados,
+            "defensa_local": {
+                "gc_total": stats_local.stats_completo.goles_contra if stats_local else 0,
+                "promedio_gc": stats_local.stats_completo.promedio_gc if stats_local else 0
+            },
+            "defensa_visitante": {
+                "gc_total": stats_visita.stats_completo.goles_contra if stats_visita else 0,
+                "promedio_gc": stats_visita.stats_completo.promedio_gc if stats_visita else 0
+            },
+            "resultado_real": {
+                "local": partido.get("goles_local_TR"),
+                "visitante": partido.get("goles_visitante_TR")
+            } if partido.get("estado_del_partido") == "Match Finished" else None
+        }
+    except Exception as e:
+        logging.warning(f"Error en partido {partido['equipo_local']} vs {partido['equipo_visitante']}: {e}")
+        return {
+            "jornada": partido.get("ronda", ""),
+            "jornada_num": 0,
+            "equipo_local": partido["equipo_local"],
+            "equipo_visitante": partido["equipo_visitante"],
+            "error": str(e)
+        }
+
+
+async def _stream_temporada_completa(liga_id: str, season_id: str):
+    """
+    Registros NDJSON/SSE de /prediction/temporada-completa.
+    
+    Recorre los partidos con un cursor y los pronostica en bloques de
+    TAMANO_BLOQUE_STREAM con generar_pronosticos_lote, de modo que la
+    primera fila sale tras el primer bloque y la memoria no crece con la
+    temporada. Las filas salen en orden de fecha.
+    """
+    equipos = await stats_builder.obtener_todos_equipos(liga_id, season_id=season_id)
+    equipos_stats = {eq.nombre: eq for eq in equipos}
+    formas = await stats_builder.obtener_forma_reciente_todos(liga_id, season_id)
+    
+    total = 0
+    errores = 0
+    cursor = db.football_matches.find(
+        {"season_id": season_id},
+        {"_id": 0}
+    ).sort([("fecha", 1), ("ronda", 1)])
+    
+    async for bloque in _en_bloques(cursor, PredictionConfig.TAMANO_BLOQUE_STREAM):
+        pronosticos = await prediction_engine.generar_pronosticos_lote(
+            bloque, liga_id, season_id=season_id, formas=formas
+        )
+        for partido, pronostico in zip(bloque, pronosticos):
+            fila = _fila_temporada(partido, pronostico, equipos_stats)
+            total += 1
+            errores += "error" in fila
+            yield {"tipo": "partido", **fila}
+    
+    yield {
+        "tipo": "resumen",
+        "success": True,
+        "season_id": season_id,
+        "liga_id": liga_id,
+        "total_partidos": total,
+        "errores": errores
+    }
+
+
 @api_router.get("/prediction/temporada-completa")
-async def get_temporada_completa(season_id: str):
+async def get_temporada_completa(season_id: str, formato: str = "json"):
     """
     Genera pronósticos para TODOS los partidos de una temporada.
     Optimizado para cargar toda la temporada en una sola llamada.
     
     **Parámetros:**
     - `season_id`: ID de temporada (requerido)
+    - `formato`: `json` (default), `ndjson` o `sse`. En los dos últimos la
+      respuesta es un stream con un registro por partido (`tipo: "partido"`,
+      en orden de fecha) y un registro final `tipo: "resumen"`.
     
     **Retorna:**
     - Lista completa de partidos con pronósticos
@@ -909,6 +1477,12 @@ async def get_temporada_completa(season_id: str):
             raise HTTPException(status_code=400, detail="season_id inválido")
         
         liga_id = parts[0]
+        _validar_formato(formato)
+        
+        if formato != "json":
+            if not await db.football_matches.find_one({"season_id": season_id}, {"_id": 1}):
+                raise HTTPException(status_code=404, detail="No se encontraron partidos")
+            return _respuesta_stream(_stream_temporada_completa(liga_id, season_id), formato)
         
         # Obtener TODOS los partidos de la temporada
         partidos = await db.football_matches.find(
@@ -925,66 +1499,15 @@ async def get_temporada_completa(season_id: str):
         for eq in equipos:
             equipos_stats[eq.nombre] = eq
         
-        resultados = []
+        # Generar todos los pronósticos con consultas masivas
+        pronosticos = await prediction_engine.generar_pronosticos_lote(
+            partidos, liga_id, season_id=season_id
+        )
         
-        for partido in partidos:
-            try:
-                # Extraer número de jornada
-                jornada = partido.get("ronda", "")
-                jornada_num = int(jornada.replace("Regular Season - ", "")) if "Regular Season" in jornada else 0
-                
-                pronostico = await prediction_engine.generar_pronostico(
-                    equipo_local=partido["equipo_local"],
-                    equipo_visitante=partido["equipo_visitante"],
-                    liga_id=liga_id,
-                    season_id=season_id
-                )
-                
-                tc = pronostico.tiempo_completo
-                
-                # Stats de equipos
-                stats_local = equipos_stats.get(partido["equipo_local"])
-                stats_visita = equipos_stats.get(partido["equipo_visitante"])
-                
-                resultados.append({
-                    "jornada": jornada,
-                    "jornada_num": jornada_num,
-                    "fecha": partido.get("fecha"),
-                    "equipo_local": partido["equipo_local"],
-                    "equipo_visitante": partido["equipo_visitante"],
-                    "pronostico": tc.pronostico,
-                    "doble_oportunidad": tc.doble_oportunidad,
-                    "ambos_marcan": tc.ambos_marcan,
-                    "over_under": tc.over_under,
-                    "probabilidades": {
-                        "local": tc.probabilidades.porcentaje_local,
-                        "empate": tc.probabilidades.porcentaje_empate,
-                        "visita": tc.probabilidades.porcentaje_visita
-                    },
-                    "confianza": tc.confianza,
-                    "goles_esperados": tc.goles_esperados,
-                    "defensa_local": {
-                        "gc_total": stats_local.stats_completo.goles_contra if stats_local else 0,
-                        "promedio_gc": stats_local.stats_completo.promedio_gc if stats_local else 0
-                    },
-                    "defensa_visitante": {
-                        "gc_total": stats_visita.stats_completo.goles_contra if stats_visita else 0,
-                        "promedio_gc": stats_visita.stats_completo.promedio_gc if stats_visita else 0
-                    },
-                    "resultado_real": {
-                        "local": partido.get("goles_local_TR"),
-                        "visitante": partido.get("goles_visitante_TR")
-                    } if partido.get("estado_del_partido") == "Match Finished" else None
-                })
-            except Exception as e:
-                logging.warning(f"Error en partido {partido['equipo_local']} vs {partido['equipo_visitante']}: {e}")
-                resultados.append({
-                    "jornada": partido.get("ronda", ""),
-                    "jornada_num": 0,
-                    "equipo_local": partido["equipo_local"],
-                    "equipo_visitante": partido["equipo_visitante"],
-                    "error": str(e)
-                })
+        resultados = [
+            _fila_temporada(partido, pronostico, equipos_stats)
+            for partido, pronostico in zip(partidos, pronosticos)
+        ]
         
         # Ordenar por jornada
         resultados.sort(key=lambda x: (x.get("jornada_num", 0), x.get("fecha", "")))
@@ -1004,12 +1527,174 @@ async def get_temporada_completa(season_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+MERCADOS_APUESTAS = ("doble_oportunidad", "over_25", "over_15", "ambos_marcan", "favorito_claro")
+
+
+def _apuestas_partido(
+    partido: Dict[str, Any],
+    pronostico,
+    min_confianza: float
+) -> List[tuple]:
+    """
+    Apuestas (mercado, datos) que un pronóstico recomienda para un partido.
+    
+    Retorna una lista vacía si la confianza no llega a `min_confianza`.
+    """
+    tc = pronostico.tiempo_completo
+    confianza = tc.confianza or 0
+    
+    if confianza < min_confianza:
+        return []
+    
+    apuestas = []
+    base_info = {
+        "equipo_local": partido["equipo_local"],
+        "equipo_visitante": partido["equipo_visitante"],
+        "jornada": partido.get("ronda", ""),
+        "fecha": partido.get("fecha"),
+        "confianza": round(confianza, 1),
+        "resultado_real": f"{partido.get('goles_local_TR', '-')}-{partido.get('goles_visitante_TR', '-')}" if partido.get("estado_del_partido") == "Match Finished" else None
+    }
+    
+    # Doble oportunidad
+    if tc.doble_oportunidad:
+        apuestas.append(("doble_oportunidad", {
+            **base_info,
+            "apuesta": tc.doble_oportunidad,
+            "probabilidad": max(
+                tc.probabilidades.porcentaje_local + tc.probabilidades.porcentaje_empate if tc.doble_oportunidad == "1X" else 0,
+                tc.probabilidades.porcentaje_empate + tc.probabilidades.porcentaje_visita if tc.doble_oportunidad == "X2" else 0,
+                tc.probabilidades.porcentaje_local + tc.probabilidades.porcentaje_visita if tc.doble_oportunidad == "12" else 0
+            )
+        }))
+    
+    # Over 2.5
+    over_25 = tc.over_under.get("over_25", {}) if tc.over_under else {}
+    if over_25.get("prediccion") == "OVER":
+        apuestas.append(("over_25", {
+            **base_info,
+            "apuesta": "OVER 2.5",
+            "probabilidad": over_25.get("probabilidad", 0),
+            "goles_esperados": tc.goles_esperados
+        }))
+    
+    # Over 1.5
+    over_15 = tc.over_under.get("over_15", {}) if tc.over_under else {}
+    if over_15.get("prediccion") == "OVER" and over_15.get("probabilidad", 0) >= 70:
+        apuestas.append(("over_15", {
+            **base_info,
+            "apuesta": "OVER 1.5",
+            "probabilidad": over_15.get("probabilidad", 0),
+            "goles_esperados": tc.goles_esperados
+        }))
+    
+    # Ambos marcan
+    if tc.ambos_marcan == "SI":
+        apuestas.append(("ambos_marcan", {
+            **base_info,
+            "apuesta": "AMBOS MARCAN - SÍ",
+            "probabilidad": confianza
+        }))
+    
+    # Favorito claro (probabilidad > 60%)
+    prob_max = max(tc.probabilidades.porcentaje_local, tc.probabilidades.porcentaje_visita)
+    if prob_max >= 55:
+        favorito = partido["equipo_local"] if tc.probabilidades.porcentaje_local > tc.probabilidades.porcentaje_visita else partido["equipo_visitante"]
+        apuestas.append(("favorito_claro", {
+            **base_info,
+            "apuesta": f"GANA {favorito}",
+            "probabilidad": prob_max,
+            "pronostico": tc.pronostico
+        }))
+    
+    return apuestas
+
+
+def _prioridad_apuesta(apuesta: Dict[str, Any]) -> float:
+    """Clave de ordenación de las mejores apuestas."""
+    return apuesta.get("probabilidad", apuesta.get("confianza", 0))
+
+
+async def _pronosticar_partidos(partidos: List[Dict[str, Any]], liga_id: str, season_id: str, formas):
+    """Pronósticos de varios partidos con concurrencia acotada (ver _ejecutar_acotado)."""
+    async def pronosticar(partido):
+        return await prediction_engine.generar_pronostico(
+            equipo_local=partido["equipo_local"],
+            equipo_visitante=partido["equipo_visitante"],
+            liga_id=liga_id,
+            season_id=season_id,
+            forma_local=formas.get(partido["equipo_local"]),
+            forma_visitante=formas.get(partido["equipo_visitante"])
+        )
+    
+    return await _ejecutar_acotado(partidos, pronosticar)
+
+
+async def _stream_mejores_apuestas(
+    liga_id: str,
+    season_id: str,
+    query: Dict[str, Any],
+    jornada: Optional[str],
+    min_confianza: float,
+    limite: int
+):
+    """
+    Registros NDJSON/SSE de /prediction/mejores-apuestas.
+    
+    Emite cada apuesta (`tipo: "apuesta"`) en cuanto se pronostica su
+    bloque de partidos y termina con un `tipo: "resumen"` que contiene el
+    mismo ranking por mercado que la respuesta JSON. Para el ranking solo
+    se retienen las `limite` mejores de cada mercado (heap acotado).
+    """
+    formas = await stats_builder.obtener_forma_reciente_todos(liga_id, season_id)
+    
+    # Por mercado: heap de (prioridad, -orden, apuesta) con las `limite` mejores
+    mejores = {mercado: [] for mercado in MERCADOS_APUESTAS}
+    encontradas = 0
+    analizados = 0
+    orden = 0
+    
+    cursor = db.football_matches.find(query, {"_id": 0})
+    async for bloque in _en_bloques(cursor, PredictionConfig.CONCURRENCIA_PRONOSTICOS):
+        pronosticos = await _pronosticar_partidos(bloque, liga_id, season_id, formas)
+        for partido, pronostico in zip(bloque, pronosticos):
+            analizados += 1
+            if isinstance(pronostico, Exception):
+                logging.warning(f"Error procesando {partido['equipo_local']} vs {partido['equipo_visitante']}: {pronostico}")
+                continue
+            for mercado, apuesta in _apuestas_partido(partido, pronostico, min_confianza):
+                encontradas += 1
+                orden += 1
+                heapq.heappush(mejores[mercado], (_prioridad_apuesta(apuesta), -orden, apuesta))
+                if len(mejores[mercado]) > max(limite, 0):
+                    heapq.heappop(mejores[mercado])
+                yield {"tipo": "apuesta", "mercado": mercado, **apuesta}
+    
+    todas_apuestas = {
+        mercado: [apuesta for _, _, apuesta in sorted(heap, key=lambda x: x[:2], reverse=True)]
+        for mercado, heap in mejores.items()
+    }
+    
+    yield {
+        "tipo": "resumen",
+        "success": True,
+        "season_id": season_id,
+        "jornada": jornada or "Todas",
+        "min_confianza": min_confianza,
+        "total_partidos_analizados": analizados,
+        "total_apuestas_encontradas": sum(len(v) for v in todas_apuestas.values()),
+        "total_apuestas_emitidas": encontradas,
+        "apuestas": todas_apuestas
+    }
+
+
 @api_router.get("/prediction/mejores-apuestas")
 async def get_mejores_apuestas(
     season_id: str,
     jornada: Optional[str] = None,
     min_confianza: float = 60.0,
-    limite: int = 20
+    limite: int = 20,
+    formato: str = "json"
 ):
     """
     Obtiene las mejores apuestas ordenadas por confianza.
@@ -1019,6 +1704,9 @@ async def get_mejores_apuestas(
     - `jornada`: Filtrar por jornada específica (opcional, si no se especifica analiza todas)
     - `min_confianza`: Confianza mínima para incluir (default: 60%)
     - `limite`: Máximo de apuestas a retornar por categoría (default: 20)
+    - `formato`: `json` (default), `ndjson` o `sse`. En los dos últimos la
+      respuesta es un stream con cada apuesta encontrada (`tipo: "apuesta"`)
+      y un registro final `tipo: "resumen"` con el ranking por mercado.
     
     **Retorna:**
     - Mejores apuestas separadas por mercado
@@ -1029,100 +1717,40 @@ async def get_mejores_apuestas(
             raise HTTPException(status_code=400, detail="season_id inválido")
         
         liga_id = parts[0]
+        _validar_formato(formato)
         
         # Query de partidos
         query = {"season_id": season_id}
         if jornada:
             query["ronda"] = jornada
         
+        if formato != "json":
+            return _respuesta_stream(
+                _stream_mejores_apuestas(liga_id, season_id, query, jornada, min_confianza, limite),
+                formato
+            )
+        
         partidos = await db.football_matches.find(query, {"_id": 0}).to_list(500)
         
         if not partidos:
             return {"success": True, "mensaje": "No hay partidos para analizar", "apuestas": {}}
         
         # Generar pronósticos para todos los partidos
-        todas_apuestas = {
-            "doble_oportunidad": [],
-            "over_25": [],
-            "over_15": [],
-            "ambos_marcan": [],
-            "favorito_claro": []
-        }
+        todas_apuestas = {mercado: [] for mercado in MERCADOS_APUESTAS}
+        
+        # Forma reciente de todos los equipos (una sola consulta)
+        formas = await stats_builder.obtener_forma_reciente_todos(liga_id, season_id)
+        
+        # Pronósticos en paralelo (concurrencia acotada, orden conservado)
+        pronosticos = await _pronosticar_partidos(partidos, liga_id, season_id, formas)
         
-        for partido in partidos:
+        for partido, pronostico in zip(partidos, pronosticos):
             try:
-                pronostico = await prediction_engine.generar_pronostico(
-                    equipo_local=partido["equipo_local"],
-                    equipo_visitante=partido["equipo_visitante"],
-                    liga_id=liga_id,
-                    season_id=season_id
-                )
+                if isinstance(pronostico, Exception):
+                    raise pronostico
                 
-                tc = pronostico.tiempo_completo
-                confianza = tc.confianza or 0
-                
-                if confianza < min_confianza:
-                    continue
-                
-                base_info = {
-                    "equipo_local": partido["equipo_local"],
-                    "equipo_visitante": partido["equipo_visitante"],
-                    "jornada": partido.get("ronda", ""),
-                    "fecha": partido.get("fecha"),
-                    "confianza": round(confianza, 1),
-                    "resultado_real": f"{partido.get('goles_local_TR', '-')}-{partido.get('goles_visitante_TR', '-')}" if partido.get("estado_del_partido") == "Match Finished" else None
-                }
-                
-                # Doble oportunidad
-                if tc.doble_oportunidad:
-                    todas_apuestas["doble_oportunidad"].append({
-                        **base_info,
-                        "apuesta": tc.doble_oportunidad,
-                        "probabilidad": max(
-                            tc.probabilidades.porcentaje_local + tc.probabilidades.porcentaje_empate if tc.doble_oportunidad == "1X" else 0,
-                            tc.probabilidades.porcentaje_empate + tc.probabilidades.porcentaje_visita if tc.doble_oportunidad == "X2" else 0,
-                            tc.probabilidades.porcentaje_local + tc.probabilidades.porcentaje_visita if tc.doble_oportunidad == "12" else 0
-                        )
-                    })
-                
-                # Over 2.5
-                over_25 = tc.over_under.get("over_25", {}) if tc.over_under else {}
-                if over_25.get("prediccion") == "OVER":
-                    todas_apuestas["over_25"].append({
-                        **base_info,
-                        "apuesta": "OVER 2.5",
-                        "probabilidad": over_25.get("probabilidad", 0),
-                        "goles_esperados": tc.goles_esperados
-                    })
-                
-                # Over 1.5
-                over_15 = tc.over_under.get("over_15", {}) if tc.over_under else {}
-                if over_15.get("prediccion") == "OVER" and over_15.get("probabilidad", 0) >= 70:
-                    todas_apuestas["over_15"].append({
-                        **base_info,
-                        "apuesta": "OVER 1.5",
-                        "probabilidad": over_15.get("probabilidad", 0),
-                        "goles_esperados": tc.goles_esperados
-                    })
-                
-                # Ambos marcan
-                if tc.ambos_marcan == "SI":
-                    todas_apuestas["ambos_marcan"].append({
-                        **base_info,
-                        "apuesta": "AMBOS MARCAN - SÍ",
-                        "probabilidad": confianza
-                    })
-                
-                # Favorito claro (probabilidad > 60%)
-                prob_max = max(tc.probabilidades.porcentaje_local, tc.probabilidades.porcentaje_visita)
-                if prob_max >= 55:
-                    favorito = partido["equipo_local"] if tc.probabilidades.porcentaje_local > tc.probabilidades.porcentaje_visita else partido["equipo_visitante"]
-                    todas_apuestas["favorito_claro"].append({
-                        **base_info,
-                        "apuesta": f"GANA {favorito}",
-                        "probabilidad": prob_max,
-                        "pronostico": tc.pronostico
-                    })
+                for mercado, apuesta in _apuestas_partido(partido, pronostico, min_confianza):
+                    todas_apuestas[mercado].append(apuesta)
                     
             except Exception as e:
                 logging.warning(f"Error procesando {partido['equipo_local']} vs {partido['equipo_visitante']}: {e}")
@@ -1132,7 +1760,7 @@ async def get_mejores_apuestas(
         for mercado in todas_apuestas:
             todas_apuestas[mercado] = sorted(
                 todas_apuestas[mercado],
-                key=lambda x: x.get("probabilidad", x.get("confianza", 0)),
+                key=_prioridad_apuesta,
                 reverse=True
             )[:limite]
         
@@ -1320,6 +1948,41 @@ async def get_prediction_config():
     }
 
 
+@api_router.get("/prediction/cache")
+async def get_prediction_cache():
+    """
+    Estado de la cache compartida de estadísticas de equipos y del memo
+    de pronósticos.
+    
+    **Retorna:**
+    - Entradas actuales y capacidad
+    - Aciertos, fallos y tasa de aciertos
+    - Expulsiones LRU e invalidaciones por reconstrucción
+    """
+    return {
+        "success": True,
+        "equipos": stats_builder.cache.estadisticas(),
+        "pronosticos": prediction_engine.estadisticas_memo()
+    }
+
+
+@api_router.get("/prediction/indices")
+async def get_prediction_indices():
+    """
+    Autochequeo de índices: explain() de las consultas de cada pronóstico.
+    
+    **Retorna:**
+    - ok: False si alguna consulta crítica recorre la colección (COLLSCAN)
+    - collscan: Consultas sin índice
+    - consultas: Etapas del plan e índices usados por cada consulta
+    """
+    try:
+        return {"success": True, **await verificar_indices(db)}
+    except Exception as e:
+        logger.error(f"Error verificando índices: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @api_router.get("/prediction/backtesting")
 async def run_backtesting(
     season_id: Optional[str] = None,
@@ -1355,6 +2018,47 @@ async def run_backtesting(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@api_router.get("/prediction/backtesting/walk-forward")
+async def run_backtesting_walk_forward(
+    season_ids: Optional[str] = None,
+    liga_ids: Optional[str] = None,
+    procesos: Optional[int] = None,
+    usar_historico: bool = True
+):
+    """
+    Ejecuta backtesting walk-forward de varias temporadas.
+    
+    Cada temporada se reproduce en memoria en orden cronológico: los
+    partidos de cada fecha se pronostican solo con datos anteriores y
+    después actualizan las estadísticas. Las temporadas se reparten en un
+    pool de procesos y no se guardan pronósticos.
+    
+    **Parámetros:**
+    - `season_ids`: Temporadas separadas por comas (opcional)
+    - `liga_ids`: Ligas separadas por comas, todas sus temporadas (opcional)
+    - `procesos`: Procesos del pool (opcional)
+    - `usar_historico`: Aplicar H2H y temporadas anteriores (default: true)
+    
+    **Retorna:**
+    - Métricas globales (como /prediction/backtesting)
+    - Métricas por temporada y por jornada
+    """
+    try:
+        resultados = await backtesting_engine.ejecutar_walk_forward(
+            season_ids=[s.strip() for s in season_ids.split(",") if s.strip()] if season_ids else None,
+            liga_ids=[l.strip() for l in liga_ids.split(",") if l.strip()] if liga_ids else None,
+            procesos=procesos,
+            usar_historico=usar_historico
+        )
+        return {
+            "success": True,
+            "backtesting": resultados
+        }
+    except Exception as e:
+        logging.error(f"Error en backtesting walk-forward: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @api_router.get("/prediction/teams")
 async def list_teams(
     liga_id: Optional[str] = None,
@@ -1585,4 +2289,7 @@ app.add_middleware(
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if worker_trabajos:
+        # Devuelve a la cola los trabajos en curso para que otro proceso los retome
+        await worker_trabajos.detener()
     client.close()
\ No newline at end of file
@@ -4,64 +4,269 @@ Script para importar datos del Motor PLLA 3.0 a MongoDB local.
 
 Uso:
     python import_data.py
+    python import_data.py --format parquet --dir snapshot/
 
 Requisitos:
     - MongoDB corriendo localmente en localhost:27017
     - pip install pymongo
-    
-Los archivos JSON deben estar en la misma carpeta:
-    - football_matches.json
-    - team_statistics.json
-    - seasons.json
+    - pip install pyarrow (solo para importar snapshots Parquet)
+
+Los archivos deben estar en la misma carpeta (o en --dir), en JSON o en
+Parquet (generados con `python -m api_football.export_data --format parquet
+--collection all --output <dir>`):
+    - football_matches.json / football_matches.parquet
+    - team_statistics.json / team_statistics.parquet
+    - seasons.json / seasons.parquet
+
+Cada colección se carga en streaming (sin leer el archivo completo) en una
+colección de staging, se indexa y se intercambia con la actual mediante
+renameCollection: las lecturas nunca ven la colección vacía ni a medias, y
+si algo falla la colección actual queda intacta. Tras importar los partidos
+se reconstruye el índice H2H por pareja (h2h_pares). Si cambian los partidos
+o las estadísticas se vacían las colecciones derivadas de ellos (ver
+DERIVED_COLLECTIONS, conservando sus índices); el backend las reconstruye al
+recalcular cada temporada. Si el backend está corriendo hay que reiniciarlo:
+sus caches en memoria siguen sirviendo los datos anteriores a la importación.
 """
 
+import argparse
 import json
 import os
+import sys
+import time
 from pymongo import MongoClient
-from datetime import datetime
+from datetime import datetime, date, timezone
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # Opcional: solo para snapshots Parquet
+    pq = None
+
+# Índices de cada colección: los mismos que crea el backend
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from prediction_engine.config import Config
+from prediction_engine.indices import crear_indices_coleccion_sync
+from prediction_engine.h2h_pares import actualizar_h2h_sync
 
 # Configuración
 MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
 DB_NAME = os.environ.get('DB_NAME', 'test_database')
 
-def parse_dates(obj):
-    """Convierte strings ISO a datetime."""
-    if isinstance(obj, dict):
-        for key, value in obj.items():
-            if isinstance(value, str) and 'T' in value and len(value) > 18:
+# Colecciones a importar, en orden
+COLLECTIONS = ['football_matches', 'team_statistics', 'seasons']
+
+# Colecciones calculadas a partir de partidos y estadísticas: tras importar
+# describen datos que ya no existen. Sin marca de agua, StatsBuilder hace una
+# reconstrucción completa de la temporada (estadísticas, snapshots y
+# clasificaciones); el histórico por equipo se recalcula al leerlo
+DERIVED_COLLECTIONS = [
+    Config.COLECCION_WATERMARKS,
+    Config.COLECCION_HISTORICO,
+    Config.COLECCION_SNAPSHOTS,
+    Config.COLECCION_CLASIFICACIONES,
+    Config.COLECCION_MEMO,
+]
+
+# Documentos por insert_many
+BATCH_SIZE = 1000
+
+# Bytes leídos por iteración del parser JSON incremental
+READ_CHUNK_SIZE = 1 << 16
+
+# Campos de fecha-hora de cada colección (texto ISO -> datetime). El resto
+# de fechas, como 'fecha' (YYYY-MM-DD), se guardan como texto
+DATETIME_FIELDS = {
+    'football_matches': ('created_at', 'updated_at'),
+    'team_statistics': ('created_at', 'updated_at'),
+    'seasons': ('created_at', 'updated_at'),
+}
+
+# Metadato de columna Parquet que marca fechas guardadas como texto
+# YYYY-MM-DD (ver api_football/export_data.py)
+PARQUET_TYPE_KEY = b'mongo_tipo'
+PARQUET_DATE_STRING = b'fecha_texto'
+
+def iter_json_array(filename):
+    """Recorre un archivo JSON con un array de documentos sin cargarlo entero.
+    
+    Lee bloques de READ_CHUNK_SIZE y decodifica cada documento en cuanto
+    está completo (json.JSONDecoder.raw_decode).
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    
+    with open(filename, 'r', encoding='utf-8') as f:
+        while True:
+            chunk = f.read(READ_CHUNK_SIZE)
+            buffer = buffer[position:] + chunk
+            position = 0
+            
+            while True:
+                # Saltar espacios y separadores
+                while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                    position += 1
+                if position >= len(buffer):
+                    break
+                
+                if not started:
+                    if buffer[position] != '[':
+                        raise ValueError(f"{filename}: se esperaba un array JSON")
+                    started = True
+                    position += 1
+                    continue
+                
+                if buffer[position] == ']':
+                    return
+                
                 try:
-                    obj[key] = datetime.fromisoformat(value.replace('Z', '+00:00'))
-                except:
-                    pass
-            elif isinstance(value, (dict, list)):
-                parse_dates(value)
-    elif isinstance(obj, list):
-        for item in obj:
-            parse_dates(item)
-    return obj
+                    document, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if not chunk:
+                        raise
+                    break  # Documento incompleto: leer más
+                
+                yield document
+                position = end
+            
+            if not chunk:
+                if started:
+                    raise ValueError(f"{filename}: array JSON sin cerrar")
+                return
+
+def parse_datetime(value):
+    """Texto ISO -> datetime naive en UTC (como los guarda pymongo)."""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def convert_dates(doc, datetime_fields):
+    """Convierte a datetime los campos de fecha-hora del esquema."""
+    for field in datetime_fields:
+        value = doc.get(field)
+        if isinstance(value, str):
+            doc[field] = parse_datetime(value)
+    return doc
+
+def insert_in_batches(collection, documents):
+    """Inserta documentos con insert_many en bloques de BATCH_SIZE."""
+    count = 0
+    batch = []
+    for doc in documents:
+        batch.append(doc)
+        if len(batch) >= BATCH_SIZE:
+            collection.insert_many(batch, ordered=False)
+            count += len(batch)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+        count += len(batch)
+    return count
+
+def create_indexes(collection, collection_name):
+    """Crea los índices de una colección (se usa sobre la de staging)."""
+    crear_indices_coleccion_sync(collection, collection_name)
+
+def load_collection(db, collection_name, documents):
+    """Carga documentos en staging, indexa e intercambia con la colección.
+    
+    Returns:
+        Número de documentos importados
+    """
+    staging_name = f"{collection_name}__import"
+    staging = db[staging_name]
+    staging.drop()
+    
+    try:
+        count = insert_in_batches(staging, documents)
+        if not count:
+            staging.drop()
+            return 0
+        
+        create_indexes(staging, collection_name)
+        
+        # Intercambio atómico: la colección anterior se descarta
+        staging.rename(collection_name, dropTarget=True)
+        return count
+    
+    except Exception:
+        staging.drop()
+        raise
 
 def import_collection(db, collection_name, filename):
-    """Importa una colección desde archivo JSON."""
+    """Importa una colección desde archivo JSON (en streaming)."""
     if not os.path.exists(filename):
         print(f"  ⚠️  Archivo no encontrado: {filename}")
         return 0
     
-    with open(filename, 'r') as f:
-        data = json.load(f)
+    datetime_fields = DATETIME_FIELDS.get(collection_name, ())
+    documents = (convert_dates(doc, datetime_fields) for doc in iter_json_array(filename))
+    return load_collection(db, collection_name, documents)
+
+def restore_document(row, date_string_fields):
+    """Fila de Parquet -> documento MongoDB.
     
-    # Parsear fechas
-    data = parse_dates(data)
+    Las columnas nulas se omiten (el campo no existía en el documento) y
+    las fechas marcadas como texto vuelven a 'YYYY-MM-DD'. Los timestamps
+    ya llegan como datetime.
+    """
+    doc = {}
+    for key, value in row.items():
+        if value is None:
+            continue
+        if isinstance(value, dict):
+            value = {k: v for k, v in value.items() if v is not None}
+        elif key in date_string_fields and isinstance(value, date):
+            value = value.isoformat()
+        doc[key] = value
+    return doc
+
+def import_parquet_collection(db, collection_name, filename):
+    """Importa una colección desde un archivo Parquet, por bloques."""
+    if not os.path.exists(filename):
+        print(f"  ⚠️  Archivo no encontrado: {filename}")
+        return 0
     
-    # Limpiar colección existente
-    db[collection_name].delete_many({})
+    parquet_file = pq.ParquetFile(filename)
+    date_string_fields = {
+        field.name for field in parquet_file.schema_arrow
+        if field.metadata and field.metadata.get(PARQUET_TYPE_KEY) == PARQUET_DATE_STRING
+    }
     
-    # Insertar datos
-    if data:
-        db[collection_name].insert_many(data)
+    # Insertar por bloques: nunca se carga el archivo completo
+    documents = (
+        restore_document(row, date_string_fields)
+        for batch in parquet_file.iter_batches(batch_size=BATCH_SIZE)
+        for row in batch.to_pylist()
+    )
+    return load_collection(db, collection_name, documents)
+
+def resolve_source(collection_name, data_format, directory):
+    """Elige el archivo a importar: Parquet si se pide o si existe (auto)."""
+    parquet_file = os.path.join(directory, f"{collection_name}.parquet")
+    json_file = os.path.join(directory, f"{collection_name}.json")
     
-    return len(data)
+    if data_format == 'parquet' or (data_format == 'auto' and pq is not None and os.path.exists(parquet_file)):
+        return 'parquet', parquet_file
+    return 'json', json_file
 
 def main():
+    parser = argparse.ArgumentParser(description='Importa los datos del Motor PLLA 3.0 a MongoDB')
+    parser.add_argument(
+        '--format',
+        choices=['auto', 'json', 'parquet'],
+        default='auto',
+        help='Formato de los archivos (auto = Parquet si existe, si no JSON)'
+    )
+    parser.add_argument('--dir', default='.', help='Carpeta con los archivos a importar')
+    args = parser.parse_args()
+    
+    if args.format == 'parquet' and pq is None:
+        print("❌ pyarrow no está instalado: pip install pyarrow")
+        return
+    
     print("=" * 50)
     print("  IMPORTADOR DE DATOS - Motor PLLA 3.0")
     print("=" * 50)
@@ -75,7 +280,7 @@ def main():
         # Verificar conexión
         client.admin.command('ping')
         print("✅ Conexión exitosa a MongoDB\n")
-        
+    
     except Exception as e:
         print(f"❌ Error conectando a MongoDB: {e}")
         print("\nAsegúrate de que MongoDB esté corriendo:")
@@ -84,26 +289,37 @@ def main():
         print("  - Linux: sudo systemctl start mongod")
         return
     
-    # Importar colecciones
+    # Importar colecciones (cada una se indexa antes de entrar en servicio)
     print("Importando datos...")
     
-    count = import_collection(db, 'football_matches', 'football_matches.json')
-    print(f"  ✅ football_matches: {count} documentos")
-    
-    count = import_collection(db, 'team_statistics', 'team_statistics.json')
-    print(f"  ✅ team_statistics: {count} documentos")
-    
-    count = import_collection(db, 'seasons', 'seasons.json')
-    print(f"  ✅ seasons: {count} documentos")
+    imported = set()
+    for collection_name in COLLECTIONS:
+        source_format, filename = resolve_source(collection_name, args.format, args.dir)
+        start = time.perf_counter()
+        try:
+            if source_format == 'parquet':
+                count = import_parquet_collection(db, collection_name, filename)
+            else:
+                count = import_collection(db, collection_name, filename)
+        except Exception as e:
+            print(f"  ❌ {collection_name}: {e} (se conserva la colección actual)")
+            continue
+        print(f"  ✅ {collection_name}: {count} documentos ({source_format}, {time.perf_counter() - start:.2f}s)")
+        if count:
+            imported.add(collection_name)
+        
+        if collection_name == 'football_matches' and count:
+            start = time.perf_counter()
+            pairs = actualizar_h2h_sync(db)
+            print(f"  ✅ h2h_pares: {pairs} parejas ({time.perf_counter() - start:.2f}s)")
     
-    # Crear índices
-    print("\nCreando índices...")
-    db.football_matches.create_index([("liga_id", 1), ("season_id", 1)])
-    db.football_matches.create_index([("equipo_local", 1)])
-    db.football_matches.create_index([("equipo_visitante", 1)])
-    db.team_statistics.create_index([("liga_id", 1), ("season_id", 1)])
-    db.seasons.create_index([("season_id", 1)], unique=True)
-    print("  ✅ Índices creados")
+    if imported & {'football_matches', 'team_statistics'}:
+        # delete_many y no drop: se conservan los índices (ej: el único de
+        # pronosticos_memo, del que depende el upsert del memo)
+        for collection_name in DERIVED_COLLECTIONS:
+            db[collection_name].delete_many({})
+        print(f"  🧹 Vaciadas colecciones derivadas (se reconstruyen al recalcular estadísticas): {', '.join(DERIVED_COLLECTIONS)}")
+        print("  ⚠️  Si el backend está corriendo, reinícialo: sus caches en memoria conservan los datos anteriores")
     
     print("\n" + "=" * 50)
     print("  ¡IMPORTACIÓN COMPLETADA!")
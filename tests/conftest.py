@@ -0,0 +1,104 @@
+"""
+Fixtures de las pruebas del motor de pronósticos.
+
+Usan mongomock-motor (MongoDB en memoria con la API de motor) y una liga
+sintética de ida y vuelta, de modo que no hace falta un MongoDB real.
+"""
+
+import os
+import random
+import sys
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "backend"))
+
+from prediction_engine.cache_estadisticas import _CACHES  # noqa: E402
+
+EQUIPOS = ["Alba", "Boreal", "Cierzo", "Delta", "Ebro", "Faro"]
+
+# Campos que cambian en cada escritura (no comparables entre bases)
+CAMPOS_VOLATILES = {"_id", "id", "created_at", "updated_at", "fecha_generacion"}
+
+
+def temporada_sintetica(
+    liga_id: str,
+    anio: int,
+    equipos: List[str] = EQUIPOS,
+    semilla: int = 1,
+    rondas_extra: Optional[List[str]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Partidos terminados de una temporada de ida y vuelta (método del círculo).
+
+    Las jornadas son semanales desde el 1 de agosto de `anio`. Cada ronda de
+    `rondas_extra` (ej: "Play-offs", sin número de jornada) añade un partido
+    después de la temporada regular.
+    """
+    rng = random.Random(semilla)
+    season_id = f"{liga_id}_{anio}-{(anio + 1) % 100:02d}"
+    rotacion = list(equipos)
+    cruces = []
+    for _ in range(len(equipos) - 1):
+        mitad = len(rotacion) // 2
+        cruces.append(list(zip(rotacion[:mitad], reversed(rotacion[mitad:]))))
+        rotacion = [rotacion[0], rotacion[-1]] + rotacion[1:-1]
+    cruces += [[(b, a) for a, b in jornada] for jornada in cruces]
+
+    calendario = [
+        (f"Regular Season - {numero}", pares)
+        for numero, pares in enumerate(cruces, start=1)
+    ]
+    calendario += [(ronda, [(equipos[0], equipos[1])]) for ronda in rondas_extra or []]
+
+    partidos = []
+    for semana, (ronda, pares) in enumerate(calendario):
+        fecha = (date(anio, 8, 1) + timedelta(weeks=semana)).isoformat()
+        for local, visitante in pares:
+            goles_local, goles_visitante = rng.randint(0, 4), rng.randint(0, 3)
+            match_id = f"{season_id}_{semana + 1}_{local[:3].upper()}-{visitante[:3].upper()}"
+            partidos.append({
+                "match_id": match_id,
+                "id_partido": match_id,
+                "liga_id": liga_id,
+                "season_id": season_id,
+                "season": anio,
+                "ronda": ronda,
+                "fecha": fecha,
+                "equipo_local": local,
+                "equipo_visitante": visitante,
+                "goles_local_TR": goles_local,
+                "goles_visitante_TR": goles_visitante,
+                "goles_local_1MT": rng.randint(0, goles_local),
+                "goles_visitante_1MT": rng.randint(0, goles_visitante),
+                "estado_del_partido": "Match Finished",
+            })
+    return partidos
+
+
+async def volcar(db, coleccion: str, clave: List[str]) -> Dict[tuple, Dict[str, Any]]:
+    """
+    Documentos de una colección indexados por `clave`, sin campos volátiles.
+    """
+    docs = {}
+    async for doc in db[coleccion].find({}):
+        docs[tuple(doc.get(campo) for campo in clave)] = {
+            k: v for k, v in doc.items() if k not in CAMPOS_VOLATILES
+        }
+    return docs
+
+
+def nueva_db():
+    """Base de datos en memoria vacía."""
+    return AsyncMongoMockClient()["plla_test"]
+
+
+@pytest.fixture
+def db():
+    """Base de datos en memoria vacía, con la cache compartida de equipos limpia."""
+    _CACHES.clear()
+    yield nueva_db()
+    _CACHES.clear()
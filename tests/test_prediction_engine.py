@@ -0,0 +1,99 @@
+"""
+Pruebas de PredictionEngine: memo de pronósticos y paridad entre el
+cálculo por lote y el cálculo partido a partido.
+"""
+
+import asyncio
+
+from prediction_engine import PredictionEngine, StatsBuilder
+from prediction_engine.cache_estadisticas import CacheEstadisticas
+from prediction_engine.config import Config
+
+from .conftest import CAMPOS_VOLATILES, temporada_sintetica
+
+LIGA = "LIGA_TEST"
+SEASON_ID = "LIGA_TEST_2023-24"
+
+
+async def _preparar(db, partidos):
+    await db[Config.COLECCION_PARTIDOS].insert_many([dict(p) for p in partidos])
+    engine = PredictionEngine(db)
+    await engine.stats_builder.construir_estadisticas(LIGA, season_id=SEASON_ID)
+    return engine
+
+
+def _comparable(pronostico):
+    return pronostico.model_dump(exclude=CAMPOS_VOLATILES)
+
+
+def test_memo_invalidado_tras_guardar_watermark(db):
+    partidos = temporada_sintetica(LIGA, 2023)
+    partido = partidos[0]
+    args = (partido["equipo_local"], partido["equipo_visitante"], LIGA)
+
+    async def caso():
+        engine = await _preparar(db, partidos)
+        primero = await engine.generar_pronostico(*args, season_id=SEASON_ID, partido_id=partido["match_id"])
+        assert await db[Config.COLECCION_MEMO].count_documents({"liga_id": LIGA}) == 1
+
+        # Servido desde memo (también desde otra instancia, vía MongoDB)
+        otra = PredictionEngine(db)
+        repetido = await otra.generar_pronostico(*args, season_id=SEASON_ID, partido_id=partido["match_id"])
+        assert repetido.id == primero.id
+
+        await engine.stats_builder._guardar_watermark(LIGA, SEASON_ID, [])
+        assert await db[Config.COLECCION_MEMO].count_documents({"liga_id": LIGA}) == 0
+
+        nuevo = await otra.generar_pronostico(*args, season_id=SEASON_ID, partido_id=partido["match_id"])
+        assert nuevo.id != primero.id
+        assert _comparable(nuevo) == _comparable(primero)
+
+    asyncio.run(caso())
+
+
+def test_memo_no_usa_cache_de_otro_proceso_desactualizada(db):
+    partidos = temporada_sintetica(LIGA, 2023)
+    corte = sorted({p["fecha"] for p in partidos})[5]
+    partido = partidos[0]
+    args = (partido["equipo_local"], partido["equipo_visitante"], LIGA)
+
+    async def caso():
+        engine = await _preparar(db, [p for p in partidos if p["fecha"] < corte])
+        await engine.generar_pronostico(*args, season_id=SEASON_ID)
+
+        # Otro proceso (con su propia cache) aplica los partidos nuevos
+        await db[Config.COLECCION_PARTIDOS].insert_many([dict(p) for p in partidos if p["fecha"] >= corte])
+        otro_proceso = StatsBuilder(db)
+        otro_proceso.cache = CacheEstadisticas()
+        await otro_proceso.actualizar_estadisticas(LIGA, season_id=SEASON_ID)
+
+        servido = await engine.generar_pronostico(*args, season_id=SEASON_ID)
+        referencia = PredictionEngine(db)
+        referencia.stats_builder.cache = CacheEstadisticas()
+        esperado = await referencia.generar_pronostico(*args, season_id=SEASON_ID, usar_memo=False)
+        assert _comparable(servido) == _comparable(esperado)
+
+    asyncio.run(caso())
+
+
+def test_lote_igual_a_pronostico_individual(db):
+    partidos = temporada_sintetica(LIGA, 2023)
+    jornada = [p for p in partidos if p["ronda"] == "Regular Season - 10"]
+
+    async def caso():
+        engine = await _preparar(db, partidos)
+        lote = await engine.generar_pronosticos_lote(jornada, LIGA, season_id=SEASON_ID)
+        assert len(lote) == len(jornada)
+
+        for partido, pronostico in zip(jornada, lote):
+            individual = await engine.generar_pronostico(
+                partido["equipo_local"], partido["equipo_visitante"], LIGA,
+                season_id=SEASON_ID, partido_id=partido["match_id"], usar_memo=False
+            )
+            assert _comparable(pronostico) == _comparable(individual)
+
+        # La segunda llamada se sirve completa desde el memo
+        repetido = await engine.generar_pronosticos_lote(jornada, LIGA, season_id=SEASON_ID)
+        assert [p.id for p in repetido] == [p.id for p in lote]
+
+    asyncio.run(caso())
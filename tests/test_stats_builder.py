@@ -0,0 +1,142 @@
+"""
+Pruebas de StatsBuilder: actualización incremental frente a reconstrucción
+completa y construcciones concurrentes con un mismo builder.
+"""
+
+import asyncio
+
+from prediction_engine import StatsBuilder
+from prediction_engine.config import Config
+
+from .conftest import nueva_db, temporada_sintetica, volcar
+
+LIGA = "LIGA_TEST"
+SEASON_ID = "LIGA_TEST_2023-24"
+
+
+async def _estado(db):
+    """Estadísticas, snapshots y clasificaciones guardadas."""
+    return (
+        await volcar(db, Config.COLECCION_ESTADISTICAS, ["season_id", "nombre"]),
+        await volcar(db, Config.COLECCION_SNAPSHOTS, ["season_id", "nombre"]),
+        await volcar(db, Config.COLECCION_CLASIFICACIONES, ["season_id", "tipo_tiempo", "jornada"]),
+    )
+
+
+async def _reconstruccion_completa(partidos):
+    db = nueva_db()
+    await db[Config.COLECCION_PARTIDOS].insert_many([dict(p) for p in partidos])
+    await StatsBuilder(db).construir_estadisticas(LIGA, season_id=SEASON_ID)
+    return await _estado(db)
+
+
+async def _incremental(db, partidos, cortes):
+    """Construye con los partidos anteriores al primer corte y aplica el resto por tramos."""
+    builder = StatsBuilder(db)
+    tramos = [p for p in partidos if p["fecha"] < cortes[0]]
+    await db[Config.COLECCION_PARTIDOS].insert_many([dict(p) for p in tramos])
+    await builder.construir_estadisticas(LIGA, season_id=SEASON_ID)
+
+    for desde, hasta in zip(cortes, cortes[1:] + ["9999"]):
+        tramo = [dict(p) for p in partidos if desde <= p["fecha"] < hasta]
+        await db[Config.COLECCION_PARTIDOS].insert_many(tramo)
+        equipos = await builder.actualizar_estadisticas(LIGA, season_id=SEASON_ID)
+        assert len(equipos) == len({p["equipo_local"] for p in tramo} | {p["equipo_visitante"] for p in tramo})
+    return await _estado(db)
+
+
+def test_incremental_igual_a_reconstruccion_completa(db):
+    partidos = temporada_sintetica(LIGA, 2023)
+    fechas = sorted({p["fecha"] for p in partidos})
+
+    async def caso():
+        incremental = await _incremental(db, partidos, [fechas[4], fechas[7]])
+        completa = await _reconstruccion_completa(partidos)
+        assert incremental == completa
+
+        watermark = await db[Config.COLECCION_WATERMARKS].find_one({"season_id": SEASON_ID})
+        assert sorted(watermark["procesados"]) == sorted(p["match_id"] for p in partidos)
+        assert watermark["version"] == 3
+
+    asyncio.run(caso())
+
+
+def test_incremental_con_rondas_sin_numero(db):
+    partidos = temporada_sintetica(LIGA, 2023, rondas_extra=["Play-offs", "Play-offs", "Final"])
+    fechas = sorted({p["fecha"] for p in partidos})
+
+    async def caso():
+        # Cada tramo incremental trae solo partidos de rondas sin número
+        incremental = await _incremental(db, partidos, fechas[-3:])
+        completa = await _reconstruccion_completa(partidos)
+        assert incremental == completa
+
+        clasificaciones = incremental[2]
+        jornadas = sorted({jornada for _, _, jornada in clasificaciones})
+        assert jornadas == list(range(1, 13))
+        assert clasificaciones[(SEASON_ID, "completo", 1)]["ronda"] == "Regular Season - 1"
+        assert clasificaciones[(SEASON_ID, "completo", 12)]["ronda"] == "Final"
+
+    asyncio.run(caso())
+
+
+def test_partido_aplazado_fuerza_reconstruccion(db):
+    partidos = temporada_sintetica(LIGA, 2023)
+    aplazado = next(p for p in partidos if p["ronda"] == "Regular Season - 2")
+    fechas = sorted({p["fecha"] for p in partidos})
+
+    async def caso():
+        builder = StatsBuilder(db)
+        await db[Config.COLECCION_PARTIDOS].insert_many(
+            [dict(p) for p in partidos if p["fecha"] < fechas[5] and p is not aplazado]
+        )
+        await builder.construir_estadisticas(LIGA, season_id=SEASON_ID)
+        await db[Config.COLECCION_PARTIDOS].insert_many(
+            [dict(p) for p in partidos if p["fecha"] >= fechas[5] or p is aplazado]
+        )
+        equipos = await builder.actualizar_estadisticas(LIGA, season_id=SEASON_ID)
+        assert len(equipos) == 6
+        assert await _estado(db) == await _reconstruccion_completa(partidos)
+
+    asyncio.run(caso())
+
+
+def test_construcciones_concurrentes_de_ligas_distintas(db, monkeypatch):
+    ligas = {
+        "LIGA_A": temporada_sintetica("LIGA_A", 2023, semilla=1),
+        "LIGA_B": temporada_sintetica("LIGA_B", 2023, semilla=2),
+    }
+
+    # mongomock-motor no cede el control en cada await: forzarlo antes de
+    # guardar para que las dos construcciones se intercalen como con MongoDB
+    guardar_original = StatsBuilder._guardar_estadisticas
+
+    async def guardar_cediendo(self, *args, **kwargs):
+        await asyncio.sleep(0)
+        return await guardar_original(self, *args, **kwargs)
+
+    monkeypatch.setattr(StatsBuilder, "_guardar_estadisticas", guardar_cediendo)
+
+    async def construir_todas(db, builder=None):
+        for partidos in ligas.values():
+            await db[Config.COLECCION_PARTIDOS].insert_many([dict(p) for p in partidos])
+        construcciones = [
+            (builder or StatsBuilder(db)).construir_estadisticas(liga, season_id=f"{liga}_2023-24")
+            for liga in ligas
+        ]
+        if builder:
+            resultados = await asyncio.gather(*construcciones)
+        else:
+            resultados = [await construccion for construccion in construcciones]
+        return resultados, await _estado(db), await volcar(db, Config.COLECCION_HISTORICO, ["liga_id", "nombre"])
+
+    async def caso():
+        concurrentes, *estado_concurrente = await construir_todas(db, StatsBuilder(db))
+        secuenciales, *estado_secuencial = await construir_todas(nueva_db())
+
+        assert estado_concurrente == estado_secuencial
+        for liga, equipos in zip(ligas, concurrentes):
+            assert {equipo.liga_id for equipo in equipos.values()} == {liga}
+        assert [len(e) for e in concurrentes] == [len(e) for e in secuenciales] == [6, 6]
+
+    asyncio.run(caso())